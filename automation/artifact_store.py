@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+# ==========================================
+#             ARTIFACT STORE
+# ==========================================
+
+DEFAULT_STORE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts")
+
+
+def prompt_hash(text):
+    """Hash of a prompt with case and whitespace normalized, so cosmetic differences don't matter."""
+    return hashlib.sha256(" ".join((text or "").casefold().split()).encode("utf-8")).hexdigest()
+
+
+def scenario_hash(scenario):
+    """prompt_hash() of a scenario dict, independent of key order."""
+    return prompt_hash(json.dumps(scenario, sort_keys=True, ensure_ascii=False))
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for generated images, next-step JSON and videos.
+
+    Files live under objects/<hash[:2]>/<hash><ext>, so identical content is stored once
+    and names never collide. Each blob has refs linking it to a kind, provider, scenario
+    key and prompt hash. Writes go through a temp file + rename, so concurrent writers of
+    the same content are safe. gc() evicts least recently used blobs beyond max_bytes.
+    `keep()` lists paths still needed (e.g. checkpoints of unfinished queue items); the
+    automatic gc() after each put_file() never evicts their blobs.
+    """
+    def __init__(self, root=DEFAULT_STORE_ROOT, max_bytes=None, keep=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(root, "artifacts.db"), timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_blobs_lru ON blobs (last_used_at);
+            CREATE TABLE IF NOT EXISTS refs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hash TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                provider TEXT NOT NULL DEFAULT '',
+                scenario_key TEXT NOT NULL DEFAULT '',
+                prompt_hash TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL,
+                UNIQUE (hash, kind, provider, scenario_key, prompt_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_refs_prompt ON refs (kind, provider, prompt_hash);
+            CREATE INDEX IF NOT EXISTS idx_refs_scenario ON refs (kind, scenario_key);
+        """)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def path_for(self, digest, ext):
+        return os.path.join(self.root, "objects", digest[:2], digest + ext)
+
+    # ---------- Writing ----------
+
+    def put_file(self, src_path, kind, provider=None, scenario_key=None, prompt_hash=None, link_to=None, move=True):
+        """
+        Stores `src_path` and returns the blob path. Duplicate content is dropped.
+        `link_to` gets a hard link (or copy) of the blob, e.g. the user-facing output path.
+        """
+        digest = file_hash(src_path)
+        ext = os.path.splitext(src_path)[1].lower()
+        blob_path = self.path_for(digest, ext)
+
+        if os.path.exists(blob_path):
+            if move:
+                os.remove(src_path)  # Already stored; link_to (if any) is re-created below
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            partial_path = f"{blob_path}.{uuid.uuid4().hex}.part"
+            if move:
+                shutil.move(src_path, partial_path)
+            else:
+                shutil.copyfile(src_path, partial_path)
+            os.replace(partial_path, blob_path)
+
+        self._record(digest, ext, os.path.getsize(blob_path), kind, provider, scenario_key, prompt_hash)
+        if link_to:
+            self.link(blob_path, link_to)
+        if self.max_bytes:
+            # The new blob isn't checkpointed by its caller yet; keep it too
+            self.gc(self.max_bytes, self.kept_hashes(self.keep() if self.keep else ()) | {digest})
+        return blob_path
+
+    def put_json(self, data, kind, provider=None, scenario_key=None, prompt_hash=None):
+        """Stores a JSON document and returns the blob path."""
+        raw = json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8")
+        tmp_path = os.path.join(self.root, f"{uuid.uuid4().hex}.json")
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        return self.put_file(tmp_path, kind, provider, scenario_key, prompt_hash)
+
+    def link(self, blob_path, target_path):
+        """Places the blob at target_path without a second copy when the filesystem allows it."""
+        os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+        partial_path = f"{target_path}.{uuid.uuid4().hex}.part"
+        try:
+            os.link(blob_path, partial_path)
+        except OSError:
+            shutil.copyfile(blob_path, partial_path)
+        os.replace(partial_path, target_path)
+        return target_path
+
+    def _record(self, digest, ext, size, kind, provider, scenario_key, prompt_hash):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("""
+                    INSERT INTO blobs (hash, ext, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(hash) DO UPDATE SET last_used_at = excluded.last_used_at
+                """, (digest, ext, size, now, now))
+                self.conn.execute("""
+                    INSERT OR IGNORE INTO refs (hash, kind, provider, scenario_key, prompt_hash, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (digest, kind, provider or "", scenario_key or "", prompt_hash or "", now))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    # ---------- Reading ----------
+
+    def find(self, kind, provider=None, scenario_key=None, prompt_hash=None):
+        """Returns the newest blob path matching the filters (and still on disk), or None."""
+        query = """
+            SELECT b.hash, b.ext FROM refs r JOIN blobs b ON b.hash = r.hash
+            WHERE r.kind = ?
+        """
+        params = [kind]
+        for column, value in (("provider", provider), ("scenario_key", scenario_key), ("prompt_hash", prompt_hash)):
+            if value:
+                query += f" AND r.{column} = ?"
+                params.append(value)
+        query += " ORDER BY r.created_at DESC"
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        for row in rows:
+            blob_path = self.path_for(row["hash"], row["ext"])
+            if os.path.exists(blob_path):
+                self.touch(row["hash"])
+                return blob_path
+        return None
+
+    def kept_hashes(self, paths):
+        """Hashes of the store blobs among `paths`; other paths are ignored."""
+        objects = os.path.join(os.path.abspath(self.root), "objects")
+        hashes = set()
+        for path in paths:
+            if path and os.path.dirname(os.path.dirname(os.path.abspath(path))) == objects:
+                hashes.add(os.path.splitext(os.path.basename(path))[0])
+        return hashes
+
+    def touch(self, digest):
+        with self.lock:
+            self.conn.execute("UPDATE blobs SET last_used_at = ? WHERE hash = ?", (time.time(), digest))
+
+    def stats(self):
+        with self.lock:
+            row = self.conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS bytes FROM blobs").fetchone()
+            kinds = self.conn.execute("SELECT kind, COUNT(DISTINCT hash) AS n FROM refs GROUP BY kind").fetchall()
+        return {"blobs": row["n"], "bytes": row["bytes"], "kinds": {r["kind"]: r["n"] for r in kinds}}
+
+    # ---------- Garbage collection ----------
+
+    def gc(self, max_bytes, keep=()):
+        """Deletes least recently used blobs until the store fits in max_bytes. Returns bytes freed."""
+        keep = set(keep)
+        with self.lock:
+            rows = self.conn.execute("SELECT hash, ext, size FROM blobs ORDER BY last_used_at").fetchall()
+            total = sum(row["size"] for row in rows)
+            freed = 0
+            for row in rows:
+                if total - freed <= max_bytes:
+                    break
+                if row["hash"] in keep:
+                    continue
+                try:
+                    os.remove(self.path_for(row["hash"], row["ext"]))
+                except FileNotFoundError:
+                    pass
+                self.conn.execute("DELETE FROM refs WHERE hash = ?", (row["hash"],))
+                self.conn.execute("DELETE FROM blobs WHERE hash = ?", (row["hash"],))
+                freed += row["size"]
+        if freed:
+            print(f"[*] Artifact GC freed {freed / 1e6:.1f} MB.")
+        return freed
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or trim the artifact store.")
+    parser.add_argument("--root", type=str, default=DEFAULT_STORE_ROOT, help="Artifact store folder.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show blob count and size.")
+    gc_parser = subparsers.add_parser("gc", help="Evict least recently used blobs.")
+    gc_parser.add_argument("--max-gb", type=float, required=True, help="Size to trim the store down to.")
+
+    args = parser.parse_args()
+    store = ArtifactStore(args.root)
+
+    if args.command == "stats":
+        stats = store.stats()
+        print(f"blobs: {stats['blobs']}  size: {stats['bytes'] / 1e9:.2f} GB")
+        for kind, n in sorted(stats["kinds"].items()):
+            print(f"{kind:>10}: {n}")
+    elif args.command == "gc":
+        store.gc(int(args.max_gb * 1e9))
+
+    store.close()
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from fake_provider import start_fake_provider, base_urls, add_provider_arguments, provider_from_args
+from scenario_queue import ScenarioQueue
+from run_ledger import RunLedger, compute_stats, print_stats
+from rate_governor import RateGovernor
+from artifact_store import ArtifactStore
+from prompt_cache import PromptCache
+
+# ==========================================
+#             END-TO-END BENCHMARK
+# ==========================================
+
+# Runs a controller mode against fake_provider.py in the local Chrome and reports items/hour.
+# Queue, ledger, rate state, artifacts and videos go to a scratch folder; the real ones are untouched.
+
+MODES = ("gemini", "grok", "grok-workers", "grok-cdp", "image-to-video")
+
+
+def seed_scenarios(provider, folder, count):
+    """Writes `count` fake scenarios as one scenario file."""
+    scenarios = {}
+    while len(scenarios) < count:
+        scenarios.update(provider.scenarios())
+    scenarios = dict(list(scenarios.items())[:count])
+    with open(os.path.join(folder, "seed.json"), 'w', encoding='utf-8') as f:
+        json.dump(scenarios, f, indent=4)
+
+
+def write_prompt(folder, name, text):
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def isolate(controller, scratch, urls, timeouts):
+    """Points the controller's bots, state files and outputs at the fake site and the scratch folder."""
+    # Bots share the controller's config dict, so in-place updates reach them too
+    controller.config["base_urls"] = urls
+    controller.config["videos_folder"] = os.path.join(scratch, "videos")
+    controller.config["pipeline_max_depth"] = 10 ** 6
+    controller.config["rate_limits"] = {provider: {"cooldown": 5, "max_cooldown": 30} for provider in ("gemini", "grok")}
+    if timeouts:
+        controller.config["timeouts"].update(timeouts)
+
+    controller.queue = ScenarioQueue(os.path.join(scratch, "queue.db"))
+    controller.ledger = RunLedger(os.path.join(scratch, "ledger.jsonl"), flush_interval=0.5)
+    controller.governor = RateGovernor(controller.config, os.path.join(scratch, "rate_state.json"))
+    controller.store = ArtifactStore(os.path.join(scratch, "artifacts"))
+    if hasattr(controller, "cache"):
+        controller.cache = PromptCache(controller.store, os.path.join(scratch, "prompt_cache.db"))
+    # The fake site's media aren't real videos; don't QC, index or transcode them
+    controller.quality_gate = None
+    controller.visual_index = None
+    if getattr(controller, "normalizer", None):
+        controller.normalizer.stop(wait=False)
+        controller.normalizer = None
+    if hasattr(controller, "gemini_workflow"):
+        controller.gemini_workflow.store = controller.store
+
+
+def run_text_to_video(args, scratch, scenario_folder, producer_count, timeouts, urls):
+    from text_to_video_generation import AutomationController
+    from worker_pool import build_worker_specs
+
+    mode = "gemini" if args.mode == "gemini" else "grok"
+    controller = AutomationController(mode=mode)
+    isolate(controller, scratch, urls, timeouts)
+
+    producer = None
+    if producer_count:
+        prompt_path = write_prompt(scratch, "scenario_prompt.txt", "Write video scenarios as one JSON object.")
+        producer = controller.start_scenario_producer(prompt_path, scenario_folder, producer_count, args.scenario_tabs)
+
+    if args.mode == "grok-workers":
+        specs = build_worker_specs(args.parallel, "grok", use_tabs=True)
+        controller.run_parallel_video_generation(scenario_folder, specs, max_videos=args.items, producer=producer)
+    elif args.mode == "grok-cdp":
+        controller.run_cdp_video_generation(scenario_folder, tabs=args.parallel, max_videos=args.items, producer=producer)
+    else:
+        controller.run_video_generation(scenario_folder, max_videos=args.items, producer=producer)
+    return controller, mode, producer
+
+
+def run_image_to_video(args, scratch, scenario_folder, producer_count, timeouts, urls):
+    from image_to_video_generation import AutomationController, QUEUE_PROVIDER
+
+    controller = AutomationController()
+    isolate(controller, scratch, urls, timeouts)
+    images_folder = os.path.join(scratch, "images")
+    os.makedirs(images_folder, exist_ok=True)
+    next_step_path = write_prompt(scratch, "next_step_prompt.txt", "Describe the next two scenes as JSON.")
+
+    producer = None
+    if producer_count:
+        prompt_path = write_prompt(scratch, "scenario_prompt.txt", "Write image scenarios as one JSON object.")
+        producer = controller.start_scenario_producer(prompt_path, scenario_folder, producer_count, args.scenario_tabs)
+
+    # The loop runs 5 * count items; pass a count that covers --items
+    controller.run_image_to_video_loop(
+        scenario_folder, images_folder, next_step_path, max(1, -(-args.items // 5)),
+        producer=producer, prefetch_depth=args.prefetch
+    )
+    return controller, QUEUE_PROVIDER, producer
+
+
+def report(args, controller, provider, concept, scratch, elapsed, fake):
+    counts = controller.queue.counts(provider, concept)
+    done = counts.get("done", 0)
+    controller.ledger.close()
+
+    print(f"\n=== BENCHMARK: {args.mode} ({args.parallel} parallel) ===")
+    print(f"items done: {done} / {args.items}   wall: {elapsed:.1f}s   items/hour: {done / elapsed * 3600:.1f}")
+    print(f"queue: {counts}")
+    print(f"fake site: {fake.stats}")
+    print_stats(compute_stats(os.path.join(scratch, "ledger.jsonl")))
+
+    result = {
+        "mode": args.mode, "parallel": args.parallel, "items": args.items, "done": done,
+        "elapsed_s": round(elapsed, 2), "items_per_hour": round(done / elapsed * 3600, 1),
+        "speed": args.speed, "rate_limit_rate": args.rate_limit_rate, "error_rate": args.error_rate,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result) + "\n")
+    return result
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark a controller mode end to end against the fake provider.")
+    parser.add_argument("--mode", type=str, default="grok", choices=MODES)
+    parser.add_argument("--items", type=int, default=10, help="Videos to produce.")
+    parser.add_argument("--parallel", type=int, default=2, help="Workers (grok-workers) or tabs (grok-cdp).")
+    parser.add_argument("--generate", action="store_true", help="Generate scenarios through the fake Gemini (pipelined) instead of seeding them.")
+    parser.add_argument("--scenario-tabs", type=int, default=1, help="Gemini tabs generating scenarios with --generate.")
+    parser.add_argument("--prefetch", type=int, default=1, help="image-to-video: items Gemini prepares ahead of Grok.")
+    parser.add_argument("--timeout", type=int, default=None, help="Override every stage timeout (seconds); keeps injected errors cheap.")
+    parser.add_argument("--scratch", type=str, default=None, help="Folder for queue, ledger and outputs (default: a temp folder).")
+    parser.add_argument("--output", type=str, default=None, help="Append the result as a JSON line to this file.")
+    add_provider_arguments(parser)
+    args = parser.parse_args()
+
+    fake = provider_from_args(args)
+    server = start_fake_provider(fake, args.fake_port)
+    urls = base_urls(args.fake_port)
+
+    scratch = args.scratch or tempfile.mkdtemp(prefix="bench_e2e_")
+    concept = f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    scenario_folder = os.path.join(scratch, "scenarios", concept)
+    os.makedirs(scenario_folder, exist_ok=True)
+    print(f"[*] Scratch folder: {scratch}")
+
+    producer_count = 0
+    if args.generate:
+        producer_count = -(-args.items // args.batch_size)
+    else:
+        seed_scenarios(fake, scenario_folder, args.items)
+
+    timeouts = None
+    if args.timeout:
+        timeouts = {stage: args.timeout for stage in ("element", "generation", "grok_video", "gemini_response", "gemini_image", "capture")}
+
+    runner = run_image_to_video if args.mode == "image-to-video" else run_text_to_video
+    start = time.time()
+    controller, provider, producer = runner(args, scratch, scenario_folder, producer_count, timeouts, urls)
+    elapsed = time.time() - start
+    if producer:
+        producer.stop()
+        producer.join()
+
+    report(args, controller, provider, concept, scratch, elapsed, fake)
+    server.shutdown()
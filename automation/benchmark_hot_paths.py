@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from fake_provider import FakeProvider
+from scenario_queue import ScenarioQueue
+from scenario_dedup import ScenarioDeduplicator
+from response_json import JsonStreamScanner, extract_json_from_text
+from prompt_cache import build_video_prompt
+from artifact_store import prompt_hash
+from media_capture import snapshot_downloads, move_latest_download
+from perceptual_index import MultiIndexHash
+
+# ==========================================
+#             HOT PATH BENCHMARKS
+# ==========================================
+
+# Reproducible timings of the non-browser paths on synthetic corpora (seeded).
+# Every run is appended to benchmark_history.jsonl; benchmark_baseline.json holds the
+# reference timings per benchmark, corpus size, machine and Python version. Timings are
+# machine-specific, so the baseline isn't committed: each machine records its own with
+# --update-baseline. A result slower than baseline * (1 + tolerance) is reported as a
+# regression (exit code 1).
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE_PATH = os.path.join(BENCH_DIR, "benchmark_baseline.json")
+DEFAULT_HISTORY_PATH = os.path.join(BENCH_DIR, "benchmark_history.jsonl")
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers `fn(ctx)`. It returns (callable, ops): the callable is timed, ops is per run."""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+# ---------- Corpora ----------
+
+
+class Context:
+    """Synthetic inputs shared by the benchmarks, built once per run."""
+    def __init__(self, root, size, per_file=100, downloads=5000, seed=7):
+        self.root = root
+        self.size = size
+        self.per_file = per_file
+        self.downloads = downloads
+        self.seed = seed
+        # Replaced per benchmark by run_benchmarks(), so --only runs see the same inputs as full runs
+        self.rng = random.Random(seed)
+        self.provider = FakeProvider(batch_size=per_file, seed=seed)
+        self.scenario_folder = os.path.join(root, "scenarios")
+        self.scenarios = {}
+        self._write_scenarios()
+
+    def _write_scenarios(self):
+        os.makedirs(self.scenario_folder, exist_ok=True)
+        files = -(-self.size // self.per_file)
+        for i in range(files):
+            batch = self.provider.scenarios()
+            if i == files - 1 and self.size % self.per_file:
+                batch = dict(list(batch.items())[:self.size % self.per_file])
+            self.scenarios.update(batch)
+            with open(os.path.join(self.scenario_folder, f"{i:06d}.json"), 'w', encoding='utf-8') as f:
+                json.dump(batch, f, indent=4)
+
+    def sample(self, limit):
+        keys = list(self.scenarios)[:limit]
+        return {key: self.scenarios[key] for key in keys}
+
+    def chat_response(self, scenarios, malformed=False):
+        """A Gemini-style answer: prose with stray braces, then a fenced JSON block (truncated if malformed)."""
+        prose = " ".join(
+            # Brace pairs that aren't JSON, so the scanner has to skip them
+            self.rng.choice(("Here", "are", "the", "{scenes}", "you", "asked", "for", "{note: brief}", "}", "ideas"))
+            for _ in range(2000)
+        )
+        body = json.dumps(scenarios, indent=2)
+        if malformed:
+            body = body[:len(body) * 9 // 10]
+        return f"{prose}\n```json\n{body}\n```\nLet me know if you want more."
+
+    def fresh_queue(self, name):
+        path = os.path.join(self.root, f"{name}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return ScenarioQueue(path)
+
+# ---------- Scenario queue ----------
+
+
+@benchmark("queue_import")
+def bench_queue_import(ctx):
+    def run():
+        queue = ctx.fresh_queue("import")
+        queue.import_folder(ctx.scenario_folder, "grok", "bench")
+        queue.close()
+    return run, ctx.size
+
+
+@benchmark("queue_rescan")
+def bench_queue_rescan(ctx):
+    queue = ctx.fresh_queue("rescan")
+    queue.import_folder(ctx.scenario_folder, "grok", "bench")
+    # Unchanged files are skipped by mtime/size
+    return (lambda: queue.import_folder(ctx.scenario_folder, "grok", "bench")), -(-ctx.size // ctx.per_file)
+
+
+@benchmark("queue_claim_ack")
+def bench_queue_claim_ack(ctx):
+    count = min(ctx.size, 5000)
+
+    def run():
+        queue = ctx.fresh_queue("claim")
+        queue.enqueue("grok", "bench", ctx.sample(count))
+        start = time.perf_counter()
+        while True:
+            item_id, _, scenario = queue.claim("grok", "bench", worker="bench")
+            if not scenario:
+                break
+            queue.ack(item_id)
+        queue.close()
+        return time.perf_counter() - start
+    return run, count
+
+
+@benchmark("dedup_check")
+def bench_dedup_check(ctx):
+    # MinHash signatures are pure Python; a slice of the corpus keeps the run short
+    sample = ctx.sample(min(ctx.size, 2000))
+
+    def run():
+        dedup = ScenarioDeduplicator()
+        for key, scenario in sample.items():
+            dedup.check_and_add("grok", "bench", key, scenario)
+    return run, len(sample)
+
+# ---------- Response parsing ----------
+
+
+@benchmark("extract_json_large")
+def bench_extract_json_large(ctx):
+    text = ctx.chat_response(ctx.sample(500))
+    return (lambda: extract_json_from_text(text)), 1
+
+
+@benchmark("extract_json_malformed")
+def bench_extract_json_malformed(ctx):
+    text = ctx.chat_response(ctx.sample(500), malformed=True)
+    return (lambda: extract_json_from_text(text)), 1
+
+
+@benchmark("extract_json_streaming")
+def bench_extract_json_streaming(ctx):
+    # 200 polls of a growing response, as wait_for_json sees it while Gemini streams
+    text = ctx.chat_response(ctx.sample(500))
+    step = len(text) // 200 + 1
+    prefixes = [text[:end] for end in range(step, len(text) + step, step)]
+
+    def run():
+        scanner = JsonStreamScanner()
+        for prefix in prefixes:
+            scanner.feed(prefix)
+    return run, len(prefixes)
+
+# ---------- Prompt assembly ----------
+
+
+@benchmark("prompt_build")
+def bench_prompt_build(ctx):
+    scenarios = list(ctx.scenarios.values())
+
+    def run():
+        for scenario in scenarios:
+            prompt_hash(build_video_prompt(scenario))
+    return run, len(scenarios)
+
+# ---------- Visual duplicates ----------
+
+
+@benchmark("perceptual_search")
+def bench_perceptual_search(ctx):
+    # One 64-bit hash per corpus item (as for images); queries are indexed hashes with a few bits flipped
+    index = MultiIndexHash(8)
+    hashes = [ctx.rng.getrandbits(64) for _ in range(ctx.size)]
+    for i, value in enumerate(hashes):
+        index.add(value, i)
+    queries = [value ^ (1 << ctx.rng.randrange(64)) ^ (1 << ctx.rng.randrange(64)) for value in hashes[:1000]]
+
+    def run():
+        for query in queries:
+            index.search(query)
+    return run, len(queries)
+
+# ---------- Downloads ----------
+
+
+@benchmark("move_latest_download")
+def bench_move_latest_download(ctx):
+    download_dir = os.path.join(ctx.root, "downloads")
+    target_dir = os.path.join(ctx.root, "moved")
+    os.makedirs(download_dir, exist_ok=True)
+    os.makedirs(target_dir, exist_ok=True)
+    for i in range(ctx.downloads):
+        with open(os.path.join(download_dir, f"old_{i:06d}.mp4"), 'wb') as f:
+            f.write(b"x")
+
+    def run():
+        before = snapshot_downloads(download_dir)
+        with open(os.path.join(download_dir, "new.mp4"), 'wb') as f:
+            f.write(b"x")
+        move_latest_download(download_dir, target_dir, "moved.mp4", before, timeout=5)
+    return run, 1
+
+# ---------- Baseline & history ----------
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def run_benchmarks(ctx, names, repeat):
+    results = {}
+    for name in names:
+        ctx.rng = random.Random(f"{ctx.seed}:{name}")
+        run, ops = BENCHMARKS[name](ctx)
+        # Benchmarks with their own setup per run return the time of the measured part
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            measured = run()
+            samples.append(measured if isinstance(measured, float) else time.perf_counter() - start)
+        seconds = statistics.median(samples)
+        results[name] = {"seconds": round(seconds, 6), "ops": ops, "us_per_op": round(seconds / ops * 1e6, 3)}
+        print(f"{name:>24}: {seconds * 1000:10.2f} ms  ({results[name]['us_per_op']:.2f} us/op, {ops} ops)")
+    return results
+
+
+def baseline_key(name, size, per_file, downloads):
+    """Timings only compare under the same corpus shape, machine and Python."""
+    return f"{name}@{size}x{per_file}@dl{downloads}@{platform.machine()}@py{platform.python_version()}"
+
+
+def check_regressions(results, baseline, size, per_file, downloads, tolerance):
+    """Returns [(name, seconds, reference)] for results slower than the baseline allows."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(baseline_key(name, size, per_file, downloads))
+        if reference and result["seconds"] > reference["seconds"] * (1 + tolerance):
+            regressions.append((name, result["seconds"], reference["seconds"]))
+    return regressions
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the queue, parsers and other non-browser hot paths.")
+    parser.add_argument("--size", type=int, default=10000, help="Scenarios in the synthetic corpus (10k-1M).")
+    parser.add_argument("--per-file", type=int, default=100, help="Scenarios per scenario file.")
+    parser.add_argument("--downloads", type=int, default=5000, help="Files already sitting in the fake download folder.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the median is reported.")
+    parser.add_argument("--only", action="append", default=None, choices=sorted(BENCHMARKS), help="Run just these (repeatable).")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown over the baseline before flagging.")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--history", type=str, default=DEFAULT_HISTORY_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline for its settings.")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_hot_")
+    try:
+        print(f"[*] Building a corpus of {args.size} scenarios...")
+        ctx = Context(root, args.size, args.per_file, args.downloads)
+        results = run_benchmarks(ctx, args.only or list(BENCHMARKS), args.repeat)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    record = {
+        "at": datetime.now().isoformat(timespec="seconds"), "revision": _git_revision(),
+        "size": args.size, "per_file": args.per_file, "downloads": args.downloads, "python": platform.python_version(), "machine": platform.machine(), "results": results,
+    }
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+    baseline = _load_json(args.baseline)
+    regressions = check_regressions(results, baseline, args.size, args.per_file, args.downloads, args.tolerance)
+    for name, seconds, reference in regressions:
+        print(f"[!] Regression: {name} took {seconds * 1000:.2f} ms (baseline {reference * 1000:.2f} ms, +{args.tolerance:.0%} allowed).")
+
+    if args.update_baseline:
+        for name, result in results.items():
+            baseline[baseline_key(name, args.size, args.per_file, args.downloads)] = {"seconds": result["seconds"], "revision": record["revision"]}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print(f"[*] Baseline updated: {args.baseline}")
+    elif not any(baseline_key(name, args.size, args.per_file, args.downloads) in baseline for name in results):
+        print("[*] No baseline for these settings on this machine yet. Record one with --update-baseline.")
+    elif not regressions:
+        print("[*] No regressions.")
+
+    sys.exit(1 if regressions and not args.update_baseline else 0)
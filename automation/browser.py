@@ -0,0 +1,145 @@
+import os
+import re
+import sys
+import json
+import time
+import socket
+import subprocess
+import urllib.request
+
+# ==========================================
+#             BROWSER
+# ==========================================
+
+# selenium and webdriver_manager are imported inside the functions that need them,
+# so status/maintenance commands don't pay for them.
+
+# Verify this path matches your OS
+CHROME_PATH = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+DEFAULT_PORT = 9222
+DEFAULT_PROFILE = "~/gemini-bot"
+DRIVER_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chromedriver_cache.json")
+
+
+def is_port_open(port, host="127.0.0.1", timeout=0.2):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def debugger_version(port=DEFAULT_PORT, timeout=1):
+    """Returns Chrome's /json/version info on `port`, or None if the debugger isn't answering yet."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/version", timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except Exception:
+        return None
+
+
+def wait_for_debugger(port=DEFAULT_PORT, timeout=15, poll_interval=0.1):
+    """Polls until the debugger answers on `port`. Returns its version info, or None on timeout."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if is_port_open(port):
+            info = debugger_version(port)
+            if info:
+                return info
+        time.sleep(poll_interval)
+    return None
+
+
+def launch_chrome_debugger(port=DEFAULT_PORT, user_data_dir=DEFAULT_PROFILE):
+    """
+    Launches Chrome in remote debugging mode if it's not already running.
+    """
+    user_data_dir = os.path.expanduser(user_data_dir)
+
+    if is_port_open(port):
+        print(f"[*] Chrome is already running on port {port}. Connecting...")
+        return
+
+    print(f"[*] Launching Chrome on port {port}...")
+    cmd = [
+        CHROME_PATH,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={user_data_dir}"
+    ]
+
+    try:
+        subprocess.Popen(cmd)
+    except FileNotFoundError:
+        print(f"[!] Could not find Chrome at: {CHROME_PATH}")
+        sys.exit(1)
+
+    # Ready as soon as the debugger answers, instead of a fixed sleep
+    if not wait_for_debugger(port):
+        print(f"[!] Chrome did not open the debugger on port {port} in time.")
+
+
+def _major_version(text):
+    match = re.search(r"(\d+)\.\d+\.\d+", text or "")
+    return match.group(1) if match else None
+
+
+def _chrome_major(port=DEFAULT_PORT):
+    """Chrome's major version, read offline: from the running debugger, else from the binary."""
+    info = debugger_version(port, timeout=0.5) if is_port_open(port) else None
+    if info:
+        return _major_version(info.get("Browser"))
+    try:
+        output = subprocess.run([CHROME_PATH, "--version"], capture_output=True, text=True, timeout=5).stdout
+        return _major_version(output)
+    except Exception:
+        return None
+
+
+def _load_driver_cache():
+    try:
+        with open(DRIVER_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def install_chromedriver(port=DEFAULT_PORT):
+    """
+    Resolves the chromedriver binary path. The resolved path is cached with its major
+    version; webdriver_manager (network) is only consulted when the cached binary is
+    gone or no longer matches the installed Chrome.
+    """
+    cache = _load_driver_cache()
+    chrome_major = _chrome_major(port)
+    if cache.get("path") and os.path.exists(cache["path"]):
+        if chrome_major is None or cache.get("major") == chrome_major:
+            return cache["path"]
+        print(f"[*] Chrome is now v{chrome_major}; cached chromedriver is v{cache.get('major')}. Updating...")
+
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    try:
+        output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=5).stdout
+        major = _major_version(output)
+    except Exception:
+        major = chrome_major
+    with open(DRIVER_CACHE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"path": path, "major": major or chrome_major}, f)
+    return path
+
+
+def connect_driver(port=DEFAULT_PORT, driver_path=None):
+    """Attaches a new Selenium session to the Chrome instance listening on `port`."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    options = Options()
+    options.add_experimental_option("debuggerAddress", f"127.0.0.1:{port}")
+    # Performance log carries the network events used by media_capture
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    return webdriver.Chrome(
+        service=Service(driver_path or install_chromedriver(port)),
+        options=options
+    )
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import itertools
+import urllib.request
+from browser import DEFAULT_PORT
+from page_watcher import WATCH_JS
+from page_input import SET_TEXT_JS
+from media_capture import download_to_path, snapshot_downloads, move_latest_download, pick_media, DOWNLOAD_DIR
+
+# ==========================================
+#             CDP DRIVER
+# ==========================================
+
+# Talks to Chrome's DevTools websocket directly (no chromedriver, no Selenium HTTP hops).
+# Every page (tab) has its own websocket, so many pages can be driven concurrently from one
+# asyncio loop. Needs the optional `websockets` package.
+
+
+class CDPError(Exception):
+    pass
+
+
+def _websockets():
+    try:
+        import websockets
+    except ImportError:
+        raise CDPError("The CDP driver needs the 'websockets' package (pip install websockets).")
+    return websockets
+
+
+def _http_json(port, path, method="GET"):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read().decode("utf-8") or "null")
+
+
+class CDPSession:
+    """One websocket to one target. Replies are matched to commands by id; events go to listeners."""
+    def __init__(self, ws_url):
+        self.ws_url = ws_url
+        self.ws = None
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.listeners = {}
+        self.reader = None
+
+    async def connect(self):
+        self.ws = await _websockets().connect(self.ws_url, max_size=None)
+        self.reader = asyncio.create_task(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self.pending.pop(message["id"], None)
+                    if future and not future.done():
+                        if "error" in message:
+                            future.set_exception(CDPError(message["error"].get("message", str(message["error"]))))
+                        else:
+                            future.set_result(message.get("result", {}))
+                    continue
+                for callback in self.listeners.get(message.get("method"), []):
+                    callback(message.get("params", {}))
+        except Exception as e:
+            error = CDPError(f"Connection closed: {e}")
+        else:
+            error = CDPError("Connection closed")
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def send(self, method, params=None, timeout=30):
+        command_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[command_id] = future
+        await self.ws.send(json.dumps({"id": command_id, "method": method, "params": params or {}}))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(command_id, None)
+
+    def on(self, method, callback):
+        self.listeners.setdefault(method, []).append(callback)
+
+    async def close(self):
+        if self.ws:
+            await self.ws.close()
+        if self.reader:
+            await asyncio.gather(self.reader, return_exceptions=True)
+
+
+class CDPPage:
+    """A tab. Mirrors what the bots do through Selenium: navigate, evaluate, wait, type, click, upload."""
+    def __init__(self, session, target_id):
+        self.session = session
+        self.target_id = target_id
+        self.load_waiters = []
+        session.on("Page.loadEventFired", self._on_load)
+
+    def _on_load(self, params):
+        for waiter in self.load_waiters:
+            if not waiter.done():
+                waiter.set_result(True)
+        self.load_waiters = []
+
+    async def send(self, method, params=None, timeout=30):
+        return await self.session.send(method, params, timeout)
+
+    async def navigate(self, url, timeout=30):
+        await self.send("Page.enable")
+        waiter = asyncio.get_running_loop().create_future()
+        self.load_waiters.append(waiter)
+        await self.send("Page.navigate", {"url": url})
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            print(f"[!] Page load event not seen within {timeout}s: {url}")
+
+    async def evaluate(self, expression, await_promise=False, timeout=30):
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression, "returnByValue": True, "awaitPromise": await_promise
+        }, timeout)
+        if result.get("exceptionDetails"):
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text", "Script error"))
+        return result.get("result", {}).get("value")
+
+    async def run(self, function_body, *args, await_promise=False, timeout=30):
+        """Runs a Selenium-style script body (uses `arguments`, may `return`)."""
+        expression = f"(function(){{{function_body}}}).apply(null, {json.dumps(list(args))})"
+        return await self.evaluate(expression, await_promise=await_promise, timeout=timeout)
+
+    async def wait_for(self, condition_js, timeout, args=(), chunk=10):
+        """
+        Same contract as page_watcher.wait_for_page: resolves as soon as `condition_js` returns
+        something truthy (re-checked on DOM mutations). Returns None on timeout.
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            chunk_ms = int(min(chunk, remaining) * 1000)
+            expression = (
+                f"new Promise(resolve => (function(){{{WATCH_JS}}})"
+                f".apply(null, [{json.dumps(condition_js)}, {json.dumps(list(args))}, {chunk_ms}, resolve]))"
+            )
+            try:
+                result = await self.evaluate(expression, await_promise=True, timeout=chunk + 5)
+                if result:
+                    return result
+            except (CDPError, asyncio.TimeoutError):
+                # Page navigated mid-watch; observe again shortly
+                await asyncio.sleep(0.5)
+
+    async def wait_for_selector(self, selector, timeout=20):
+        return await self.wait_for("return document.querySelector(args[0]) ? 'found' : null;", timeout, [selector])
+
+    async def set_text(self, selector, text):
+        """Sets the whole text in one call (see page_input.SET_TEXT_JS)."""
+        expression = (
+            f"(function(){{{SET_TEXT_JS}}})"
+            f".apply(null, [document.querySelector({json.dumps(selector)}), {json.dumps(text)}])"
+        )
+        return await self.evaluate(expression)
+
+    async def press_enter(self):
+        key = {"key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13, "nativeVirtualKeyCode": 13}
+        # Only keyDown carries text; CDP rejects a null "text"
+        await self.send("Input.dispatchKeyEvent", {"type": "keyDown", "text": "\r", **key})
+        await self.send("Input.dispatchKeyEvent", {"type": "keyUp", **key})
+
+    async def click(self, selector=None, xpath=None):
+        """Trusted mouse click on the element's center. Returns False if it isn't there."""
+        if xpath:
+            find = f"document.evaluate({json.dumps(xpath)}, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue"
+        else:
+            find = f"document.querySelector({json.dumps(selector)})"
+        box = await self.evaluate(f"""
+            (() => {{
+                const el = {find};
+                if (!el) return null;
+                el.scrollIntoView({{block: 'center'}});
+                const r = el.getBoundingClientRect();
+                return {{x: r.left + r.width / 2, y: r.top + r.height / 2}};
+            }})()
+        """)
+        if not box:
+            return False
+        for event_type in ("mouseMoved", "mousePressed", "mouseReleased"):
+            await self.send("Input.dispatchMouseEvent", {
+                "type": event_type, "x": box["x"], "y": box["y"], "button": "left", "clickCount": 1
+            })
+        return True
+
+    async def cookies(self, url):
+        result = await self.send("Network.getCookies", {"urls": [url]})
+        return {cookie["name"]: cookie["value"] for cookie in result.get("cookies", [])}
+
+
+class CDPMediaCapture:
+    """
+    Like media_capture.NetworkMediaCapture, but fed by live Network events instead of
+    draining the performance log. Call start() once, mark() before submitting, then capture().
+    """
+    def __init__(self, page):
+        self.page = page
+        self.responses = []
+        page.session.on("Network.responseReceived", self._on_response)
+
+    async def start(self):
+        await self.page.send("Network.enable")
+
+    def mark(self):
+        self.responses = []
+
+    def _on_response(self, params):
+        response = params.get("response", {})
+        headers = {k.lower(): v for k, v in (response.get("headers") or {}).items()}
+        length = headers.get("content-length")
+        self.responses.append({
+            "request_id": params.get("requestId"),
+            "url": response.get("url", ""),
+            "mime": (response.get("mimeType") or "").lower(),
+            "status": response.get("status"),
+            "length": int(length) if str(length).isdigit() else None,
+        })
+
+    def find_media(self, kind, min_bytes=0, match=None):
+        return pick_media(self.responses, kind, min_bytes, match)
+
+    async def capture(self, kind, target_path, timeout=30, min_bytes=0, poll_interval=0.25, match=None):
+        end_time = time.time() + timeout
+        while time.time() < end_time:
+            media = self.find_media(kind, min_bytes, match)
+            if media:
+                if await self._save(media, target_path):
+                    print(f"[*] Captured {kind} to: {target_path}")
+                    return target_path
+                return None
+            await asyncio.sleep(poll_interval)
+        print(f"[!] No {kind} response captured.")
+        return None
+
+    async def _save(self, media, target_path):
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        cookies = await self.page.cookies(media["url"])
+        headers = {"User-Agent": await self.page.evaluate("navigator.userAgent")}
+        if await asyncio.to_thread(download_to_path, media["url"], target_path, cookies, headers):
+            return True
+
+        # Fall back to the body Chrome already has in memory
+        try:
+            body = await self.page.send("Network.getResponseBody", {"requestId": media["request_id"]})
+            data = base64.b64decode(body["body"]) if body.get("base64Encoded") else body["body"].encode()
+            with open(target_path + ".part", 'wb') as f:
+                f.write(data)
+            os.replace(target_path + ".part", target_path)
+            return True
+        except Exception as e:
+            print(f"[!] Could not read response body: {e}")
+        return False
+
+
+async def save_generated_media_async(page, capture, kind, target_path, download_selector=None, download_xpath=None,
+                                     timeout=30, min_bytes=0, download_dir=DOWNLOAD_DIR, match=None):
+    """Async twin of media_capture.save_generated_media."""
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if capture and await capture.capture(kind, target_path, timeout=timeout, min_bytes=min_bytes, match=match):
+        return target_path
+
+    before = snapshot_downloads(download_dir)
+    if not await page.click(selector=download_selector, xpath=download_xpath):
+        return None
+    return await asyncio.to_thread(
+        move_latest_download, download_dir, os.path.dirname(target_path), os.path.basename(target_path), before, timeout
+    )
+
+
+class CDPBrowser:
+    """Attaches to the Chrome listening on `port` and hands out pages (one websocket each)."""
+    def __init__(self, port=DEFAULT_PORT):
+        self.port = port
+        self.pages = []
+
+    async def _open(self, target):
+        session = await CDPSession(target["webSocketDebuggerUrl"]).connect()
+        page = CDPPage(session, target["id"])
+        self.pages.append(page)
+        return page
+
+    async def new_page(self, url="about:blank"):
+        # Recent Chrome versions only accept PUT for /json/new
+        target = await asyncio.to_thread(_http_json, self.port, f"/json/new?{url}", "PUT")
+        return await self._open(target)
+
+    async def attach(self, url_contains):
+        """Attaches to an open tab whose URL contains `url_contains`, or returns None."""
+        targets = await asyncio.to_thread(_http_json, self.port, "/json/list")
+        for target in targets:
+            if target.get("type") == "page" and url_contains in target.get("url", ""):
+                return await self._open(target)
+        return None
+
+    async def close_page(self, page):
+        await page.session.close()
+        if page in self.pages:
+            self.pages.remove(page)
+        try:
+            await asyncio.to_thread(_http_json, self.port, f"/json/close/{page.target_id}")
+        except Exception:
+            pass
+
+    async def close(self):
+        for page in list(self.pages):
+            await page.session.close()
+        self.pages = []
@@ -0,0 +1,109 @@
+import json
+import os
+import copy
+
+# ==========================================
+#             CONFIGURATION
+# ==========================================
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+# Every value can be overridden from automation/config.json (same structure, partial is fine).
+DEFAULT_CONFIG = {
+    # Seconds per stage before giving up.
+    "timeouts": {
+        "element": 20,           # Waiting for a button / input to show up
+        "generation": 300,       # Generic long wait (Gemini video element)
+        "grok_video": 300,       # Grok video render until Download is available
+        "gemini_response": 120,  # Gemini text response until it stops streaming
+        "gemini_image": 180,     # Gemini image generation until the download button shows
+        "capture": 30,           # Saving a finished image / video to disk
+    },
+    # "network": save media straight from Chrome's network log (falls back to the Download button).
+    # "downloads": click Download and move the file out of ~/Downloads.
+    "capture_mode": "network",
+    # Where the bots open each provider. benchmark_e2e.py points these at the local fake_provider.py server.
+    "base_urls": {"gemini": "https://gemini.google.com", "grok": "https://grok.com"},
+    "videos_folder": os.path.join(os.path.dirname(os.path.abspath(__file__)), "videos"),
+    # Parallel video workers, e.g. {"provider": "grok", "port": 9223, "profile": "~/gemini-bot-1", "tab": false}.
+    # Empty means use --workers / --worker-tabs.
+    "workers": [],
+    # Max workers of a provider generating at the same time.
+    "provider_concurrency": {"gemini": 1, "grok": 2},
+    # --pipeline: scenario generation pauses while this many scenarios are still pending.
+    "pipeline_max_depth": 20,
+    # Scenario generation: Gemini tabs generating in parallel, and extra batches asked for
+    # in the same chat after the first one (skips the new-chat overhead).
+    "scenario_tabs": 1,
+    "scenario_followups": 0,
+    # Image-to-video: items Gemini prepares (image + next-step JSON) ahead of Grok. 0 = sequential.
+    "image_prefetch_depth": 0,
+    # Image-to-video: extra segments rendered per item from its next-step JSON's remaining scenes
+    # (Scenario2, ...). Each uploads the last frame of the clip before it instead of a new Gemini image.
+    "chain_segments": 0,
+    # Generated images, next-step JSON and videos are kept in automation/artifacts (content-addressed).
+    # Least recently used artifacts are evicted beyond this size.
+    "artifact_store_max_gb": 20,
+    # Image-to-video: the base and extended clips of each item are joined into one 9:16 Short
+    # (stream copy when the clips match, otherwise one re-encode) on `workers` processes.
+    "stitch": {"enabled": True, "workers": 2, "width": 1080, "height": 1920, "crf": 20},
+    # Downloaded videos (and stitched Shorts) are transcoded for delivery on a process pool
+    # (workers 0 = one per core): scaled/padded to width x height, loudness-normalized, target
+    # bitrate, faststart. Output mirrors videos_folder under output_folder (default videos/normalized).
+    "normalize": {
+        "enabled": True, "workers": 0, "output_folder": None,
+        "width": 1080, "height": 1920, "fps": 30, "video_bitrate": "8M", "audio_bitrate": "192k",
+        "loudness": -14, "true_peak": -1.5, "lra": 11,
+    },
+    # Every downloaded clip is checked before its item is acked; a failed clip is retried.
+    # Sampled frames are checked for black frames, frozen stretches, blur and duration (see video_qc.py).
+    # Only the newest keep_rejected failed clips of a folder are kept (as *.qc_rejected.mp4).
+    "qc": {
+        "enabled": True, "frames": 16, "width": 180, "height": 320,
+        "min_duration": 2.0, "max_duration": 60.0,
+        "black_luma": 32, "black_pixel_ratio": 0.98, "max_black_ratio": 0.25,
+        "freeze_diff": 0.5, "max_freeze_seconds": 2.0, "min_sharpness": 15.0,
+        "keep_rejected": 5,
+    },
+    # Generated images and video keyframes are indexed by perceptual hash ("phash" or "dhash").
+    # An output within max_distance bits (of 64) of an earlier one on frame_ratio of its frames
+    # is a visual duplicate: its item is marked 'duplicate' (images: before the Grok render).
+    "visual_dedup": {"enabled": True, "hash": "phash", "max_distance": 8, "frame_ratio": 0.6, "keyframes": 5},
+    # New scenarios whose Subject+Action nearly match a known one (estimated Jaccard >= threshold)
+    # are kept in the queue with status 'duplicate' instead of being rendered.
+    "dedup": {"enabled": True, "threshold": 0.6},
+    # Text-to-video renders are reused for identical prompts (same provider) within ttl_hours.
+    "prompt_cache": {"ttl_hours": 720, "max_entries": 5000},
+    # Rate-limit parking per provider: first cooldown in seconds, doubled on repeated hits up to max_cooldown.
+    # The quota and window learned from hits are kept in automation/rate_state.json.
+    "rate_limits": {
+        "gemini": {"cooldown": 900, "max_cooldown": 7200},
+        "grok": {"cooldown": 900, "max_cooldown": 7200},
+    },
+    # Max seconds a single injected page watcher runs before control returns to Python.
+    "watch_chunk": 10,
+    # Seconds between re-checks when the page can't be observed (e.g. during navigation).
+    "poll_interval": 0.5,
+}
+
+
+def _merge(base, override):
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def load_config(path=DEFAULT_CONFIG_PATH):
+    """Returns DEFAULT_CONFIG merged with the JSON overrides at `path` (if it exists)."""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    if not os.path.exists(path):
+        return config
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return _merge(config, json.load(f))
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[!] Error reading config {path}: {e}. Using defaults.")
+        return config
@@ -0,0 +1,478 @@
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# ==========================================
+#             FAKE PROVIDER
+# ==========================================
+
+# Local stand-in for gemini.google.com and grok.com. It serves only the DOM the bots rely on
+# (same selectors, labels and menus). Generation latency is sampled server-side, with
+# injected rate limits and errors. Point config["base_urls"] at
+# http://127.0.0.1:<port>/gemini and http://127.0.0.1:<port>/grok.
+
+DEFAULT_FAKE_PORT = 8765
+
+# Median seconds and log-normal sigma per generation kind (roughly what the real sites take).
+DEFAULT_LATENCY = {
+    "gemini_text": (8, 0.3),
+    "gemini_image": (15, 0.3),
+    "gemini_video": (60, 0.3),
+    "grok_video": (30, 0.4),
+}
+
+MEDIA_BYTES = {"png": 64 * 1024, "mp4": 256 * 1024}
+MEDIA_TYPES = {"png": "image/png", "mp4": "video/mp4"}
+
+_SYLLABLES = ("ka", "lo", "mi", "ren", "tu", "sha", "vo", "pel", "dri", "no", "zu", "bax", "fen", "qua", "ti", "gor")
+
+GEMINI_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Gemini (fake)</title>
+<style>
+body { font-family: sans-serif; margin: 0; display: flex; }
+nav { width: 160px; padding: 12px; background: #f1f3f4; min-height: 100vh; }
+main { flex: 1; padding: 12px; }
+#chat > div { margin: 8px 0; }
+#input { border: 1px solid #888; min-height: 40px; padding: 6px; }
+#tool-menu div { cursor: pointer; padding: 4px; }
+single-image { display: inline-block; position: relative; }
+single-image img { width: 160px; height: 160px; background: #ccc; }
+.toast { background: #fdd; padding: 8px; }
+</style></head>
+<body>
+<nav>
+    <button aria-label="Expand menu" style="display: none">=</button>
+    <a id="new-chat" href="#">New chat</a>
+</nav>
+<main>
+    <div id="chat"></div>
+    <div id="toolbar">
+        <button id="tools"><span>Tools</span></button>
+        <div id="tool-menu" hidden>
+            <div data-tool="image">Create images</div>
+            <div data-tool="video">Create videos</div>
+        </div>
+    </div>
+    <div id="input" contenteditable="true"></div>
+    <div id="toasts"></div>
+</main>
+<script>
+const chat = document.getElementById('chat');
+const input = document.getElementById('input');
+const toolMenu = document.getElementById('tool-menu');
+const toolbar = document.getElementById('toolbar');
+const toasts = document.getElementById('toasts');
+let tool = null, busy = false, hasImage = false;
+
+function el(tag, cls, text) {
+    const node = document.createElement(tag);
+    if (cls) node.className = cls;
+    if (text) node.textContent = text;
+    return node;
+}
+function download(url) {
+    const a = document.createElement('a');
+    a.href = url + '?download=1';
+    a.download = '';
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+}
+function toast(text) {
+    const node = el('div', 'toast', text);
+    node.setAttribute('role', 'alert');
+    toasts.appendChild(node);
+}
+
+document.getElementById('new-chat').onclick = e => {
+    e.preventDefault();
+    chat.innerHTML = '';
+    toasts.innerHTML = '';
+    tool = null;
+    hasImage = false;
+};
+document.getElementById('tools').onclick = () => { toolMenu.hidden = !toolMenu.hidden; };
+toolMenu.querySelectorAll('div').forEach(item => {
+    item.onclick = () => { tool = item.dataset.tool; toolMenu.hidden = true; };
+});
+input.addEventListener('keydown', e => {
+    if (e.key === 'Enter' && !e.shiftKey) { e.preventDefault(); send(); }
+});
+
+async function stream(code, text) {
+    for (let i = 0; i < text.length; i += 40) {
+        code.textContent = text.slice(0, i + 40);
+        await new Promise(r => setTimeout(r, 30));
+    }
+}
+
+async function send() {
+    const text = input.innerText.trim();
+    if (!text || busy) return;
+    busy = true;
+    input.innerText = '';
+    toasts.innerHTML = '';
+    chat.appendChild(el('div', 'user', text));
+
+    const stop = el('button', '', 'Stop');
+    stop.setAttribute('aria-label', 'Stop response');
+    toolbar.appendChild(stop);
+
+    const kind = tool === 'image' ? 'gemini_image' : tool === 'video' ? 'gemini_video' : 'gemini_text';
+    const reply = (hasImage || text.startsWith('The image was generated')) ? 'next_step' : 'scenarios';
+    try {
+        const result = await (await fetch(`/api/generate?kind=${kind}&reply=${reply}`)).json();
+        if (result.status === 'rate_limited') {
+            toast('Rate limit reached. Try again later.');
+        } else if (result.status === 'error') {
+            chat.appendChild(el('div', 'markdown', 'Something went wrong. Please try again.'));
+        } else if (kind === 'gemini_image') {
+            const image = el('single-image', 'generated-image large');
+            const img = el('img');
+            img.src = result.media;
+            const button = el('button', '', 'Download');
+            button.setAttribute('aria-label', 'Download full size image');
+            button.onclick = () => download(result.media);
+            image.append(img, button);
+            chat.appendChild(image);
+            hasImage = true;
+            tool = null;
+        } else if (kind === 'gemini_video') {
+            const response = el('div', 'response');
+            const video = el('video');
+            video.src = result.media;
+            video.controls = true;
+            const button = el('button', '', 'Download');
+            button.setAttribute('aria-label', 'Download video');
+            button.onclick = () => download(result.media);
+            response.append(video, button);
+            chat.appendChild(response);
+            tool = null;
+        } else {
+            const markdown = el('div', 'markdown');
+            markdown.appendChild(el('p', '', 'Here you go:'));
+            const code = el('code');
+            markdown.appendChild(el('pre')).appendChild(code);
+            chat.appendChild(markdown);
+            await stream(code, result.text);
+            markdown.appendChild(el('p', '', 'Let me know if you want more.'));
+        }
+    } finally {
+        stop.remove();
+        busy = false;
+    }
+}
+</script>
+</body></html>
+"""
+
+GROK_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Grok Imagine (fake)</title>
+<style>
+body { font-family: sans-serif; padding: 12px; }
+video { width: 180px; height: 320px; background: #222; margin: 4px; }
+textarea { width: 400px; height: 60px; display: block; }
+[role=menuitem] { cursor: pointer; padding: 4px; }
+.toast { background: #fdd; padding: 8px; }
+</style></head>
+<body>
+<div id="posts"></div>
+<input type="file" accept="image/*" id="file" style="display: none">
+<textarea aria-label="Ask Grok anything"></textarea>
+<button id="download" aria-label="Download" disabled>Download</button>
+<button id="more" aria-label="More options">...</button>
+<div id="menu" role="menu" hidden>
+    <div role="menuitem" id="unsave"><span>Unsave</span></div>
+    <div role="menuitem" id="delete"><span>Delete post</span></div>
+</div>
+<div id="confirm" role="dialog" hidden><button id="confirm-delete">Delete post</button></div>
+<div id="toasts"></div>
+<script>
+const posts = document.getElementById('posts');
+const textarea = document.querySelector("textarea[aria-label='Ask Grok anything']");
+const downloadButton = document.getElementById('download');
+const menu = document.getElementById('menu');
+const confirmDialog = document.getElementById('confirm');
+const toasts = document.getElementById('toasts');
+const postMatch = location.pathname.match(/\\/post\\/([^/]+)/);
+let postId = postMatch ? postMatch[1] : null;
+let busy = false;
+
+function addVideo(src) {
+    const video = document.createElement('video');
+    video.src = src;
+    video.controls = true;
+    posts.appendChild(video);
+    downloadButton.disabled = false;
+}
+function toast(text) {
+    const node = document.createElement('div');
+    node.className = 'toast';
+    node.setAttribute('role', 'alert');
+    node.textContent = text;
+    toasts.appendChild(node);
+}
+
+async function generate() {
+    if (busy) return;
+    busy = true;
+    toasts.innerHTML = '';
+    downloadButton.disabled = true;
+    try {
+        const result = await (await fetch(`/api/generate?kind=grok_video&post=${postId || ''}`)).json();
+        if (result.status === 'rate_limited') {
+            toast('Rate limit reached. Please wait before generating more.');
+        } else if (result.status === 'error') {
+            toast('Something went wrong. Please try again.');
+        } else {
+            if (!postId) {
+                postId = result.post;
+                history.pushState(null, '', `/grok/imagine/post/${postId}`);
+            }
+            addVideo(result.media);
+        }
+    } finally {
+        busy = false;
+    }
+}
+
+document.getElementById('file').addEventListener('change', generate);
+textarea.addEventListener('keydown', e => {
+    if (e.key === 'Enter' && !e.shiftKey) { e.preventDefault(); textarea.value = ''; generate(); }
+});
+downloadButton.onclick = () => {
+    const videos = posts.querySelectorAll('video');
+    if (!videos.length) return;
+    const a = document.createElement('a');
+    a.href = videos[videos.length - 1].src + '?download=1';
+    a.download = '';
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+};
+document.getElementById('more').onclick = () => { menu.hidden = !menu.hidden; };
+document.getElementById('unsave').onclick = () => { menu.hidden = true; };
+document.getElementById('delete').onclick = () => { menu.hidden = true; confirmDialog.hidden = false; };
+document.getElementById('confirm-delete').onclick = async () => {
+    confirmDialog.hidden = true;
+    if (postId) await fetch(`/api/delete?post=${postId}`);
+    posts.innerHTML = '';
+    downloadButton.disabled = true;
+    postId = null;
+    history.pushState(null, '', '/grok/imagine');
+};
+
+if (postId) {
+    fetch(`/api/post?post=${postId}`).then(r => r.json()).then(result => (result.media || []).forEach(addVideo));
+}
+</script>
+</body></html>
+"""
+
+
+class FakeProvider:
+    """
+    Generation behaviour of the fake sites: latency per kind, injected failures,
+    generated media and Grok posts. Thread-safe; one instance serves every request.
+    """
+    def __init__(self, latency=None, speed=1.0, rate_limit_rate=0.0, error_rate=0.0, batch_size=5, seed=None):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.speed = speed
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.media_ids = 0
+        self.posts = {}
+        self.stats = {}
+
+    def _word(self):
+        return "".join(self.rng.choice(_SYLLABLES) for _ in range(self.rng.randint(2, 4)))
+
+    def _phrase(self, words=6):
+        return " ".join(self._word() for _ in range(words))
+
+    def scenarios(self):
+        """A batch of distinct scenarios (random words, so they don't trip the dedup)."""
+        with self.lock:
+            return {
+                f"scenario_{self.rng.getrandbits(32):08x}": {
+                    "Subject": self._phrase(), "Action": self._phrase(), "Scene": self._phrase(4),
+                    "Style": self._phrase(3), "Sounds": self._phrase(3), "TechnicalDetails": self._phrase(3),
+                }
+                for _ in range(self.batch_size)
+            }
+
+    def next_step(self):
+        with self.lock:
+            return {"Scenario1": self._phrase(10), "Scenario2": self._phrase(10)}
+
+    def sample_latency(self, kind):
+        median, sigma = self.latency.get(kind, (1, 0))
+        with self.lock:
+            return median * math.exp(self.rng.gauss(0, sigma)) / self.speed
+
+    def outcome(self):
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limited"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def new_media(self, ext):
+        with self.lock:
+            self.media_ids += 1
+            return f"/media/{self.media_ids:06d}.{ext}"
+
+    def count(self, kind, status):
+        with self.lock:
+            self.stats.setdefault(kind, {}).setdefault(status, 0)
+            self.stats[kind][status] += 1
+
+    def generate(self, kind, reply="scenarios", post=None):
+        time.sleep(self.sample_latency(kind))
+        status = self.outcome()
+        self.count(kind, status)
+        if status != "ok":
+            return {"status": status}
+
+        if kind == "gemini_text":
+            data = self.next_step() if reply == "next_step" else self.scenarios()
+            return {"status": "ok", "text": "```json\n" + json.dumps(data, indent=2) + "\n```"}
+        if kind == "gemini_image":
+            return {"status": "ok", "media": self.new_media("png")}
+
+        media = self.new_media("mp4")
+        if kind == "grok_video":
+            with self.lock:
+                post = post or f"{self.rng.getrandbits(48):012x}"
+                self.posts.setdefault(post, []).append(media)
+            return {"status": "ok", "media": media, "post": post}
+        return {"status": "ok", "media": media}
+
+
+def media_bytes(name, ext):
+    """Deterministic filler of the usual size; distinct per media name."""
+    seed = hashlib.sha256(name.encode("utf-8")).digest()
+    size = MEDIA_BYTES[ext]
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+def make_handler(provider):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, data):
+            self._send(200, json.dumps(data).encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            path = url.path.rstrip("/") or "/"
+
+            if path == "/gemini" or path.startswith("/gemini/"):
+                self._send(200, GEMINI_HTML.encode("utf-8"), "text/html; charset=utf-8")
+            elif path == "/grok" or path.startswith("/grok/"):
+                self._send(200, GROK_HTML.encode("utf-8"), "text/html; charset=utf-8")
+            elif path == "/api/generate":
+                self._json(provider.generate(query.get("kind", "gemini_text"), query.get("reply", "scenarios"), query.get("post")))
+            elif path == "/api/post":
+                with provider.lock:
+                    self._json({"media": list(provider.posts.get(query.get("post"), []))})
+            elif path == "/api/delete":
+                with provider.lock:
+                    provider.posts.pop(query.get("post"), None)
+                self._json({"status": "ok"})
+            elif path == "/stats":
+                with provider.lock:
+                    self._json(provider.stats)
+            else:
+                match = re.fullmatch(r"/media/(\w+)\.(png|mp4)", path)
+                if not match:
+                    self._send(404, b"not found", "text/plain")
+                    return
+                headers = {"Content-Disposition": f'attachment; filename="{match.group(1)}.{match.group(2)}"'} if "download" in query else None
+                self._send(200, media_bytes(match.group(1), match.group(2)), MEDIA_TYPES[match.group(2)], headers)
+
+    return Handler
+
+
+def start_fake_provider(provider, port=DEFAULT_FAKE_PORT):
+    """Serves `provider` in a background thread. Returns the server (call shutdown() to stop)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(provider))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_urls(port=DEFAULT_FAKE_PORT):
+    return {"gemini": f"http://127.0.0.1:{port}/gemini", "grok": f"http://127.0.0.1:{port}/grok"}
+
+
+def parse_latency(values):
+    """['grok_video=30,0.4', ...] -> {'grok_video': (30.0, 0.4)}"""
+    latency = {}
+    for value in values or []:
+        kind, _, spec = value.partition("=")
+        median, _, sigma = spec.partition(",")
+        latency[kind] = (float(median), float(sigma or 0))
+    return latency
+
+
+def add_provider_arguments(parser):
+    parser.add_argument("--fake-port", type=int, default=DEFAULT_FAKE_PORT, help="Port of the fake provider server.")
+    parser.add_argument("--latency", action="append", default=[], help="kind=median_seconds,sigma (repeatable), e.g. grok_video=30,0.4")
+    parser.add_argument("--speed", type=float, default=1.0, help="Divides every sampled latency.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of generations answered with a rate limit.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of generations that fail.")
+    parser.add_argument("--batch-size", type=int, default=5, help="Scenarios per Gemini scenario batch.")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def provider_from_args(args):
+    return FakeProvider(
+        parse_latency(args.latency), speed=args.speed, rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate, batch_size=args.batch_size, seed=args.seed
+    )
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake Gemini/Grok pages for offline runs.")
+    add_provider_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_fake_provider(provider_from_args(args), args.fake_port)
+    urls = base_urls(args.fake_port)
+    print(f"[*] Fake Gemini: {urls['gemini']}")
+    print(f"[*] Fake Grok:   {urls['grok']}/imagine")
+    print(f"[*] Set config.json \"base_urls\" to these to run the bots against it. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
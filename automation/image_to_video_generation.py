@@ -1,126 +1,50 @@
 import json
-import time
 import os
-import glob
-import sys
-import subprocess
 import argparse
-import re
-import requests
-import random
+import uuid
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
-import shutil
+from scenario_queue import ScenarioQueue, stage_reached
+from scenario_dedup import ScenarioDeduplicator
+from pipeline import ScenarioProducer, ProducerGroup, PrefetchStage, wait_for_scenario, FOLLOWUP_PROMPT
+from browser import launch_chrome_debugger, connect_driver, DEFAULT_PROFILE
+from config import load_config
+from page_watcher import (
+    wait_for_page, count_elements, LATEST_VIDEO_SRC_JS,
+    GROK_VIDEO_READY_JS, GEMINI_RESPONSE_STARTED_JS, GEMINI_IMAGE_READY_JS,
+    is_rate_limited
+)
+from run_ledger import RunLedger, mark, pause
+from page_input import set_input_text
+from response_json import wait_for_json
+from media_capture import NetworkMediaCapture, save_generated_media
+from artifact_store import ArtifactStore, prompt_hash, scenario_hash
+from rate_governor import RateGovernor, RateLimitError
+from video_stitch import StitchStage, collect_clips, chain_artifact, save_last_frame, require_ffmpeg
+from video_normalize import start_normalizer, normalized_path
+from video_qc import start_quality_gate
+from perceptual_index import start_visual_index, DuplicateOutputError
+
+# Image scenarios live in automation/image_scenarios/<concept>, so they get their own queue provider.
+QUEUE_PROVIDER = "image_to_video"
 
 # ==========================================
 #             SHARED UTILITIES
 # ==========================================
 
-def launch_chrome_debugger():
-    """Launches Chrome in remote debugging mode."""
-    # Verify this path matches your OS
-    chrome_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-    user_data_dir = os.path.expanduser("~/gemini-bot") 
-    port = "9222"
+# Selenium is imported on first use (see _load_selenium), so importing this module stays cheap.
+By = WebDriverWait = EC = Keys = ActionChains = None
 
-    is_running = os.system(f"lsof -i :{port} > /dev/null 2>&1")
-    
-    if is_running == 0:
-        print(f"[*] Chrome is already running on port {port}. Connecting...")
-        return
-
-    print(f"[*] Launching Chrome on port {port}...")
-    cmd = [
-        chrome_path,
-        f"--remote-debugging-port={port}",
-        f"--user-data-dir={user_data_dir}"
-    ]
-    
-    try:
-        subprocess.Popen(cmd)
-        time.sleep(4) 
-    except FileNotFoundError:
-        print(f"[!] Could not find Chrome at: {chrome_path}")
-        sys.exit(1)
-
-
-def move_latest_download(download_dir, target_folder, new_filename):
-    """
-    Waits for a new file to appear in the download_dir and moves it to target_folder.
-    """
-    # Wait for the file to appear (timeout 20s)
-    end_time = time.time() + 20
-    while time.time() < end_time:
-        # Get list of files in download dir
-        files = glob.glob(os.path.join(download_dir, "*"))
-        # Filter out hidden files or temporary download files (.crdownload)
-        files = [f for f in files if not f.endswith('.crdownload') and not f.endswith('.tmp')]
-        
-        if not files:
-            time.sleep(1)
-            continue
-
-        # Find the latest file
-        latest_file = max(files, key=os.path.getctime)
-        
-        # Check if this file was created in the last 10 seconds (to ensure it's the one we just clicked)
-        if time.time() - os.path.getctime(latest_file) < 10:
-            target_path = os.path.join(target_folder, new_filename)
-            shutil.move(latest_file, target_path)
-            print(f"[*] Moved downloaded image to: {target_path}")
-            return target_path
-        
-        time.sleep(1)
-    
-    return None        
-
-def get_next_scenario(folder_path):
-    files = sorted(glob.glob(os.path.join(folder_path, "*.json")))
-    for filepath in files:
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if not data:
-                os.remove(filepath)
-                continue
-            
-            first_key = next(iter(data))
-            return filepath, first_key, data[first_key]
-            
-        except json.JSONDecodeError:
-            continue
-    return None, None, None
 
-def remove_scenario_from_file(filepath, key):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if key in data:
-            del data[key]
-        
-        if not data:
-            os.remove(filepath)
-        else:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        print(f"[!] Error updating file: {e}")
-
-def remove_image(filepath):
-    try:
-        os.remove(filepath)
-    except Exception as e:
-        print(f"[!] Error removing image: {e}")
+def _load_selenium():
+    """Binds the Selenium names used by the bots below. Called before any driver is touched."""
+    global By, WebDriverWait, EC, Keys, ActionChains
+    if By is not None:
+        return
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.common.action_chains import ActionChains
 
 def get_generation_prompt(prompt_path):
     try:
@@ -130,77 +54,68 @@ def get_generation_prompt(prompt_path):
         print(f"[!] Error reading prompt file: {e}")
         return None
 
-def extract_json_from_text(text):
-    match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if not match:
-        match = re.search(r"(\{.*\})", text, re.DOTALL)
-    
-    if match:
-        json_str = match.group(1)
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            return None
-    return None
-
-def download_image_from_url(url, save_path):
-    try:
-        response = requests.get(url, stream=True)
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
-            return True
-    except Exception as e:
-        print(f"[!] Image download failed: {e}")
-    return False
-
 # ==========================================
 #             PLATFORM CLASSES
 # ==========================================
 
 class GeminiScenarioGenerator:
     """Handles Phase 1: Generating JSON Scenarios."""
-    def __init__(self, driver, wait):
+    def __init__(self, driver, wait, config=None):
+        _load_selenium()
         self.driver = driver
         self.wait = wait
+        self.config = config or load_config()
+        self.tab_handle = None # Pinned tab when running next to the video workers
 
-    def generate_and_save(self, prompt_text, output_folder):
+    def generate_and_save(self, prompt_text, output_folder, new_chat=True):
         print("\n--- Starting Scenario Generation ---")
         self._focus_tab()
-        self._new_chat()
+        if new_chat:
+            self._new_chat()
 
         print("[*] Sending scenario generation prompt...")
+        previous_responses = count_elements(self.driver, ".markdown")
         self._send_message(prompt_text)
+        mark("prompt_sent")
 
         print("[*] Waiting for Gemini response...")
-        time.sleep(10)
-        
-        extracted_data = self._extract_json_response()
+        if wait_for_page(
+            self.driver, GEMINI_RESPONSE_STARTED_JS, self.config["timeouts"]["gemini_response"],
+            args=[previous_responses], chunk=self.config["watch_chunk"], poll_interval=self.config["poll_interval"]
+        ):
+            mark("first_response")
+        extracted_data = self._extract_json_response(previous_responses)
         
         if not extracted_data:
             print("[!] Failed to extract valid JSON.")
             return False
+        mark("media_ready")
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}.json"
+        filename = f"{timestamp}_{uuid.uuid4().hex[:8]}.json"
         output_path = os.path.join(output_folder, filename)
         
         try:
             with open(output_path, 'w', encoding='utf-8') as f:
                 json.dump(extracted_data, f, indent=4, ensure_ascii=False)
             print(f"[*] Saved new scenarios to: {output_path}")
-            return True
+            mark("download_done")
+            return output_path
         except Exception as e:
             print(f"[!] Error saving file: {e}")
             return False
 
     def _focus_tab(self):
+        if self.tab_handle:
+            self.driver.switch_to.window(self.tab_handle)
+            if self.config["base_urls"]["gemini"] not in self.driver.current_url:
+                self.driver.get(self.config["base_urls"]["gemini"])
+            return
         for handle in self.driver.window_handles:
             self.driver.switch_to.window(handle)
-            if "gemini.google.com" in self.driver.current_url:
+            if self.config["base_urls"]["gemini"] in self.driver.current_url:
                 return
-        self.driver.get("https://gemini.google.com")
+        self.driver.get(self.config["base_urls"]["gemini"])
 
     def _new_chat(self):
         try:
@@ -209,7 +124,7 @@ class GeminiScenarioGenerator:
             if expand_btn and expand_btn[0].is_displayed():
                 print("[*] Sidebar is collapsed. Clicking 'Expand menu'...")
                 expand_btn[0].click()
-                time.sleep(1) # Wait for animation
+                pause(1) # Wait for animation
         except Exception as e:
             print(f"[!] Note: Sidebar expansion check failed (non-critical): {e}")
 
@@ -218,7 +133,7 @@ class GeminiScenarioGenerator:
                 (By.XPATH, "//*[contains(text(), 'New chat')]")
             ))
             new_chat_btn.click()
-            time.sleep(2)
+            pause(2)
         except:
             pass
 
@@ -227,50 +142,67 @@ class GeminiScenarioGenerator:
             input_box = self.wait.until(EC.presence_of_element_located(
                 (By.CSS_SELECTOR, "div[contenteditable='true']")
             ))
-            input_box.clear()
-            self.driver.execute_script("arguments[0].innerText = arguments[1];", input_box, text)
-            input_box.send_keys(" ")
-            time.sleep(1)
+            set_input_text(self.driver, input_box, text)
+            pause(0.3)
             input_box.send_keys(Keys.ENTER)
         except Exception as e:
             print(f"[!] Error sending prompt: {e}")
 
-    def _extract_json_response(self):
-        for i in range(20):
-            try:
-                responses = self.driver.find_elements(By.CSS_SELECTOR, ".markdown")
-                if responses:
-                    data = extract_json_from_text(responses[-1].text)
-                    if data: return data
-                
-                code_blocks = self.driver.find_elements(By.TAG_NAME, "code")
-                if code_blocks:
-                    data = extract_json_from_text(code_blocks[-1].text)
-                    if data: return data
-            except:
-                pass
-            time.sleep(2)
-        return None
+    def _extract_json_response(self, previous_responses=0):
+        # Returns as soon as the JSON object closes, even if Gemini is still writing after it
+        return wait_for_json(
+            self.driver, previous_responses,
+            timeout=self.config["timeouts"]["gemini_response"], poll_interval=self.config["poll_interval"]
+        )
 
 
 class GeminiImageWorkflow:
     """Handles Steps 3, 4, 5: Image Gen -> Download -> Next Step Text Gen."""
-    def __init__(self, driver, wait, long_wait):
+    def __init__(self, driver, wait, long_wait, config=None, store=None):
+        _load_selenium()
         self.driver = driver
         self.wait = wait
         self.long_wait = long_wait
-        self.chrome_download_dir = os.path.expanduser("~/Downloads")
+        self.config = config or load_config()
+        self.store = store # ArtifactStore; None keeps files in the images folder
+        self.capture = NetworkMediaCapture(driver) if self.config["capture_mode"] == "network" else None
+        self.tab_handle = None # Pinned tab when another session also drives Gemini
 
     def focus_tab(self):
+        if self.tab_handle:
+            self.driver.switch_to.window(self.tab_handle)
+            if self.config["base_urls"]["gemini"] not in self.driver.current_url:
+                self.driver.get(self.config["base_urls"]["gemini"])
+            return
         for handle in self.driver.window_handles:
             self.driver.switch_to.window(handle)
-            if "gemini.google.com" in self.driver.current_url:
+            if self.config["base_urls"]["gemini"] in self.driver.current_url:
                 return
-        self.driver.get("https://gemini.google.com")
+        self.driver.get(self.config["base_urls"]["gemini"])
 
-    def run_image_generation(self, scenario, images_folder, next_step_prompt_template):
+    def run_image_generation(self, scenario, images_folder, next_step_prompt_template, image_path=None, checkpoint=None, scenario_key=None):
+        """
+        Steps 3, 4, 5. Returns (image_path, next_step_path).
+        Pass `image_path` to resume with an image generated earlier. `checkpoint(stage, **artifacts)`
+        is called after each completed stage.
+        """
         print("[*] Starting Gemini Image Workflow...")
-        
+
+        same_chat = False
+        if not image_path:
+            image_path = self.generate_image(scenario, images_folder, scenario_key)
+            if checkpoint:
+                checkpoint("IMAGE_READY", image_path=image_path)
+            same_chat = True
+        else:
+            print(f"[*] Resuming with existing image: {os.path.basename(image_path)}")
+
+        next_step_path = self.generate_next_step(scenario, images_folder, next_step_prompt_template, same_chat, scenario_key)
+        if checkpoint:
+            checkpoint("NEXT_STEP_READY", next_step_path=next_step_path)
+        return image_path, next_step_path
+
+    def _start_chat(self, create_images=True):
         # 1. Start Fresh Chat for this Scenario
         try:
             self.focus_tab()
@@ -282,35 +214,37 @@ class GeminiImageWorkflow:
                 if expand_btn and expand_btn[0].is_displayed():
                     print("[*] Sidebar is collapsed. Clicking 'Expand menu'...")
                     expand_btn[0].click()
-                    time.sleep(1) # Wait for animation
+                    pause(1) # Wait for animation
             except Exception as e:
                 print(f"[!] Note: Sidebar expansion check failed (non-critical): {e}")            
 
             new_chat_btn = self.wait.until(EC.element_to_be_clickable((By.XPATH, "//*[contains(text(), 'New chat')]")))
             new_chat_btn.click()
-            time.sleep(2)
+            pause(2)
             print("[*] New chat started.")
+            if not create_images:
+                return
 
             # 1. Click Tools
             tools_btn = self.wait.until(EC.element_to_be_clickable(
                 (By.XPATH, "//button[.//span[contains(text(), 'Tools')]]")
             ))
             tools_btn.click()
-            time.sleep(1)
+            pause(1)
 
             # 2. Click Create images
             image_menu = self.wait.until(EC.element_to_be_clickable(
                 (By.XPATH, "//div[contains(text(), 'Create images')]")
             ))
             image_menu.click()
-            time.sleep(1)
+            pause(1)
         except Exception as e:
             print(f"[!] Error setting up image generation chat: {e}")
             raise e
 
-        # 2. Construct Image Prompt from Scenario
+    def _image_prompt(self, scenario):
         # Adjust keys based on your JSON structure
-        image_prompt = (
+        return (
             f"Subject: {scenario.get('Subject', '')}, "
             f"Action: {scenario.get('Action', '')}, "
             f"Scene: {scenario.get('Scene', '')}, "
@@ -318,41 +252,83 @@ class GeminiImageWorkflow:
             f"TechnicalDetails: {scenario.get('TechnicalDetails', '')}"
         )
 
+    def generate_image(self, scenario, images_folder, scenario_key=None):
+        """Steps 3 & 4: Generates the scenario image in a fresh chat and saves it."""
+        self._start_chat()
+
+        # 2. Construct Image Prompt from Scenario
+        image_prompt = self._image_prompt(scenario)
+
         print("[*] Sending Image Generation Prompt...")
+        previous_images = count_elements(self.driver, "single-image")
+        if self.capture:
+            self.capture.mark()
         self._send_message(image_prompt)
+        mark("prompt_sent")
 
         # 3. Wait for Image and Download (Step 3 & 4)
         print("[*] Waiting for image generation...")
-        time.sleep(10)
+        if wait_for_page(
+            self.driver, GEMINI_IMAGE_READY_JS, self.config["timeouts"]["gemini_image"],
+            args=[previous_images], chunk=self.config["watch_chunk"], poll_interval=self.config["poll_interval"]
+        ):
+            mark("media_ready")
         
         local_image_path = self._click_download_button(images_folder)
         if not local_image_path:
             raise Exception("Failed to download image from Gemini.")
-        
-        # 4. Generate Next Step Description (Step 5)
-        # We use the same chat session so Gemini knows the context of the image it just made.
+        if self.store:
+            local_image_path = self.store.put_file(
+                local_image_path, "image", "gemini", scenario_key, prompt_hash(image_prompt)
+            )
+        mark("download_done")
+        return local_image_path
+
+    def generate_next_step(self, scenario, images_folder, next_step_prompt_template, same_chat=True, scenario_key=None):
+        """Step 5: Asks for the next-step description and saves it as JSON."""
+        if same_chat:
+            # Same chat session, so Gemini knows the context of the image it just made.
+            prompt = next_step_prompt_template
+        else:
+            # Resumed: the image chat is gone, so restate what the image shows.
+            self._start_chat(create_images=False)
+            prompt = f"The image was generated from this description: {self._image_prompt(scenario)}\n\n{next_step_prompt_template}"
+
         print("[*] Requesting Next Step Description...")
-        self._send_message(next_step_prompt_template)
+        previous_responses = count_elements(self.driver, ".markdown")
+        self._send_message(prompt)
 
-        local_next_step_text_path = self._get_next_step_response(images_folder)
+        local_next_step_text_path = self._get_next_step_response(images_folder, previous_responses)
         if not local_next_step_text_path:
             raise Exception("Failed to get next step description.")
+        if self.store:
+            local_next_step_text_path = self.store.put_file(
+                local_next_step_text_path, "next_step", "gemini", scenario_key, prompt_hash(prompt)
+            )
+        mark("next_step_ready")
 
         print(f"[*] Next Step Description: {local_next_step_text_path[:50]}...")
-        return local_image_path, local_next_step_text_path
+        return local_next_step_text_path
 
     def _send_message(self, text):
         input_box = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[contenteditable='true']")))
-        input_box.clear()
-        self.driver.execute_script("arguments[0].innerText = arguments[1];", input_box, text)
-        input_box.send_keys(" ")
-        time.sleep(1)
+        set_input_text(self.driver, input_box, text)
+        pause(0.3)
         input_box.send_keys(Keys.ENTER)
 
     def _click_download_button(self, save_folder):
         """
-        Locates the generated image container, hovers over it, and clicks the download button.
+        Saves the generated image: straight from the network log when capture is enabled,
+        otherwise by hovering over the image container and clicking its download button.
         """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Random suffix: second-resolution timestamps collide between parallel workers
+        target_path = os.path.join(save_folder, f"generated_{timestamp}_{uuid.uuid4().hex[:8]}.jpg")
+
+        # Generated images are large; skip icons and avatars
+        if self.capture and self.capture.capture("image", target_path, timeout=self.config["timeouts"]["capture"], min_bytes=50 * 1024):
+            return target_path
+
         max_retries = 30
         for _ in range(max_retries):
             try:
@@ -361,7 +337,7 @@ class GeminiImageWorkflow:
                 images = self.driver.find_elements(By.TAG_NAME, "single-image")
                 
                 if not images:
-                    time.sleep(2)
+                    pause(2)
                     continue
 
                 target_image = images[-1] # Get the most recent one
@@ -369,23 +345,19 @@ class GeminiImageWorkflow:
                 # 2. Hover to reveal controls (ActionChains)
                 actions = ActionChains(self.driver)
                 actions.move_to_element(target_image).perform()
-                time.sleep(1) 
+                pause(1) 
 
                 # 3. Find the Download Button inside this specific image container
                 # Selector based on your HTML: aria-label="Download full size image"
                 download_btn = target_image.find_element(By.XPATH, ".//button[@aria-label='Download full size image']")
                 
-                # 4. Click it
-                download_btn.click()
+                # 4. Click it and move the new file out of ~/Downloads
+                saved_path = save_generated_media(
+                    None, "image", target_path, download_btn.click,
+                    timeout=self.config["timeouts"]["capture"]
+                )
                 print("[*] Clicked Gemini download button.")
                 
-                # 5. Handle file move
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"generated_{timestamp}.jpg"
-                
-                # Use the shared utility to find the new file in ~/Downloads and move it
-                saved_path = move_latest_download(self.chrome_download_dir, save_folder, filename)
-                
                 if saved_path:
                     return saved_path
                 
@@ -393,40 +365,18 @@ class GeminiImageWorkflow:
                 print(f"Debug: Retrying download click... {e}") # Uncomment for debug
                 pass
             
-            time.sleep(2)
+            pause(2)
             
         print("[!] Could not find or click the download button.")
         return None
 
 
-    def _get_next_step_response(self, images_folder):
-
-        max_retries = 40
-        extracted_data = None
-        
-        for i in range(max_retries):
-            try:
-                # Get all response containers
-                print(f"[*] Checking for Gemini response... (Attempt {i})")
-                # METHOD A: Get all markdown text (General purpose)
-                # Use CSS Selector '.markdown' to match "markdown markdown-main-panel..."
-                responses = self.driver.find_elements(By.CSS_SELECTOR, ".markdown")        
-                if responses:
-                    # Get the text of the very last response
-                    last_response_text = responses[-1].text
-                    extracted_data = extract_json_from_text(last_response_text)
-
-                # METHOD B: Fallback - Target the code block directly (Specific to your HTML snippet)
-                if not extracted_data:
-                    code_blocks = self.driver.find_elements(By.TAG_NAME, "code")
-                    if code_blocks:
-                        last_code_text = code_blocks[-1].text
-                        extracted_data = extract_json_from_text(last_code_text)
-                if extracted_data:
-                    break
-            except Exception as e:
-                print(e)
-            time.sleep(2)
+    def _get_next_step_response(self, images_folder, previous_responses=0):
+        print("[*] Waiting for the next step JSON...")
+        extracted_data = wait_for_json(
+            self.driver, previous_responses,
+            timeout=self.config["timeouts"]["gemini_response"], poll_interval=self.config["poll_interval"]
+        )
 
         if not extracted_data:
             print("[!] Failed to extract valid JSON from Gemini response.")
@@ -434,7 +384,7 @@ class GeminiImageWorkflow:
 
         # 5. Save to File
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}.json"
+        filename = f"{timestamp}_{uuid.uuid4().hex[:8]}.json"
         output_path = os.path.join(images_folder, filename)
         
         try:
@@ -448,25 +398,28 @@ class GeminiImageWorkflow:
 
 class GrokImageToVideo:
     """Handles Steps 6, 7, 8: Upload Image -> Input Prompt -> Download Video."""
-    def __init__(self, driver, wait, long_wait):
+    def __init__(self, driver, wait, long_wait, config=None):
+        _load_selenium()
         self.driver = driver
         self.wait = wait
         self.long_wait = long_wait
+        self.config = config or load_config()
+        self.capture = NetworkMediaCapture(driver) if self.config["capture_mode"] == "network" else None
 
     def focus_tab(self):
         for handle in self.driver.window_handles:
             self.driver.switch_to.window(handle)
-            if "grok.com" in self.driver.current_url:
+            if self.config["base_urls"]["grok"] in self.driver.current_url:
                 return
-        self.driver.get("https://grok.com/imagine")
+        self.driver.get(self.config["base_urls"]["grok"] + "/imagine")
 
     def get_next_step_description(self, file_path):
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             if not data:
-                raise Exception(f"[*] File {os.path.basename(file_path)} is empty. Deleting...")
-            os.remove(file_path)
+                raise Exception(f"[*] File {os.path.basename(file_path)} is empty.")
+            # The file is kept until the item is DONE, so a retry can reuse it
 
             return data
 
@@ -475,40 +428,84 @@ class GrokImageToVideo:
 
         return None
     
-    def download_video(self):
-        # Sleep until video appears
-        # For now, just wait fixed time.
-        time.sleep(50 + random.randint(1, 5))
-        # Wait for specific download button
-        download_btn = self.long_wait.until(EC.element_to_be_clickable(
+    def download_video(self, previous_video=None, output_path=None, stage_prefix=""):
+        # Returns as soon as a video other than `previous_video` is downloadable
+        status = wait_for_page(
+            self.driver, GROK_VIDEO_READY_JS, self.config["timeouts"]["grok_video"],
+            args=[previous_video], chunk=self.config["watch_chunk"], poll_interval=self.config["poll_interval"]
+        )
+        if status == "rate_limited":
+            raise RateLimitError()
+        if not status:
+            raise Exception("Timed out waiting for Grok video generation.")
+
+        print("[*] Video generated. Saving...")
+        mark(f"{stage_prefix}media_ready")
+        saved_path = save_generated_media(
+            self.capture, "video", output_path, self._click_download,
+            timeout=self.config["timeouts"]["capture"],
+            match=self.driver.execute_script(LATEST_VIDEO_SRC_JS)
+        )
+        if output_path and not saved_path:
+            raise Exception("Failed to save Grok video.")
+        mark(f"{stage_prefix}download_done")
+        return saved_path
+
+    def _click_download(self):
+        download_btn = self.wait.until(EC.element_to_be_clickable(
             (By.XPATH, "//button[@aria-label='Download']")
         ))
-        
-        print("[*] Video generated. Clicking download...")
         download_btn.click()
 
-    def generate_video(self, image_path, next_step_text_path):
-        # TODO: Read prompt from next_step_text_path
+    def _reopen_post(self, post_url):
+        """Opens the post of a base video rendered earlier. Returns False if it's gone."""
+        if not post_url:
+            return False
+        try:
+            self.driver.get(post_url)
+            self.long_wait.until(EC.presence_of_element_located((By.TAG_NAME, "video")))
+            return True
+        except Exception as e:
+            print(f"[!] Could not reopen base video post ({e}). Rendering it again.")
+            return False
+
+    def generate_video(self, image_path, next_step_text_path, output_prefix=None, resume=None, checkpoint=None, scene="Scenario1"):
+        """
+        Steps 6, 7, 8. `resume` is the item's (stage, artifacts): a base video that was already
+        rendered is extended instead of rendered again. `checkpoint(stage, **artifacts)` is
+        called after each completed video. The extension prompt is the next-step JSON's `scene`.
+        """
+        stage, artifacts = resume or ("NEXT_STEP_READY", {})
+        if stage_reached(stage, "EXTENDED_VIDEO"):
+            print("[*] Videos already rendered. Nothing to do.")
+            return
+
         print("\n--- Starting Grok Video Generation ---")
         self.focus_tab()
-        self.driver.get("https://grok.com/imagine") # Refresh to ensure clean state
-        time.sleep(3)
 
         try:
-            # 1. Upload Image (Step 6)
-            print(f"[*] Uploading image: {os.path.basename(image_path)}")
-            
-            # Find generic file input. Grok often hides it, so we target input[type='file']
-            file_input = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='file']")))
-            file_input.send_keys(os.path.abspath(image_path))
-            
-            # Wait for upload processing (usually a preview image appears)
-            time.sleep(10)
-            # Check for Rate Limit
-            if self.is_rate_limited():
-                raise Exception("Rate Limit Reached")
-            self.download_video()
-            time.sleep(5)
+            if stage_reached(stage, "BASE_VIDEO") and self._reopen_post(artifacts.get("base_post_url")):
+                print(f"[*] Resuming from base video: {artifacts.get('base_video')}")
+            else:
+                self.driver.get(self.config["base_urls"]["grok"] + "/imagine") # Refresh to ensure clean state
+                pause(3)
+
+                # 1. Upload Image (Step 6)
+                print(f"[*] Uploading image: {os.path.basename(image_path)}")
+                
+                # Find generic file input. Grok often hides it, so we target input[type='file']
+                file_input = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='file']")))
+                if self.capture:
+                    self.capture.mark()
+                file_input.send_keys(os.path.abspath(image_path))
+                mark("prompt_sent")
+                
+                # Check for Rate Limit
+                if self.is_rate_limited():
+                    raise RateLimitError()
+                base_path = self.download_video(output_path=f"{output_prefix}_base.mp4" if output_prefix else None)
+                if checkpoint:
+                    checkpoint("BASE_VIDEO", base_video=base_path, base_post_url=self.driver.current_url)
 
 
             # 2. Enter Prompt (Step 7)
@@ -525,15 +522,24 @@ class GrokImageToVideo:
             text_area = self.long_wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "textarea, div[contenteditable='true']")))            
             text_area.click()
 
-            middle_scene_prompt = f"{next_steps.get('Scenario1', '')} "
-            text_area.send_keys(middle_scene_prompt)
-            time.sleep(1)
+            base_video = self.driver.execute_script(LATEST_VIDEO_SRC_JS)
+            middle_scene_prompt = f"{next_steps.get(scene, '')} "
+            set_input_text(self.driver, text_area, middle_scene_prompt)
+            pause(0.3)
+            if self.capture:
+                self.capture.mark()
             text_area.send_keys(Keys.ENTER)
+            mark("ext1_prompt_sent")
             # Check for Rate Limit
             if self.is_rate_limited():
-                raise Exception("Rate Limit Reached")
-            self.download_video()
-            time.sleep(5)
+                raise RateLimitError()
+            ext_path = self.download_video(
+                previous_video=base_video,
+                output_path=f"{output_prefix}_ext1.mp4" if output_prefix else None,
+                stage_prefix="ext1_"
+            )
+            if checkpoint:
+                checkpoint("EXTENDED_VIDEO", ext_video=ext_path)
 
 
             # Only one customization is enough for now
@@ -542,13 +548,13 @@ class GrokImageToVideo:
             text_area.click()
             final_scene_prompt = f"{next_steps.get('Scenario2', '')} "
             text_area.send_keys(final_scene_prompt)
-            time.sleep(1)
+            pause(1)
             text_area.send_keys(Keys.ENTER)
             # Check for Rate Limit
             if self.is_rate_limited():
-                raise Exception("Rate Limit Reached")
+                raise RateLimitError()
             self.download_video()
-            time.sleep(5)
+            pause(5)
             """
 
 
@@ -560,7 +566,8 @@ class GrokImageToVideo:
 
         except Exception as e:
             print(f"[!] Grok Error: {e}")
-            if "Rate Limit" in str(e): raise e
+            # Re-raised so the item isn't marked done; completed stages are already checkpointed
+            raise e
             
     def cleanup_post(self):
         # Reuse existing cleanup logic
@@ -569,7 +576,7 @@ class GrokImageToVideo:
                 (By.XPATH, "//button[contains(@aria-label, 'More') or .//svg[contains(@class, 'lucide-more-horizontal')]]")
             ))
             more_menu.click()
-            time.sleep(1)
+            pause(1)
             
             # Try to delete
             delete_xpath = "//div[@role='menuitem']//span[text()='Delete post']/.."
@@ -578,16 +585,12 @@ class GrokImageToVideo:
             
             cfm_btn = self.wait.until(EC.element_to_be_clickable((By.XPATH, "//button[normalize-space()='Delete post']")))
             cfm_btn.click()
-            time.sleep(2)
+            pause(2)
         except:
             pass
 
     def is_rate_limited(self):
-        try:
-            if "rate limit" in self.driver.find_element(By.TAG_NAME, "body").text.lower():
-                return True
-        except: pass
-        return False
+        return is_rate_limited(self.driver)
 
 
 # ==========================================
@@ -596,25 +599,39 @@ class GrokImageToVideo:
 
 class AutomationController:
     def __init__(self):
+        _load_selenium()
         launch_chrome_debugger()        
         print("[*] Connecting to Chrome...")
         
-        self.options = Options()
-        self.options.add_experimental_option("debuggerAddress", "127.0.0.1:9222")
+        self.driver = connect_driver()
+        self.config = load_config()
+        self.wait = WebDriverWait(self.driver, self.config["timeouts"]["element"])
+        self.long_wait = WebDriverWait(self.driver, self.config["timeouts"]["generation"])
         
-        self.driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
-            options=self.options
+        dedup = ScenarioDeduplicator(self.config["dedup"]["threshold"]) if self.config["dedup"]["enabled"] else None
+        self.queue = ScenarioQueue(dedup=dedup)
+        self.ledger = RunLedger()
+        self.governor = RateGovernor(self.config)
+        # Checkpointed images / next-step JSON of unfinished items are never evicted
+        self.store = ArtifactStore(
+            max_bytes=int(self.config["artifact_store_max_gb"] * 1e9), keep=self.queue.active_artifacts
         )
-        self.wait = WebDriverWait(self.driver, 20)
-        self.long_wait = WebDriverWait(self.driver, 300)
-        
-        self.scenario_bot = GeminiScenarioGenerator(self.driver, self.wait)
-        self.gemini_workflow = GeminiImageWorkflow(self.driver, self.wait, self.long_wait)
-        self.grok_bot = GrokImageToVideo(self.driver, self.wait, self.long_wait)
-
-    def run_scenario_generation(self, prompt_path, output_folder, count):
+        self.normalizer = start_normalizer(self.config)
+        self.quality_gate = start_quality_gate(self.config)
+        self.visual_index = start_visual_index(self.config)
+        self.scenario_bot = GeminiScenarioGenerator(self.driver, self.wait, self.config)
+        self.gemini_workflow = GeminiImageWorkflow(self.driver, self.wait, self.long_wait, self.config, self.store)
+        self.grok_bot = GrokImageToVideo(self.driver, self.wait, self.long_wait, self.config)
+
+    def run_scenario_generation(self, prompt_path, output_folder, count, tabs=1, followups=0):
         """Step 1 & 2: Generate Scenarios"""
+        if tabs > 1 or followups > 0:
+            # High-throughput mode: parallel tabs, several batches per chat, no backpressure
+            producers = self.start_scenario_producer(prompt_path, output_folder, count, tabs, followups, backpressure=False)
+            if producers:
+                producers.join()
+            return
+
         print(f"\n=== PHASE 1: GENERATING SCENARIOS ===")
         
         prompt_text = get_generation_prompt(prompt_path)
@@ -624,11 +641,205 @@ class AutomationController:
 
         for i in range(count):
             print(f"\n[Batch {i+1}/{count}]")
-            if not self.scenario_bot.generate_and_save(prompt_text, output_folder):
+            attempt = self.ledger.start("gemini", os.path.basename(os.path.normpath(output_folder)), f"batch{i+1}", mode="scenario")
+            if self.scenario_bot.generate_and_save(prompt_text, output_folder):
+                attempt.finish("success")
+            else:
                 print("[!] Batch failed.")
-            time.sleep(3)
+                attempt.finish("failed")
+            pause(3)
+
+    def start_scenario_producer(self, prompt_path, output_folder, count, tabs=1, followups=0, backpressure=True):
+        """Step 1 & 2 (pipelined): Generate scenarios in the background while the loop consumes them"""
+        print(f"\n=== PHASE 1 (PIPELINED): {count} CHATS x {1 + followups} BATCHES OVER {tabs} TABS ===")
+
+        prompt_text = get_generation_prompt(prompt_path)
+        if not prompt_text:
+            print("[!] Prompt file missing.")
+            return None
+
+        concept = os.path.basename(os.path.normpath(output_folder))
+        producers = []
+        for i in range(tabs):
+            chats = count // tabs + (1 if i < count % tabs else 0)
+            if not chats:
+                continue
+            # Selenium sessions aren't thread-safe, so every producer gets its own session and tab
+            driver = connect_driver()
+            driver.switch_to.new_window('tab')
+            bot = GeminiScenarioGenerator(driver, WebDriverWait(driver, self.config["timeouts"]["element"]), self.config)
+            bot.tab_handle = driver.current_window_handle
+            producers.append(ScenarioProducer(
+                bot, self.queue, QUEUE_PROVIDER, concept, prompt_text, output_folder, chats,
+                max_depth=self.config["pipeline_max_depth"] if backpressure else None,
+                ledger=self.ledger, followups=followups,
+                followup_prompt=self.config.get("scenario_followup_prompt") or FOLLOWUP_PROMPT,
+                name=f"Producer-{i}"
+            ))
+
+        # The image workflow also drives Gemini, so it is pinned to a tab of its own.
+        self.driver.switch_to.new_window('tab')
+        self.gemini_workflow.tab_handle = self.driver.current_window_handle
+
+        group = ProducerGroup(producers)
+        group.start()
+        return group
+
+    def start_image_stage(self, concept, images_folder, next_step_template, depth, producer=None):
+        """Steps 3, 4, 5 (staged): Gemini prepares upcoming items while Grok renders the current one"""
+        print(f"[*] Gemini image stage running up to {depth} items ahead.")
+
+        # The stage drives Gemini from its own Selenium session and pinned tab
+        driver = connect_driver()
+        driver.switch_to.new_window('tab')
+        workflow = GeminiImageWorkflow(
+            driver,
+            WebDriverWait(driver, self.config["timeouts"]["element"]),
+            WebDriverWait(driver, self.config["timeouts"]["generation"]),
+            self.config,
+            self.store
+        )
+        workflow.tab_handle = driver.current_window_handle
+
+        def prepare(item_id, key, scenario):
+            return self._run_image_generation(workflow, concept, item_id, key, scenario, images_folder, next_step_template)
 
-    def run_image_to_video_loop(self, scenario_folder, images_folder, next_step_prompt_path, count):
+        # Items handed back unconsumed keep their checkpointed image / next-step JSON for the next claim
+        stage = PrefetchStage(
+            prepare, self.queue, QUEUE_PROVIDER, concept, depth=depth, producer=producer,
+            governor=self.governor, rate_provider="gemini", account=DEFAULT_PROFILE
+        )
+        stage.start()
+        return stage
+
+    def _resume_point(self, item_id):
+        """
+        Returns the item's (stage, artifacts), stepping back to the last stage
+        whose files still exist on disk.
+        """
+        stage, artifacts = self.queue.progress(item_id)
+        resumed = "SCENARIO"
+        for step, artifact in (("IMAGE_READY", "image_path"), ("NEXT_STEP_READY", "next_step_path"),
+                               ("BASE_VIDEO", "base_video"), ("EXTENDED_VIDEO", "ext_video")):
+            if not stage_reached(stage, step) or not os.path.exists(artifacts.get(artifact) or ""):
+                break
+            resumed = step
+        return resumed, artifacts
+
+    def _checkpointer(self, item_id, segment=0):
+        def checkpoint(stage, **artifacts):
+            # A clip that fails QC raises before it is checkpointed, so the retry renders it again
+            for name in ("base_video", "ext_video"):
+                if artifacts.get(name) and self.quality_gate:
+                    self.quality_gate.enforce(artifacts[name])
+            if segment:
+                # A chained segment's clips are added under chain<n>_* names; the item stays EXTENDED_VIDEO
+                artifacts = {
+                    chain_artifact(segment, name): path for name, path in artifacts.items()
+                    if name in ("base_video", "ext_video")
+                }
+                stage = "EXTENDED_VIDEO"
+            self.queue.checkpoint(item_id, stage, artifacts)
+        return checkpoint
+
+    def _chain_segments(self, item_id, next_step_text_path, images_folder, count):
+        """
+        Yields (segment, scene, frame_path) for up to `count` scenes after Scenario1 in the
+        next-step JSON. frame_path is the last frame of the clip before the segment, taken when
+        the segment is reached; segments already rendered (on an earlier try) are skipped.
+        """
+        next_steps = self.grok_bot.get_next_step_description(next_step_text_path) or {}
+        previous = "ext_video"
+        for segment in range(1, count + 1):
+            scene = f"Scenario{segment + 1}"
+            if not next_steps.get(scene):
+                break
+            _, artifacts = self.queue.progress(item_id)
+            if not os.path.exists(artifacts.get(chain_artifact(segment, "ext_video")) or ""):
+                if not os.path.exists(artifacts.get(previous) or ""):
+                    raise Exception(f"No {previous} clip to chain segment {segment} from.")
+                stem = os.path.splitext(os.path.basename(artifacts[previous]))[0]
+                frame_path = save_last_frame(artifacts[previous], os.path.join(images_folder, f"{stem}_last_frame.png"))
+                yield segment, scene, frame_path
+            previous = chain_artifact(segment, "ext_video")
+
+    def _run_image_generation(self, workflow, concept, item_id, key, scenario, images_folder, next_step_template):
+        """Steps 3, 4, 5 for one scenario, recorded in the run ledger. Skips stages already done."""
+        stage, artifacts = self._resume_point(item_id)
+        if stage_reached(stage, "NEXT_STEP_READY"):
+            print(f"[*] {key}: image and next step already prepared ({stage}).")
+            return artifacts["image_path"], artifacts["next_step_path"]
+
+        # Waits out a Gemini cooldown reported by either path (inline or prefetch)
+        self.governor.acquire("gemini", DEFAULT_PROFILE)
+        attempt = self.ledger.start("gemini", concept, key, mode="image")
+        try:
+            artifacts = workflow.run_image_generation(
+                scenario, images_folder, next_step_template,
+                image_path=artifacts.get("image_path") if stage == "IMAGE_READY" else None,
+                checkpoint=self._checkpointer(item_id),
+                scenario_key=key
+            )
+        except Exception as e:
+            attempt.finish("rate_limited" if isinstance(e, RateLimitError) else "failed", e)
+            raise
+        attempt.finish("success")
+        self.governor.report_success("gemini", DEFAULT_PROFILE)
+        return artifacts
+
+    def _store_videos(self, item_id, key, scenario):
+        """Adds the item's videos to the artifact store; the output paths become hard links."""
+        _, artifacts = self.queue.progress(item_id)
+        for path in collect_clips(artifacts):
+            self.store.put_file(path, "video", "grok", key, scenario_hash(scenario), link_to=path)
+
+    def _index_videos(self, item_id):
+        """Adds the item's clips to the perceptual index, so later images are checked against them."""
+        if not self.visual_index:
+            return
+        _, artifacts = self.queue.progress(item_id)
+        clips = set(collect_clips(artifacts))
+        for name, clip in artifacts.items():
+            if clip not in clips:
+                continue
+            try:
+                self.visual_index.add("video", item_id, name, clip)
+            except Exception as e:
+                print(f"[!] Could not index {clip}: {e}")
+
+    def start_stitch_stage(self):
+        """Step 10 (background): joins each finished item's clips into one Short."""
+        settings = self.config["stitch"]
+        if not settings["enabled"]:
+            return None
+        try:
+            require_ffmpeg()
+        except Exception as e:
+            print(f"[!] {e} Clips are left unstitched.")
+            return None
+
+        def store_short(key, output_path, method):
+            self.store.put_file(output_path, "short", "grok", key, link_to=output_path)
+            self.normalize(output_path)
+
+        return StitchStage(settings["workers"], settings["width"], settings["height"], settings["crf"], on_done=store_short)
+
+    def _finish_videos(self, stitcher, item_id, key, output_prefix):
+        """Stitches the item's clips into a Short (normalized once written), or normalizes the clips as they are."""
+        _, artifacts = self.queue.progress(item_id)
+        clips = collect_clips(artifacts)
+        if stitcher and clips:
+            stitcher.submit(key, clips, f"{output_prefix}_short.mp4")
+            return
+        for clip in clips:
+            self.normalize(clip)
+
+    def normalize(self, video_path):
+        """Queues a video for delivery transcoding (no-op when the stage is off)."""
+        if self.normalizer:
+            self.normalizer.submit(video_path, normalized_path(video_path, self.config))
+
+    def run_image_to_video_loop(self, scenario_folder, images_folder, next_step_prompt_path, count, producer=None, prefetch_depth=0, chain_segments=None):
         """Steps 3 to 9"""
         print(f"\n=== PHASE 2: IMAGE TO VIDEO LOOP (5 * {count} iterations) ===")
         
@@ -637,49 +848,120 @@ class AutomationController:
             print("[!] Next step prompt template missing.")
             return
 
+        concept = os.path.basename(os.path.normpath(scenario_folder))
+        self.queue.import_folder(scenario_folder, QUEUE_PROVIDER, concept)
+        self.queue.requeue_stale()
+
+        stage = None
+        if prefetch_depth > 0:
+            stage = self.start_image_stage(concept, images_folder, next_step_template, prefetch_depth, producer)
+
+        stitcher = self.start_stitch_stage()
+        if chain_segments is None:
+            chain_segments = self.config["chain_segments"]
+
         processed_count = 0
         
         while processed_count < 5 * count:
-            # 1. Get a Scenario
-            filepath, key, scenario = get_next_scenario(scenario_folder)
-            if not scenario:
-                print("[!] No more scenarios available.")
-                break
+            # 1. Get a Scenario (already prepared by Gemini when staged)
+            if stage:
+                staged = stage.next_item()
+                if not staged:
+                    print("[!] No more scenarios available.")
+                    break
+                item_id, key, scenario, (image_path, next_step_text_path) = staged
+            else:
+                item_id, key, scenario = wait_for_scenario(self.queue, QUEUE_PROVIDER, concept, producer)
+                if not scenario:
+                    print("[!] No more scenarios available.")
+                    break
 
             print(f"\n--- Processing Item {processed_count + 1}/{5*count}: {key} ---")
             
+            attempt = None
             try:
                 # Steps 3, 4, 5: Gemini (Image Gen -> Download -> Text Gen)
-                image_path, next_step_text_path = self.gemini_workflow.run_image_generation(
-                    scenario, 
-                    images_folder, 
-                    next_step_template
-                )
+                if not stage:
+                    image_path, next_step_text_path = self._run_image_generation(
+                        self.gemini_workflow, concept, item_id, key, scenario,
+                        images_folder, 
+                        next_step_template
+                    )
 
                 print(f"[*] Generated Image: {image_path}")
                 print(f"[*] Next Step Text: {next_step_text_path}")
 
 
                 # Steps 6, 7, 8: Grok (Upload -> Video Gen -> Download)
-                self.grok_bot.generate_video(image_path, next_step_text_path)
+                output_prefix = os.path.join(self.config["videos_folder"], QUEUE_PROVIDER, concept, f"{key}_{item_id}")
+                resume = self._resume_point(item_id)
+                # A Gemini image that looks like an earlier output isn't worth a Grok render
+                if self.visual_index and not stage_reached(resume[0], "BASE_VIDEO"):
+                    self.visual_index.enforce("image", item_id, "image", image_path)
+                # Waits out a cooldown / paces submissions instead of stopping the run
+                self.governor.acquire("grok", DEFAULT_PROFILE)
+                attempt = self.ledger.start("grok", concept, key, mode="image_to_video")
+                self.grok_bot.generate_video(
+                    image_path, next_step_text_path, output_prefix,
+                    resume=resume, checkpoint=self._checkpointer(item_id)
+                )
+                attempt.finish("success")
+                # Finished attempts are dropped so a later failure isn't recorded for them again
+                attempt = None
+                self.governor.report_success("grok", DEFAULT_PROFILE)
+
+                # Remaining scenes continue from the last frame of the previous clip; no Gemini round trip
+                for segment, scene, frame_path in self._chain_segments(item_id, next_step_text_path, images_folder, chain_segments):
+                    print(f"[*] Chained segment {segment} ({scene}) from {os.path.basename(frame_path)}")
+                    self.governor.acquire("grok", DEFAULT_PROFILE)
+                    attempt = self.ledger.start("grok", concept, key, mode="image_to_video_chain")
+                    self.grok_bot.generate_video(
+                        frame_path, next_step_text_path, f"{output_prefix}_chain{segment}",
+                        checkpoint=self._checkpointer(item_id, segment), scene=scene
+                    )
+                    attempt.finish("success")
+                    attempt = None
+                    self.governor.report_success("grok", DEFAULT_PROFILE)
                 
-                # Cleanup Scenario
-                remove_scenario_from_file(filepath, key)
-                remove_image(image_path)
+                # Image and next-step JSON stay in the artifact store until its GC evicts them
+                self._store_videos(item_id, key, scenario)
+                self.queue.ack(item_id)
                 processed_count += 1
+                self._index_videos(item_id)
+                self._finish_videos(stitcher, item_id, key, output_prefix)
                 
+            except DuplicateOutputError as e:
+                print(f"[!] Visual duplicate: {e}")
+                self.queue.mark_duplicate(item_id, e)
+            except RateLimitError as e:
+                self.queue.release(item_id, e, count_attempt=False)
+                if attempt:
+                    attempt.finish("rate_limited", e)
+                # Without a Grok attempt the limit came from Gemini (image / next step)
+                self.governor.report_rate_limit("grok" if attempt else "gemini", DEFAULT_PROFILE)
             except Exception as e:
                 print(f"[!] Critical Loop Error: {e}")
-                if "Rate Limit" in str(e):
-                    print("[!] Rate limit hit. Stopping.")
-                    break
+                self.queue.release(item_id, e)
+                if attempt:
+                    attempt.finish("failed", e)
             
-            time.sleep(5)
+            pause(5)
+
+        if stage:
+            stage.stop()
+        if stitcher:
+            print("[*] Waiting for pending stitches...")
+            stitcher.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--count", type=int, default=1, help="Total items to process.")
     parser.add_argument("--concept", type=str, required=True, help="Concept folder name.")
+    parser.add_argument("--pipeline", action="store_true", help="Generate scenarios and videos at the same time.")
+    parser.add_argument("--prefetch", type=int, default=None, help="Items Gemini prepares ahead of Grok (0 = strictly sequential).")
+    parser.add_argument("--scenario-tabs", type=int, default=None, help="Gemini tabs generating scenarios in parallel.")
+    parser.add_argument("--followups", type=int, default=None, help="Extra scenario batches asked for in each chat.")
+    parser.add_argument("--chain", type=int, default=None, help="Extra segments per item chained from the last frame (0 = off).")
     args = parser.parse_args()
 
     # Paths
@@ -698,9 +980,30 @@ if __name__ == "__main__":
     os.makedirs(images_output_folder, exist_ok=True)
 
     controller = AutomationController()
-
-    # Phase 1: Create Scenarios
-    controller.run_scenario_generation(scenario_prompt_path, scenario_output_folder, args.count)
+    scenario_tabs = args.scenario_tabs if args.scenario_tabs is not None else controller.config["scenario_tabs"]
+    followups = args.followups if args.followups is not None else controller.config["scenario_followups"]
+
+    # Phase 1: Create Scenarios (in the background when pipelined)
+    producer = None
+    if args.pipeline:
+        producer = controller.start_scenario_producer(
+            scenario_prompt_path, scenario_output_folder, args.count, scenario_tabs, followups
+        )
+    else:
+        controller.run_scenario_generation(
+            scenario_prompt_path, scenario_output_folder, args.count, scenario_tabs, followups
+        )
 
     # Phase 2: Process Scenarios (Image -> Video)
-    controller.run_image_to_video_loop(scenario_output_folder, images_output_folder, next_step_prompt_path, args.count)
+    prefetch_depth = args.prefetch if args.prefetch is not None else controller.config["image_prefetch_depth"]
+    controller.run_image_to_video_loop(
+        scenario_output_folder, images_output_folder, next_step_prompt_path, args.count * (1 + followups),
+        producer=producer, prefetch_depth=prefetch_depth, chain_segments=args.chain
+    )
+
+    if producer:
+        producer.stop()
+        producer.join()
+    if controller.normalizer:
+        print("[*] Waiting for pending normalize jobs...")
+        controller.normalizer.stop()
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import glob
+import base64
+import shutil
+import threading
+from urllib.parse import urlsplit
+
+# ==========================================
+#             MEDIA CAPTURE
+# ==========================================
+
+DOWNLOAD_DIR = os.path.expanduser("~/Downloads")
+PARTIAL_SUFFIXES = ('.crdownload', '.tmp', '.part')
+
+# Without the generated video's URL to match, smaller video responses are taken for
+# previews / thumbnails (e.g. the gallery) and skipped
+MIN_VIDEO_BYTES = 256 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Returns a process-wide pooled requests.Session (keep-alive across downloads)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def download_to_path(url, save_path, cookies=None, headers=None, chunk_size=1024 * 256):
+    """Streams `url` into `save_path` (written to a .part file, then renamed)."""
+    partial_path = save_path + ".part"
+    try:
+        response = get_http_session().get(url, stream=True, cookies=cookies, headers=headers, timeout=(10, 120))
+        if response.status_code != 200:
+            print(f"[!] Download failed with HTTP {response.status_code}: {url[:80]}")
+            return False
+        with open(partial_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+        os.replace(partial_path, save_path)
+        return True
+    except Exception as e:
+        print(f"[!] Media download failed: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return False
+
+
+def snapshot_downloads(download_dir=DOWNLOAD_DIR):
+    """Returns the set of files currently in the download folder."""
+    return set(glob.glob(os.path.join(download_dir, "*")))
+
+
+def move_latest_download(download_dir, target_folder, new_filename, before=None, timeout=20, poll_interval=0.25):
+    """
+    Waits for a new file to appear in the download_dir and moves it to target_folder.
+    Pass `before` (from snapshot_downloads) to ignore anything that existed before the click.
+    """
+    started = time.time()
+    end_time = started + timeout
+    while time.time() < end_time:
+        files = [
+            f for f in glob.glob(os.path.join(download_dir, "*"))
+            if not f.endswith(PARTIAL_SUFFIXES) and (before is None or f not in before)
+        ]
+        if before is None:
+            # Without a snapshot, only trust files created around the click
+            files = [f for f in files if os.path.getctime(f) >= started - 10]
+
+        if files:
+            latest_file = max(files, key=os.path.getctime)
+            target_path = os.path.join(target_folder, new_filename)
+            shutil.move(latest_file, target_path)
+            print(f"[*] Moved download to: {target_path}")
+            return target_path
+
+        time.sleep(poll_interval)
+
+    return None
+
+
+def pick_media(responses, kind, min_bytes=0, match=None):
+    """
+    The latest usable `kind` response ('image' / 'video'), or None. With `match` (the URL the
+    page shows for the generated media) only responses for that same resource qualify; a video
+    without a usable `match` must be at least MIN_VIDEO_BYTES when its size is known.
+    """
+    match_path = urlsplit(match).path if match and match.startswith("http") else None
+    if kind == "video" and not match_path:
+        min_bytes = max(min_bytes, MIN_VIDEO_BYTES)
+    for response in reversed(responses):
+        if not response["mime"].startswith(kind + "/"):
+            continue
+        if response["status"] not in (200, 206) or not response["url"].startswith("http"):
+            continue
+        if match_path:
+            if urlsplit(response["url"]).path != match_path:
+                continue
+        elif response["length"] is not None and response["length"] < min_bytes:
+            continue
+        return response
+    return None
+
+
+class NetworkMediaCapture:
+    """
+    Finds generated media in the Chrome DevTools network log and saves it directly.
+
+    Requires the driver to be created with the "goog:loggingPrefs" {"performance": "ALL"}
+    capability. Call mark() right before submitting a prompt, then capture() once the
+    page reports the media is ready.
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.responses = []
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+        except Exception as e:
+            print(f"[!] Could not enable network capture: {e}")
+
+    def mark(self):
+        """Forgets everything seen so far."""
+        self._drain()
+        self.responses = []
+
+    def _drain(self):
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception:
+            return
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            if message.get("method") != "Network.responseReceived":
+                continue
+            params = message["params"]
+            response = params.get("response", {})
+            headers = {k.lower(): v for k, v in (response.get("headers") or {}).items()}
+            length = headers.get("content-length")
+            self.responses.append({
+                "request_id": params.get("requestId"),
+                "url": response.get("url", ""),
+                "mime": (response.get("mimeType") or "").lower(),
+                "status": response.get("status"),
+                "length": int(length) if str(length).isdigit() else None,
+            })
+
+    def find_media(self, kind, min_bytes=0, match=None):
+        """Returns the latest captured `kind` response (see pick_media)."""
+        self._drain()
+        return pick_media(self.responses, kind, min_bytes, match)
+
+    def capture(self, kind, target_path, timeout=30, min_bytes=0, poll_interval=0.25, match=None):
+        """Waits for a `kind` response and saves it to target_path. Returns the path or None."""
+        end_time = time.time() + timeout
+        while time.time() < end_time:
+            media = self.find_media(kind, min_bytes, match)
+            if media:
+                if self._save(media, target_path):
+                    print(f"[*] Captured {kind} to: {target_path}")
+                    return target_path
+                return None
+            time.sleep(poll_interval)
+        print(f"[!] No {kind} response captured.")
+        return None
+
+    def _save(self, media, target_path):
+        cookies = {c["name"]: c["value"] for c in self.driver.get_cookies()}
+        headers = {"User-Agent": self.driver.execute_script("return navigator.userAgent;")}
+        if download_to_path(media["url"], target_path, cookies=cookies, headers=headers):
+            return True
+
+        # Fall back to the body Chrome already has in memory
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": media["request_id"]})
+            data = base64.b64decode(body["body"]) if body.get("base64Encoded") else body["body"].encode()
+            with open(target_path + ".part", 'wb') as f:
+                f.write(data)
+            os.replace(target_path + ".part", target_path)
+            return True
+        except Exception as e:
+            print(f"[!] Could not read response body: {e}")
+        return False
+
+
+def save_generated_media(capture, kind, target_path, click_download, timeout=30, min_bytes=0, download_dir=DOWNLOAD_DIR, match=None):
+    """
+    Saves freshly generated media to target_path. Tries network capture first (only the
+    response for `match`, the generated media's URL, when given) and falls back to clicking
+    the page's Download button and moving the file out of download_dir.
+    Returns the saved path, or None.
+    """
+    if target_path:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if capture and target_path:
+        if capture.capture(kind, target_path, timeout=timeout, min_bytes=min_bytes, match=match):
+            return target_path
+
+    before = snapshot_downloads(download_dir)
+    click_download()
+    if not target_path:
+        return None
+    return move_latest_download(
+        download_dir, os.path.dirname(target_path), os.path.basename(target_path),
+        before=before, timeout=timeout
+    )
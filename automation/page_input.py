@@ -0,0 +1,50 @@
+# ==========================================
+#             PAGE INPUT
+# ==========================================
+
+# Sets the whole text in one call and fires the events React/Angular listen to.
+# Returns what the element holds afterwards so the caller can verify it.
+SET_TEXT_JS = """
+const [el, text] = arguments;
+el.focus();
+if (el.tagName === 'TEXTAREA' || el.tagName === 'INPUT') {
+    const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    // Native setter, so framework-managed inputs register the change
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, text);
+    el.dispatchEvent(new Event('input', { bubbles: true }));
+    el.dispatchEvent(new Event('change', { bubbles: true }));
+    return el.value;
+}
+const selection = window.getSelection();
+const range = document.createRange();
+range.selectNodeContents(el);
+selection.removeAllRanges();
+selection.addRange(range);
+if (!document.execCommand('insertText', false, text)) {
+    el.innerText = text;
+    el.dispatchEvent(new InputEvent('input', { bubbles: true, inputType: 'insertText', data: text }));
+}
+return el.innerText;
+"""
+
+
+def _normalize(text):
+    return " ".join((text or "").split())
+
+
+def set_input_text(driver, element, text):
+    """
+    Puts `text` into a textarea/input or contenteditable element in a single script call.
+    Falls back to typing with send_keys if the element doesn't end up holding the text.
+    """
+    try:
+        inserted = driver.execute_script(SET_TEXT_JS, element, text)
+        if _normalize(inserted) == _normalize(text):
+            return True
+        print("[!] Fast input mismatch. Falling back to typing...")
+    except Exception as e:
+        print(f"[!] Fast input failed ({e}). Falling back to typing...")
+
+    element.clear()
+    element.send_keys(text)
+    return False
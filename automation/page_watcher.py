@@ -0,0 +1,124 @@
+import time
+
+# ==========================================
+#             PAGE WATCHER
+# ==========================================
+
+# Runs inside the page. Re-evaluates `condition` on every DOM mutation (throttled)
+# and resolves as soon as it returns something truthy, or with the last value when
+# the chunk timeout elapses.
+WATCH_JS = """
+const [conditionSource, conditionArgs, timeoutMs, done] = arguments;
+const condition = new Function('args', conditionSource);
+const check = () => { try { return condition(conditionArgs); } catch (e) { return null; } };
+
+const first = check();
+if (first) { done(first); return; }
+
+let finished = false;
+let scheduled = false;
+const observer = new MutationObserver(() => {
+    if (scheduled || finished) return;
+    scheduled = true;
+    setTimeout(() => {
+        scheduled = false;
+        const result = check();
+        if (result) finish(result);
+    }, 200);
+});
+const timer = setTimeout(() => finish(check()), timeoutMs);
+function finish(value) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(value || null);
+}
+observer.observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true, characterData: true
+});
+"""
+
+# Condition bodies receive `args` (list) and return a truthy status string when done.
+# Looks at toasts/alerts first; the body fallback uses innerText, i.e. only rendered text
+# (no <script> contents, hidden nodes or echoed prompts).
+RATE_LIMIT_CHECK_JS = """
+const rateLimitNotices = document.querySelectorAll(
+    "[role='alert'], [role='status'], [data-sonner-toast], [class*='toast']"
+);
+for (const notice of rateLimitNotices) {
+    if ((notice.textContent || '').toLowerCase().includes('rate limit')) return 'rate_limited';
+}
+if ((document.body.innerText || '').toLowerCase().includes('rate limit reached')) return 'rate_limited';
+"""
+
+# args[0]: src of the latest video before submitting (null on a fresh page).
+GROK_VIDEO_READY_JS = RATE_LIMIT_CHECK_JS + """
+const btn = document.querySelector("button[aria-label='Download']");
+if (!btn || btn.disabled) return null;
+const videos = Array.from(document.querySelectorAll('video'))
+    .map(v => v.currentSrc || v.src)
+    .filter(Boolean);
+const latest = videos.length ? videos[videos.length - 1] : null;
+if (args[0] && latest === args[0]) return null;
+return 'ready';
+"""
+
+# args[0]: number of '.markdown' responses before sending the prompt.
+GEMINI_RESPONSE_STARTED_JS = """
+return document.querySelectorAll('.markdown').length > args[0] ? 'started' : null;
+"""
+
+# args[0]: number of 'single-image' elements before sending the prompt.
+GEMINI_IMAGE_READY_JS = """
+const images = document.querySelectorAll('single-image');
+if (images.length <= args[0]) return null;
+const last = images[images.length - 1];
+return last.querySelector("button[aria-label='Download full size image']") ? 'ready' : null;
+"""
+
+LATEST_VIDEO_SRC_JS = """
+const videos = Array.from(document.querySelectorAll('video'))
+    .map(v => v.currentSrc || v.src)
+    .filter(Boolean);
+return videos.length ? videos[videos.length - 1] : null;
+"""
+
+
+def is_rate_limited(driver):
+    """Checks for the provider's rate-limit notice in one script call."""
+    try:
+        return driver.execute_script(RATE_LIMIT_CHECK_JS + "return null;") == "rate_limited"
+    except Exception:
+        return False
+
+
+def count_elements(driver, css_selector):
+    """Counts matching elements in one script call (no WebElement round trips)."""
+    try:
+        return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", css_selector)
+    except Exception:
+        return 0
+
+
+def wait_for_page(driver, condition_js, timeout, args=(), chunk=10, poll_interval=0.5):
+    """
+    Blocks until `condition_js` returns a truthy value in the page, or `timeout` expires.
+    Returns the condition's value, or None on timeout.
+    """
+    deadline = time.time() + timeout
+    driver.set_script_timeout(chunk + 5)
+
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        try:
+            result = driver.execute_async_script(
+                WATCH_JS, condition_js, list(args), int(min(chunk, remaining) * 1000)
+            )
+            if result:
+                return result
+        except Exception:
+            # Page navigated or the script was torn down; observe again shortly.
+            time.sleep(poll_interval)
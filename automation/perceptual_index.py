@@ -0,0 +1,379 @@
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from itertools import combinations
+from video_stitch import probe, require_ffmpeg
+from video_qc import sample_frames, load_numpy
+
+# ==========================================
+#             PERCEPTUAL INDEX
+# ==========================================
+
+# 64-bit perceptual hashes (pHash or dHash) of generated images and sampled video keyframes,
+# computed with NumPy over a whole frame stack at once. Hashes are kept in SQLite and in an
+# in-memory multi-index hash table, so a Hamming-distance search across thousands of artifacts
+# only compares a handful of candidates. A new output whose frames land within max_distance of one
+# artifact is a visual duplicate of it.
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perceptual_index.db")
+
+# Frames this flat (pixel std dev) hash alike whatever they show; they are skipped
+FLAT_FRAME_STD = 4.0
+
+
+class DuplicateOutputError(Exception):
+    """Raised when a generated output looks like one already produced."""
+    pass
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _pack(bits):
+    """(n, 64) booleans -> n ints."""
+    np = load_numpy()
+    return [int.from_bytes(row.tobytes(), "big") for row in np.packbits(bits, axis=1)]
+
+
+def _dct_matrix(n):
+    np = load_numpy()
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n)).astype(np.float32)
+
+
+def phash(frames):
+    """pHash of each 32x32 frame: low 8x8 DCT coefficients against their median."""
+    np = load_numpy()
+    dct = _dct_matrix(frames.shape[-1])
+    coeffs = dct @ frames.astype(np.float32) @ dct.T
+    low = coeffs[:, :8, :8].reshape(len(frames), 64)
+    # The DC term only carries brightness; leave it out of the median
+    return _pack(low > np.median(low[:, 1:], axis=1, keepdims=True))
+
+
+def dhash(frames):
+    """dHash of each 8x9 (rows x cols) frame: is each pixel brighter than its left neighbour."""
+    return _pack((frames[:, :, 1:] > frames[:, :, :-1]).reshape(len(frames), 64))
+
+
+# name: (hash function, decode width, decode height)
+ALGORITHMS = {
+    "phash": (phash, 32, 32),
+    "dhash": (dhash, 9, 8),
+}
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over Hamming distance. Each 64-bit hash is split into `chunks`
+    substrings with a table each; a hash within `radius` bits of a query differs in at most
+    radius // chunks bits of at least one substring (pigeonhole), so only those table
+    neighbours are candidates and the full distance is computed for them alone.
+    """
+    def __init__(self, radius, chunks=4, bits=64):
+        self.radius = radius
+        self.chunks = chunks
+        self.width = bits // chunks
+        self.mask = (1 << self.width) - 1
+        # Every substring flip pattern of up to radius // chunks bits
+        self.flips = [0] + [
+            sum(1 << bit for bit in bits_set)
+            for count in range(1, radius // chunks + 1)
+            for bits_set in combinations(range(self.width), count)
+        ]
+        self.tables = [{} for _ in range(chunks)]
+        self.refs = {}
+
+    def _substrings(self, value):
+        return [(value >> (i * self.width)) & self.mask for i in range(self.chunks)]
+
+    def add(self, value, ref):
+        self.refs.setdefault(value, []).append(ref)
+        for table, substring in zip(self.tables, self._substrings(value)):
+            table.setdefault(substring, set()).add(value)
+
+    def remove(self, value, ref):
+        refs = self.refs.get(value, [])
+        if ref in refs:
+            refs.remove(ref)
+        if refs:
+            return
+        self.refs.pop(value, None)
+        for table, substring in zip(self.tables, self._substrings(value)):
+            bucket = table.get(substring)
+            if bucket:
+                bucket.discard(value)
+                if not bucket:
+                    del table[substring]
+
+    def search(self, value):
+        """Returns [(ref, distance)] for every hash within `radius` of `value`."""
+        candidates = set()
+        for table, substring in zip(self.tables, self._substrings(value)):
+            for flip in self.flips:
+                bucket = table.get(substring ^ flip)
+                if bucket:
+                    candidates |= bucket
+        found = []
+        for candidate in candidates:
+            distance = hamming(value, candidate)
+            if distance <= self.radius:
+                found.extend((ref, distance) for ref in self.refs[candidate])
+        return found
+
+
+class PerceptualIndex:
+    """
+    Persistent perceptual-hash index (SQLite, WAL) with an in-memory MultiIndexHash per kind.
+
+    An artifact is indexed under the queue item that produced it and a name within that item
+    (e.g. "image", "base_video"), as one hash per image or keyframe. Files are never touched,
+    so store-managed blobs stay where they are. check_and_add() looks among other items'
+    artifacts of the same kind for one matching at least frame_ratio of the new one's frames
+    within max_distance bits; a match is returned and the new artifact is not indexed.
+    Re-indexing an item's artifact (e.g. a retry) replaces its previous hashes.
+    """
+    def __init__(self, db_path=DEFAULT_DB_PATH, algorithm="phash", max_distance=8, frame_ratio=0.6, keyframes=5):
+        if algorithm not in ALGORITHMS:
+            raise Exception(f"Unknown perceptual hash '{algorithm}'. Use one of: {', '.join(ALGORITHMS)}.")
+        self.algorithm = algorithm
+        self.max_distance = max_distance
+        self.frame_ratio = frame_ratio
+        self.keyframes = keyframes
+        self.lock = threading.Lock()
+        self.tables = {}   # kind -> MultiIndexHash of (item, name) refs
+        self.paths = {}    # (kind, item, name) -> path the hashes were taken from
+
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS visual_hashes (
+                algorithm TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                item TEXT NOT NULL,
+                name TEXT NOT NULL,
+                frame INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                path TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (algorithm, kind, item, name, frame)
+            );
+        """)
+        rows = self.conn.execute(
+            "SELECT kind, item, name, hash, path FROM visual_hashes WHERE algorithm = ?", (algorithm,)
+        )
+        for kind, item, name, value, path in rows:
+            self._table(kind).add(int(value, 16), (item, name))
+            self.paths[(kind, item, name)] = path
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _table(self, kind):
+        if kind not in self.tables:
+            self.tables[kind] = MultiIndexHash(self.max_distance)
+        return self.tables[kind]
+
+    # ---------- Hashing ----------
+
+    def _hash_frames(self, frames):
+        fn, _, _ = ALGORITHMS[self.algorithm]
+        textured = frames.reshape(len(frames), -1).std(axis=1) > FLAT_FRAME_STD
+        return fn(frames[textured]) if textured.any() else []
+
+    def hash_image(self, path):
+        _, width, height = ALGORITHMS[self.algorithm]
+        return self._hash_frames(sample_frames(path, 0, 1, width, height))
+
+    def hash_video(self, path):
+        _, width, height = ALGORITHMS[self.algorithm]
+        duration = probe(path)["duration"]
+        return self._hash_frames(sample_frames(path, duration, self.keyframes, width, height))
+
+    def hash_file(self, kind, path):
+        return self.hash_image(path) if kind == "image" else self.hash_video(path)
+
+    # ---------- Search ----------
+
+    def _find(self, kind, hashes, item=None):
+        """
+        (description, mean distance) of the other item's artifact matching the most frames,
+        if it matches enough. Artifacts of `item` itself are never a match.
+        """
+        table = self.tables.get(kind)
+        if not table or not hashes:
+            return None, None
+        votes = {}
+        for value in hashes:
+            best = {}
+            for ref, distance in table.search(value):
+                if ref[0] != item and distance < best.get(ref, self.max_distance + 1):
+                    best[ref] = distance
+            for ref, distance in best.items():
+                votes.setdefault(ref, []).append(distance)
+        if not votes:
+            return None, None
+        ref, distances = max(votes.items(), key=lambda entry: (len(entry[1]), -sum(entry[1])))
+        if len(distances) < self.frame_ratio * len(hashes):
+            return None, None
+        match_item, match_name = ref
+        path = self.paths.get((kind, match_item, match_name), "")
+        return f"item {match_item} {match_name} ({os.path.basename(path)})", sum(distances) / len(distances)
+
+    def _add(self, kind, item, name, path, hashes):
+        """Indexes `hashes` as the (item, name) artifact, replacing what it had before."""
+        ref = (item, name)
+        table = self._table(kind)
+        previous = self.conn.execute(
+            "SELECT hash FROM visual_hashes WHERE algorithm = ? AND kind = ? AND item = ? AND name = ?",
+            (self.algorithm, kind, item, name)
+        ).fetchall()
+        for (value,) in previous:
+            table.remove(int(value, 16), ref)
+
+        now = time.time()
+        rows = [(self.algorithm, kind, item, name, frame, f"{value:016x}", path, now) for frame, value in enumerate(hashes)]
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "DELETE FROM visual_hashes WHERE algorithm = ? AND kind = ? AND item = ? AND name = ?",
+                (self.algorithm, kind, item, name)
+            )
+            self.conn.executemany("INSERT INTO visual_hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        for value in hashes:
+            table.add(value, ref)
+        self.paths[(kind, item, name)] = path
+
+    def find(self, kind, path, item=None):
+        """Returns (duplicate_of, distance) for a file without indexing it."""
+        hashes = self.hash_file(kind, path)
+        with self.lock:
+            return self._find(kind, hashes, str(item) if item is not None else path)
+
+    def add(self, kind, item, name, path):
+        """Indexes a file as artifact `name` of queue item `item`. Returns the number of hashes."""
+        hashes = self.hash_file(kind, path)
+        with self.lock:
+            self._add(kind, str(item), name, path, hashes)
+        return len(hashes)
+
+    def check_and_add(self, kind, item, name, path):
+        """
+        Returns (duplicate_of, distance) if `path` looks like another item's artifact,
+        otherwise indexes it and returns (None, None).
+        """
+        hashes = self.hash_file(kind, path)
+        if not hashes:
+            return None, None
+        item = str(item)
+        with self.lock:
+            duplicate_of, distance = self._find(kind, hashes, item)
+            if duplicate_of:
+                return duplicate_of, distance
+            self._add(kind, item, name, path, hashes)
+        return None, None
+
+    def enforce(self, kind, item, name, path):
+        """check_and_add() that raises DuplicateOutputError; the caller marks the item, the file is left alone."""
+        duplicate_of, distance = self.check_and_add(kind, item, name, path)
+        if duplicate_of:
+            raise DuplicateOutputError(
+                f"{os.path.basename(path)} looks like {duplicate_of} (distance {distance:.1f})"
+            )
+
+    def counts(self):
+        """Returns {kind: artifacts} for the current algorithm."""
+        with self.lock:
+            return dict(self.conn.execute("""
+                SELECT kind, COUNT(*) FROM (
+                    SELECT DISTINCT kind, item, name FROM visual_hashes WHERE algorithm = ?
+                ) GROUP BY kind
+            """, (self.algorithm,)).fetchall())
+
+
+def start_visual_index(config):
+    """The index from config["visual_dedup"], or None (disabled / no ffmpeg / no numpy)."""
+    settings = config["visual_dedup"]
+    if not settings["enabled"]:
+        return None
+    try:
+        require_ffmpeg()
+        load_numpy()
+    except Exception as e:
+        print(f"[!] {e} Visual duplicates are not checked.")
+        return None
+    return PerceptualIndex(
+        algorithm=settings["hash"], max_distance=settings["max_distance"],
+        frame_ratio=settings["frame_ratio"], keyframes=settings["keyframes"]
+    )
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+VIDEO_EXTENSIONS = (".mp4", ".webm", ".mov")
+
+
+def _kind(path):
+    return "image" if path.lower().endswith(IMAGE_EXTENSIONS) else "video"
+
+
+if __name__ == "__main__":
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Index generated images/videos by perceptual hash and look up visual duplicates.")
+    parser.add_argument("--db", type=str, default=DEFAULT_DB_PATH, help="Path to the index database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Index every image and video under the given folders.")
+    add_parser.add_argument("folders", type=str, nargs="+")
+
+    check_parser = subparsers.add_parser("check", help="Show the closest indexed artifact of each file.")
+    check_parser.add_argument("paths", type=str, nargs="+")
+
+    subparsers.add_parser("status", help="Show indexed artifacts per kind.")
+    args = parser.parse_args()
+
+    settings = load_config()["visual_dedup"]
+    index = PerceptualIndex(
+        args.db, settings["hash"], settings["max_distance"], settings["frame_ratio"], settings["keyframes"]
+    )
+
+    if args.command == "add":
+        require_ffmpeg()
+        added = 0
+        for folder in args.folders:
+            for root, _, files in os.walk(folder):
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                        path = os.path.abspath(os.path.join(root, name))
+                        try:
+                            # Files indexed by hand have no queue item; each one stands for itself
+                            index.add(_kind(path), path, _kind(path), path)
+                            added += 1
+                        except Exception as e:
+                            print(f"[!] Could not index {path}: {e}")
+        print(f"[*] Indexed {added} files. {index.counts()}")
+    elif args.command == "check":
+        require_ffmpeg()
+        for path in args.paths:
+            start = time.perf_counter()
+            duplicate_of, distance = index.find(_kind(path), os.path.abspath(path))
+            elapsed = (time.perf_counter() - start) * 1000
+            if duplicate_of:
+                print(f"[*] {path}: looks like {duplicate_of} (distance {distance:.1f}, {elapsed:.1f} ms)")
+            else:
+                print(f"[*] {path}: no visual duplicate ({elapsed:.1f} ms)")
+    else:
+        print(index.counts())
@@ -0,0 +1,252 @@
+import json
+import time
+import queue as queue_lib
+import threading
+from rate_governor import RateLimitError
+
+# ==========================================
+#             SCENARIO PIPELINE
+# ==========================================
+
+
+# Sent in the same chat after the first batch, so Gemini keeps the context and avoids repeats.
+FOLLOWUP_PROMPT = (
+    "Great. Now give me another batch of completely new scenarios in exactly the same JSON format. "
+    "Every scenario must differ from all previous ones in this chat, and use new keys."
+)
+
+# Fields every scenario must have to be queued.
+REQUIRED_FIELDS = ("Subject", "Action")
+
+
+def clean_scenario_file(filepath, required_fields=REQUIRED_FIELDS):
+    """Drops malformed scenarios from a batch file (rewritten in place). Returns how many remain."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[!] Error reading {filepath}: {e}")
+        return 0
+    if not isinstance(data, dict):
+        data = {}
+
+    valid = {
+        str(key): scenario for key, scenario in data.items()
+        if isinstance(scenario, dict) and all(str(scenario.get(field) or "").strip() for field in required_fields)
+    }
+    if len(valid) != len(data):
+        print(f"[!] Dropped {len(data) - len(valid)} malformed scenarios from {filepath}.")
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(valid, f, indent=4, ensure_ascii=False)
+    return len(valid)
+
+
+class ScenarioProducer(threading.Thread):
+    """
+    Runs Phase 1 in the background and feeds every extracted batch straight into
+    the ScenarioQueue, so video workers can start on it immediately.
+
+    Each of the `count` chats asks for one batch plus `followups` more batches in the same
+    chat, which skips the new-chat overhead. Generation pauses while the concept already
+    has `max_depth` pending scenarios (backpressure; None = never pause). `done` is set
+    once the producer has finished or was stopped.
+    """
+    def __init__(self, bot, queue, provider, concept, prompt_text, output_folder, count, max_depth=20, poll_interval=5, ledger=None,
+                 followups=0, followup_prompt=FOLLOWUP_PROMPT, name="Producer"):
+        super().__init__(daemon=True, name=name)
+        self.bot = bot
+        self.ledger = ledger
+        self.followups = followups
+        self.followup_prompt = followup_prompt
+        self.queue = queue
+        self.provider = provider
+        self.concept = concept
+        self.prompt_text = prompt_text
+        self.output_folder = output_folder
+        self.count = count
+        self.max_depth = max_depth
+        self.poll_interval = poll_interval
+        self.done = threading.Event()
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _wait_for_room(self):
+        if self.max_depth is None:
+            return not self.stop_event.is_set()
+        while not self.stop_event.is_set():
+            pending = self.queue.counts(self.provider, self.concept).get("pending", 0)
+            if pending < self.max_depth:
+                return True
+            self.stop_event.wait(self.poll_interval)
+        return False
+
+    def _batch(self, label, prompt_text, new_chat):
+        attempt = self.ledger.start("gemini", self.concept, label, mode="scenario") if self.ledger else None
+        output_path = self.bot.generate_and_save(prompt_text, self.output_folder, new_chat=new_chat)
+        if attempt:
+            attempt.finish("success" if output_path else "failed")
+        if not output_path:
+            print(f"[!] [{self.name}] Batch {label} failed.")
+            return False
+        clean_scenario_file(output_path)
+        added = self.queue.import_file(output_path, self.provider, self.concept)
+        print(f"[*] [{self.name}] Queued {added} scenarios from {label}.")
+        return True
+
+    def run(self):
+        try:
+            for i in range(self.count):
+                if not self._wait_for_room():
+                    break
+                print(f"\n[{self.name}] Chat {i+1}/{self.count}")
+                if not self._batch(f"batch{i+1}", self.prompt_text, new_chat=True):
+                    continue
+                for j in range(self.followups):
+                    # A failed follow-up usually means the chat went off the rails; start a new one
+                    if not self._wait_for_room() or not self._batch(f"batch{i+1}.{j+1}", self.followup_prompt, new_chat=False):
+                        break
+        except Exception as e:
+            print(f"[!] [{self.name}] Stopped: {e}")
+        finally:
+            self.done.set()
+
+
+class ProducerGroup(threading.Thread):
+    """
+    Runs several ScenarioProducers (one Gemini tab each) and looks like a single
+    producer to consumers: `done` is set once all of them have finished.
+    """
+    def __init__(self, producers):
+        super().__init__(daemon=True)
+        self.producers = producers
+        self.done = threading.Event()
+
+    def stop(self):
+        for producer in self.producers:
+            producer.stop()
+
+    def run(self):
+        for producer in self.producers:
+            producer.start()
+        for producer in self.producers:
+            producer.join()
+        self.done.set()
+
+
+def wait_for_scenario(queue, provider, concept, producer=None, worker=None, poll_interval=2, stop_event=None):
+    """
+    Claims the next scenario. While a producer is still running, waits for it to
+    queue more instead of returning empty-handed (unless `stop_event` is set).
+    """
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            return None, None, None
+        # Read `done` before claiming so a final batch queued in between isn't missed
+        finished = producer is None or producer.done.is_set()
+        item_id, key, scenario = queue.claim(provider, concept, worker=worker)
+        if scenario or finished:
+            return item_id, key, scenario
+        time.sleep(poll_interval)
+
+
+class PrefetchStage(threading.Thread):
+    """
+    Claims scenarios ahead of the consumer and runs `prepare(item_id, key, scenario)` on them
+    (e.g. Gemini image + next-step JSON) while the consumer works on earlier items.
+
+    At most `depth` prepared items wait in the hand-off queue. Items still staged when
+    the stage is stopped are handed back to the ScenarioQueue and `discard(artifacts)`
+    cleans up what was prepared for them.
+
+    A RateLimitError from prepare() is reported to `governor` as (rate_provider, account) and
+    the item goes back to the queue without costing an attempt; prepare() is expected to
+    call governor.acquire(), which parks until the cooldown is over. Without a governor
+    the stage stops instead.
+    """
+    def __init__(self, prepare, queue, provider, concept, depth=1, producer=None, discard=None,
+                 governor=None, rate_provider=None, account="default"):
+        super().__init__(daemon=True)
+        self.prepare = prepare
+        self.queue = queue
+        self.provider = provider
+        self.concept = concept
+        self.producer = producer
+        self.discard = discard
+        self.governor = governor
+        self.rate_provider = rate_provider or provider
+        self.account = account
+        self.ready = queue_lib.Queue(maxsize=max(1, depth))
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        """
+        Stops preparing, waits for the stage thread to exit and returns anything still
+        staged to the ScenarioQueue (without costing those items an attempt).
+        """
+        self.stop_event.set()
+        self.join()
+        while True:
+            try:
+                staged = self.ready.get_nowait()
+            except queue_lib.Empty:
+                break
+            if staged is None:
+                continue
+            item_id, key, scenario, artifacts = staged
+            self.queue.release(item_id, "Prefetched item not consumed", count_attempt=False)
+            if self.discard:
+                self.discard(artifacts)
+
+    def next_item(self):
+        """Blocks until the next prepared (item_id, key, scenario, artifacts), or None when finished."""
+        while True:
+            try:
+                return self.ready.get(timeout=1)
+            except queue_lib.Empty:
+                if not self.is_alive() and self.ready.empty():
+                    return None
+
+    def _hand_off(self, staged):
+        while not self.stop_event.is_set():
+            try:
+                self.ready.put(staged, timeout=1)
+                return True
+            except queue_lib.Full:
+                continue
+        return False
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                item_id, key, scenario = wait_for_scenario(
+                    self.queue, self.provider, self.concept, self.producer, worker="prefetch",
+                    stop_event=self.stop_event
+                )
+                if not scenario:
+                    break
+
+                print(f"[*] [Prefetch] Preparing {key}...")
+                try:
+                    artifacts = self.prepare(item_id, key, scenario)
+                except RateLimitError as e:
+                    self.queue.release(item_id, e, count_attempt=False)
+                    if not self.governor:
+                        print("[!] [Prefetch] Rate limit hit. Stopping stage.")
+                        break
+                    # The next prepare() parks in governor.acquire() until the cooldown is over
+                    self.governor.report_rate_limit(self.rate_provider, self.account)
+                    continue
+                except Exception as e:
+                    print(f"[!] [Prefetch] Failed to prepare {key}: {e}")
+                    self.queue.release(item_id, e)
+                    continue
+
+                if not self._hand_off((item_id, key, scenario, artifacts)):
+                    self.queue.release(item_id, "Prefetch stage stopped", count_attempt=False)
+                    if self.discard:
+                        self.discard(artifacts)
+                    break
+        finally:
+            self._hand_off(None)
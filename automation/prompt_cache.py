@@ -0,0 +1,109 @@
+import os
+import time
+import sqlite3
+import threading
+from artifact_store import prompt_hash
+
+# ==========================================
+#             PROMPT CACHE
+# ==========================================
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_cache.db")
+
+# Scenario fields joined into the video prompt, in order.
+VIDEO_PROMPT_FIELDS = ("Subject", "Action", "Scene", "Style", "Sounds", "TechnicalDetails", "Technical(Negative Prompt)")
+
+
+def build_video_prompt(scenario):
+    """Joins the scenario's non-empty fields into the text-to-video prompt."""
+    return " ".join(f"{field}: {scenario[field]}" for field in VIDEO_PROMPT_FIELDS if scenario.get(field))
+
+
+class PromptCache:
+    """
+    Maps (provider, mode, normalized prompt hash) to a video in the ArtifactStore.
+
+    restore() places the stored video at the output path instead of rendering it again.
+    Entries expire after ttl_seconds; beyond max_entries the least recently hit ones go.
+    """
+    def __init__(self, store, db_path=DEFAULT_CACHE_PATH, ttl_seconds=30 * 24 * 3600, max_entries=5000):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS prompt_cache (
+                provider TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                blob_path TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_hit_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (provider, mode, prompt_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_prompt_cache_lru ON prompt_cache (last_hit_at);
+        """)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def lookup(self, provider, mode, prompt):
+        """Returns the cached blob path, or None (miss, expired, or evicted from the store)."""
+        digest = prompt_hash(prompt)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT blob_path, created_at FROM prompt_cache WHERE provider = ? AND mode = ? AND prompt_hash = ?",
+                (provider, mode, digest)
+            ).fetchone()
+            if not row:
+                return None
+            if now - row["created_at"] > self.ttl_seconds or not os.path.exists(row["blob_path"]):
+                self.conn.execute(
+                    "DELETE FROM prompt_cache WHERE provider = ? AND mode = ? AND prompt_hash = ?",
+                    (provider, mode, digest)
+                )
+                return None
+            self.conn.execute(
+                "UPDATE prompt_cache SET last_hit_at = ?, hits = hits + 1 WHERE provider = ? AND mode = ? AND prompt_hash = ?",
+                (now, provider, mode, digest)
+            )
+        return row["blob_path"]
+
+    def add(self, provider, mode, prompt, blob_path):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO prompt_cache (provider, mode, prompt_hash, blob_path, created_at, last_hit_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (provider, mode, prompt_hash(prompt), blob_path, now, now))
+            self.conn.execute("""
+                DELETE FROM prompt_cache WHERE rowid IN (
+                    SELECT rowid FROM prompt_cache ORDER BY last_hit_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def restore(self, provider, mode, prompt, output_path):
+        """Places a cached render at output_path. Returns True on a hit."""
+        blob_path = self.lookup(provider, mode, prompt)
+        if not blob_path:
+            return False
+        self.store.link(blob_path, output_path)
+        return True
+
+    def save(self, provider, mode, prompt, output_path, scenario_key=None):
+        """Adds a fresh render to the store and caches it under its prompt."""
+        if not os.path.exists(output_path):
+            return None
+        blob_path = self.store.put_file(
+            output_path, "video", provider, scenario_key, prompt_hash(prompt), link_to=output_path
+        )
+        self.add(provider, mode, prompt, blob_path)
+        return blob_path
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+# ==========================================
+#             RATE GOVERNOR
+# ==========================================
+
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_state.json")
+
+
+class RateLimitError(Exception):
+    """Raised when a provider shows its rate-limit message."""
+    def __init__(self, message="Rate Limit Reached"):
+        super().__init__(message)
+
+
+class _AccountState:
+    def __init__(self, cooldown):
+        self.submissions = deque(maxlen=1000)   # timestamps of accepted submissions
+        self.since_last_limit = 0               # submissions since the previous limit hit
+        self.learned_quota = None               # submissions allowed per window
+        self.learned_window = None              # seconds until the quota resets
+        self.cooldown = cooldown                # next parking duration
+        self.parked_until = 0.0
+        self.tokens = 1.0
+        self.last_refill = time.time()
+
+
+class RateGovernor:
+    """
+    Paces submissions per (provider, account) and survives rate limits.
+
+    - Every submission is timestamped.
+    - On a limit hit the account is parked for its cooldown. The submissions accepted within
+      the window before the hit (learned window, else the cooldown) become the learned quota;
+      the cooldown that lets the account resume becomes the learned window. A hit right after
+      resuming doubles the cooldown; hits reported while already parked are ignored.
+    - Once a quota/window is known, a token bucket spaces submissions at
+      quota / window so the account stays just under the limit.
+    """
+    def __init__(self, config, state_path=DEFAULT_STATE_PATH):
+        self.limits = config.get("rate_limits", {})
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self._load()
+
+    def _settings(self, provider):
+        settings = {"cooldown": 900, "max_cooldown": 7200}
+        settings.update(self.limits.get(provider, {}))
+        return settings
+
+    def _state(self, provider, account):
+        key = f"{provider}:{account}"
+        if key not in self.accounts:
+            self.accounts[key] = _AccountState(self._settings(provider)["cooldown"])
+        return self.accounts[key]
+
+    def _refill(self, state):
+        now = time.time()
+        if state.learned_quota and state.learned_window:
+            rate = state.learned_quota / state.learned_window
+            state.tokens = min(float(state.learned_quota), state.tokens + (now - state.last_refill) * rate)
+        else:
+            state.tokens = 1.0  # Nothing learned yet: don't pace
+        state.last_refill = now
+
+    def acquire(self, provider, account="default", stop_event=None):
+        """Blocks until `account` may submit again (cooldown over and a token available)."""
+        while True:
+            with self.lock:
+                state = self._state(provider, account)
+                now = time.time()
+                if now < state.parked_until:
+                    delay = state.parked_until - now
+                    print(f"[*] [{provider}:{account}] Parked for {delay / 60:.1f} more minutes.")
+                else:
+                    self._refill(state)
+                    if state.tokens >= 1:
+                        state.tokens -= 1
+                        state.submissions.append(now)
+                        state.since_last_limit += 1
+                        return True
+                    rate = state.learned_quota / state.learned_window
+                    delay = (1 - state.tokens) / rate
+
+            # Sleep in short steps so a stop request is honoured promptly
+            step = min(delay, 60)
+            if stop_event:
+                if stop_event.wait(step):
+                    return False
+            else:
+                time.sleep(step)
+
+    def report_success(self, provider, account="default"):
+        with self.lock:
+            state = self._state(provider, account)
+            if state.parked_until and time.time() >= state.parked_until:
+                # First success after parking: the cooldown was long enough
+                state.learned_window = state.cooldown
+                state.cooldown = self._settings(provider)["cooldown"]
+                state.parked_until = 0.0
+                self._save()
+
+    def report_rate_limit(self, provider, account="default"):
+        """Parks the account. Returns the seconds until it may submit again."""
+        settings = self._settings(provider)
+        with self.lock:
+            state = self._state(provider, account)
+            now = time.time()
+            if now < state.parked_until:
+                # Another worker on this account already reported this hit
+                return state.parked_until - now
+
+            # Submissions inside the window before the hit; the one that hit it wasn't accepted
+            window = state.learned_window or state.cooldown
+            recent = sum(1 for stamp in state.submissions if stamp >= now - window)
+            accepted = max(min(state.since_last_limit, recent) - 1, 0)
+            if accepted:
+                state.learned_quota = accepted
+            elif state.parked_until:
+                # Hit again right after resuming: the window is longer than we waited
+                state.cooldown = min(state.cooldown * 2, settings["max_cooldown"])
+
+            state.since_last_limit = 0
+            state.tokens = 0.0
+            state.last_refill = now
+            state.parked_until = now + state.cooldown
+            print(f"[!] [{provider}:{account}] Rate limited after {accepted} submissions. "
+                  f"Parking for {state.cooldown / 60:.0f} minutes.")
+            self._save()
+            return state.cooldown
+
+    def _save(self):
+        data = {
+            key: {
+                "learned_quota": state.learned_quota,
+                "learned_window": state.learned_window,
+                "cooldown": state.cooldown,
+                "parked_until": state.parked_until,
+            }
+            for key, state in self.accounts.items()
+        }
+        try:
+            with open(self.state_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4)
+            os.replace(self.state_path + ".tmp", self.state_path)
+        except OSError as e:
+            print(f"[!] Could not save rate state: {e}")
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[!] Could not read rate state: {e}")
+            return
+        for key, saved in data.items():
+            provider = key.split(":", 1)[0]
+            state = _AccountState(saved.get("cooldown") or self._settings(provider)["cooldown"])
+            state.learned_quota = saved.get("learned_quota")
+            state.learned_window = saved.get("learned_window")
+            state.parked_until = saved.get("parked_until") or 0.0
+            self.accounts[key] = state
@@ -0,0 +1,144 @@
+import re
+import json
+import time
+
+# ==========================================
+#             RESPONSE JSON
+# ==========================================
+
+# args[0]: number of '.markdown' responses before sending the prompt.
+# Reads only the newest response: its last code block, its full text, and whether it's still streaming.
+LATEST_RESPONSE_JS = """
+const responses = document.querySelectorAll('.markdown');
+if (responses.length <= arguments[0]) return null;
+const latest = responses[responses.length - 1];
+const codes = latest.querySelectorAll('code');
+return {
+    code: codes.length ? codes[codes.length - 1].textContent : '',
+    text: latest.textContent || '',
+    streaming: !!document.querySelector("button[aria-label='Stop response']")
+};
+"""
+
+_TOKENS = re.compile(r'[{}"\\]')
+
+
+class JsonStreamScanner:
+    """
+    Incremental, brace-balanced scanner for the first JSON object in a growing text.
+
+    feed() the whole text seen so far; only the new suffix is scanned when it extends
+    the previous text (otherwise the scan restarts). state is "waiting" (no '{' yet),
+    "streaming" (object opened, not closed) or "complete" (object parsed, see result).
+    Balanced spans that aren't valid JSON (e.g. braces in prose) are skipped whole.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        self.pos = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.result = None
+
+    @property
+    def state(self):
+        if self.result is not None:
+            return "complete"
+        return "waiting" if self.start is None else "streaming"
+
+    def feed(self, text):
+        """Returns the parsed object once it closes, otherwise None."""
+        text = text or ""
+        if not text.startswith(self.text):
+            self.reset()
+        self.text = text
+        if self.result is not None:
+            return self.result
+
+        while True:
+            if self.start is None:
+                self.start = text.find("{", self.pos)
+                if self.start < 0:
+                    self.start = None
+                    self.pos = len(text)
+                    return None
+                self.pos = self.start + 1
+                self.depth = 1
+                self.in_string = False
+
+            match = _TOKENS.search(text, self.pos)
+            if not match:
+                self.pos = len(text)
+                return None
+            token = match.group()
+            self.pos = match.end()
+
+            if self.in_string:
+                if token == "\\":
+                    if self.pos >= len(text):
+                        # Escaped character not streamed yet; rescan the backslash next time
+                        self.pos -= 1
+                        return None
+                    self.pos += 1
+                elif token == '"':
+                    self.in_string = False
+            elif token == '"':
+                self.in_string = True
+            elif token == "{":
+                self.depth += 1
+            elif token == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        self.result = json.loads(text[self.start:self.pos])
+                        return self.result
+                    except ValueError:
+                        # Not JSON after all; resume after the whole span, so an object nested
+                        # inside it (e.g. one scenario of a broken batch) isn't taken for the payload
+                        self.start = None
+
+
+def extract_json_from_text(text):
+    """Returns the first complete JSON object in `text` (Markdown code fences are fine), or None."""
+    return JsonStreamScanner().feed(text)
+
+
+def wait_for_json(driver, previous_responses=0, timeout=60, poll_interval=0.5, settle_polls=3):
+    """
+    Polls the newest Gemini response (one script call per poll) and returns its JSON object
+    as soon as it closes, even while the rest of the answer is still streaming.
+    Returns None on timeout, or once streaming stopped and the text stayed unchanged
+    for `settle_polls` polls without a complete object.
+    """
+    code_scanner = JsonStreamScanner()
+    text_scanner = JsonStreamScanner()
+    deadline = time.time() + timeout
+    last_text, unchanged = None, 0
+
+    while time.time() < deadline:
+        try:
+            latest = driver.execute_script(LATEST_RESPONSE_JS, previous_responses)
+        except Exception:
+            latest = None
+
+        if latest:
+            # The code block is the usual home of the JSON; the full text covers unfenced answers
+            data = code_scanner.feed(latest.get("code"))
+            if data is None:
+                data = text_scanner.feed(latest.get("text"))
+            if data is not None:
+                return data
+
+            if latest.get("streaming") or latest.get("text") != last_text:
+                unchanged = 0
+            else:
+                unchanged += 1
+                if unchanged >= settle_polls:
+                    return None
+            last_text = latest.get("text")
+
+        time.sleep(poll_interval)
+    return None
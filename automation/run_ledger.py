@@ -0,0 +1,280 @@
+import os
+import json
+import math
+import time
+import argparse
+import uuid
+import atexit
+import threading
+import queue as queue_lib
+
+# ==========================================
+#             RUN LEDGER
+# ==========================================
+
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_ledger.jsonl")
+
+# Common stage names. Bots may record extra ones (e.g. "image_ready", "ext1_media_ready").
+STAGES = ("prompt_sent", "first_response", "media_ready", "download_done", "cleanup_done")
+
+_current = threading.local()
+
+
+def current_attempt():
+    """Returns the attempt running on this thread, or None."""
+    return getattr(_current, "attempt", None)
+
+
+def mark(stage):
+    """Records `stage` on this thread's attempt. No-op when nothing is being recorded."""
+    attempt = current_attempt()
+    if attempt:
+        attempt.mark(stage)
+
+
+def pause(seconds):
+    """time.sleep() that is booked as fixed sleep on this thread's attempt."""
+    attempt = current_attempt()
+    if attempt:
+        attempt.record["sleep_s"] += seconds
+    time.sleep(seconds)
+
+
+class Attempt:
+    """One try at one scenario. Created by RunLedger.start(), closed with finish()."""
+    def __init__(self, ledger, provider, concept, scenario_key, mode):
+        self.ledger = ledger
+        self.record = {
+            "attempt_id": uuid.uuid4().hex,
+            "run_id": ledger.run_id,
+            "provider": provider,
+            "concept": concept,
+            "scenario_key": scenario_key,
+            "mode": mode,
+            "started_at": time.time(),
+            "stages": {},
+            "sleep_s": 0.0,
+            "finished_at": None,
+            "outcome": None,
+            "error_class": None,
+            "error": None,
+        }
+
+    def mark(self, stage):
+        # Keep the first timestamp so retries inside a stage don't hide the original wait
+        self.record["stages"].setdefault(stage, time.time())
+
+    def finish(self, outcome="success", error=None):
+        self.record["finished_at"] = time.time()
+        self.record["outcome"] = outcome
+        if error is not None:
+            self.record["error_class"] = type(error).__name__
+            self.record["error"] = str(error)[:500]
+        if current_attempt() is self:
+            _current.attempt = None
+        self.ledger.write(self.record)
+
+
+class RunLedger:
+    """
+    Append-only JSONL ledger of scenario attempts.
+
+    Records are handed to a background thread and flushed in batches, so writing
+    never blocks the generation loop. Every attempt carries the run_id of the ledger
+    (one per process run), so throughput can leave out the gaps between runs.
+    """
+    def __init__(self, path=DEFAULT_LEDGER_PATH, flush_interval=2.0, batch_size=100):
+        self.path = path
+        self.run_id = uuid.uuid4().hex
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = queue_lib.Queue()
+        self.closed = threading.Event()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def start(self, provider, concept, scenario_key, mode="video"):
+        """Starts an attempt and makes it this thread's current attempt."""
+        attempt = Attempt(self, provider, concept, scenario_key, mode)
+        _current.attempt = attempt
+        return attempt
+
+    def write(self, record):
+        self.pending.put(record)
+
+    def _write_loop(self):
+        while not (self.closed.is_set() and self.pending.empty()):
+            batch = []
+            try:
+                batch.append(self.pending.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.pending.get_nowait())
+            except queue_lib.Empty:
+                pass
+            if batch:
+                self._append(batch)
+
+    def _append(self, batch):
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+        except Exception as e:
+            print(f"[!] Error writing run ledger: {e}")
+
+    def close(self):
+        """Flushes everything still buffered."""
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.writer.join(timeout=self.flush_interval + 5)
+
+# ==========================================
+#             STATS
+# ==========================================
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram (~2% relative error) for streaming percentiles.
+    Memory is bounded by the bucket range, not by the number of samples.
+    """
+    GROWTH = 1.02
+    MIN_SECONDS = 0.001
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        if seconds <= self.MIN_SECONDS:
+            index = 0
+        else:
+            index = int(math.log(seconds / self.MIN_SECONDS, self.GROWTH)) + 1
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.MIN_SECONDS * self.GROWTH ** index
+        return None
+
+
+class GroupStats:
+    """Running totals for one (provider, concept, mode) group."""
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.rate_limited = 0
+        self.runs = {}          # run_id -> [first start, last finish]
+        self.duration_s = 0.0
+        self.sleep_s = 0.0
+        self.total = LatencyHistogram()
+        self.stages = {}
+
+    def add(self, record):
+        started, finished = record.get("started_at"), record.get("finished_at")
+        if started is None or finished is None:
+            return
+        self.attempts += 1
+        self.successes += record.get("outcome") == "success"
+        self.rate_limited += record.get("outcome") == "rate_limited"
+        # Records written before run ids existed share one span
+        span = self.runs.setdefault(record.get("run_id"), [started, finished])
+        span[0] = min(span[0], started)
+        span[1] = max(span[1], finished)
+        self.duration_s += finished - started
+        self.sleep_s += record.get("sleep_s", 0.0)
+        self.total.add(finished - started)
+
+        # Stage latency = time since the previous stage (or the attempt start)
+        previous = started
+        for stage, stamp in sorted(record.get("stages", {}).items(), key=lambda item: item[1]):
+            self.stages.setdefault(stage, LatencyHistogram()).add(stamp - previous)
+            previous = stamp
+
+    @property
+    def active_s(self):
+        """Wall time spent generating: the sum of each run's first-start-to-last-finish span."""
+        return sum(finished - started for started, finished in self.runs.values())
+
+
+def read_ledger(path, chunk_size=10000):
+    """Yields ledger records in chunks without loading the whole file."""
+    chunk = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                chunk.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def compute_stats(path, provider=None, concept=None):
+    """Returns {(provider, concept, mode): GroupStats} for the ledger at `path`."""
+    groups = {}
+    for chunk in read_ledger(path):
+        for record in chunk:
+            if provider and record.get("provider") != provider:
+                continue
+            if concept and record.get("concept") != concept:
+                continue
+            group = (record.get("provider"), record.get("concept"), record.get("mode"))
+            groups.setdefault(group, GroupStats()).add(record)
+    return groups
+
+
+def _fmt(seconds):
+    return "-" if seconds is None else f"{seconds:.1f}s"
+
+
+def print_stats(groups):
+    for (provider, concept, mode), stats in sorted(groups.items(), key=lambda item: tuple(map(str, item[0]))):
+        span_h = max(stats.active_s, 1e-9) / 3600
+        rate_limit_pct = 100 * stats.rate_limited / stats.attempts if stats.attempts else 0
+        sleep_pct = 100 * stats.sleep_s / stats.duration_s if stats.duration_s else 0
+
+        print(f"\n=== {provider} / {concept} / {mode} ===")
+        print(f"attempts: {stats.attempts}  success: {stats.successes}  "
+              f"items/hour: {stats.successes / span_h:.1f}  rate-limited: {rate_limit_pct:.1f}%")
+        print(f"fixed sleeps: {sleep_pct:.1f}% of attempt time  real waiting: {100 - sleep_pct:.1f}%")
+        print(f"{'stage':<22}{'n':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+        rows = [("total", stats.total)] + sorted(stats.stages.items())
+        for stage, hist in rows:
+            print(f"{stage:<22}{hist.count:>7}{_fmt(hist.percentile(50)):>10}"
+                  f"{_fmt(hist.percentile(95)):>10}{_fmt(hist.percentile(99)):>10}")
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the run ledger.")
+    parser.add_argument("--ledger", type=str, default=DEFAULT_LEDGER_PATH, help="Path to the ledger JSONL.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Latency percentiles, throughput and rate-limit frequency.")
+    stats_parser.add_argument("--provider", type=str, default=None)
+    stats_parser.add_argument("--concept", type=str, default=None)
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ledger):
+        print(f"[!] Ledger '{args.ledger}' does not exist.")
+        exit(1)
+
+    if args.command == "stats":
+        print_stats(compute_stats(args.ledger, args.provider, args.concept))
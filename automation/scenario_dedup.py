@@ -0,0 +1,167 @@
+import os
+import re
+import glob
+import json
+import zlib
+import array
+import random
+import argparse
+import threading
+
+# ==========================================
+#             SCENARIO DEDUP
+# ==========================================
+
+# Fields that decide whether two scenarios are "the same video".
+DEDUP_FIELDS = ("Subject", "Action")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def scenario_text(scenario):
+    text = " ".join(str(scenario.get(field, "")) for field in DEDUP_FIELDS)
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def shingles(text, size=5):
+    """Character shingles: robust to plurals, articles and small rewordings."""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash over `num_perm` universal hash permutations. Scenarios of one concept share
+    most of their shingles, so each shingle's permuted row is cached (up to cache_size
+    shingles) and a signature is the column-wise min of its rows.
+    """
+    def __init__(self, num_perm=64, seed=1, cache_size=200000):
+        rng = random.Random(seed)
+        self.perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        self.cache_size = cache_size
+        self.rows = {}
+
+    def _row(self, shingle):
+        row = self.rows.get(shingle)
+        if row is None:
+            h = zlib.crc32(shingle.encode("utf-8"))
+            row = [(a * h + b) % _MERSENNE_PRIME for a, b in self.perms]
+            if len(self.rows) >= self.cache_size:
+                self.rows.clear()
+            self.rows[shingle] = row
+        return row
+
+    def signature(self, shingle_set):
+        rows = [self._row(s) for s in shingle_set] or [[b % _MERSENNE_PRIME for _, b in self.perms]]
+        return tuple(map(min, zip(*rows)))
+
+
+def pack_signature(signature):
+    """Signature -> bytes for storage (8 bytes per permutation)."""
+    return array.array("Q", signature).tobytes()
+
+
+def unpack_signature(data):
+    return tuple(array.array("Q", data))
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class ScenarioDeduplicator:
+    """
+    Flags scenarios whose Subject+Action nearly matches one already seen.
+
+    MinHash signatures are split into LSH bands; a lookup only compares against
+    scenarios sharing at least one band bucket, so the cost doesn't grow with the
+    corpus. Candidates are confirmed by their estimated Jaccard similarity.
+    One index per (provider, concept), loaded lazily from the signatures already known
+    (the ScenarioQueue stores each scenario's signature next to it).
+    """
+    def __init__(self, threshold=0.6, num_perm=64, bands=16):
+        self.threshold = threshold
+        self.bands = bands
+        self.num_perm = num_perm
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.lock = threading.Lock()
+        self.indexes = {}  # (provider, concept) -> {"buckets": {(band, rows): [key]}, "signatures": {key: sig}}
+
+    def is_loaded(self, provider, concept):
+        return (provider, concept) in self.indexes
+
+    def load(self, provider, concept, signatures):
+        """Indexes existing {key: signature} without checking them against each other."""
+        with self.lock:
+            index = self.indexes.setdefault((provider, concept), {"buckets": {}, "signatures": {}})
+            for key, signature in signatures.items():
+                self._add(index, key, signature)
+
+    def signature(self, scenario):
+        return self.hasher.signature(shingles(scenario_text(scenario)))
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _add(self, index, key, signature):
+        index["signatures"][key] = signature
+        for band_key in self._band_keys(signature):
+            index["buckets"].setdefault(band_key, []).append(key)
+
+    def check_and_add(self, provider, concept, key, scenario, signature=None):
+        """
+        Returns (duplicate_of, similarity) if `scenario` nearly matches an indexed one,
+        otherwise indexes it and returns (None, best_similarity).
+        """
+        signature = signature or self.signature(scenario)
+        with self.lock:
+            index = self.indexes.setdefault((provider, concept), {"buckets": {}, "signatures": {}})
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(index["buckets"].get(band_key, ()))
+            candidates.discard(key)
+
+            best_key, best = None, 0.0
+            for candidate in candidates:
+                score = similarity(signature, index["signatures"][candidate])
+                if score > best:
+                    best_key, best = candidate, score
+            if best_key is not None and best >= self.threshold:
+                return best_key, best
+
+            self._add(index, key, signature)
+            return None, best
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report near-duplicate scenarios in a folder of scenario JSON files.")
+    parser.add_argument("folder", type=str, help="Concept folder, e.g. video_scenarios/grok/animal_chef")
+    parser.add_argument("--threshold", type=float, default=0.6, help="Estimated Jaccard similarity that counts as a duplicate.")
+    args = parser.parse_args()
+
+    dedup = ScenarioDeduplicator(threshold=args.threshold)
+    total = duplicates = 0
+    for filepath in sorted(glob.glob(os.path.join(args.folder, "*.json"))):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f) or {}
+        except json.JSONDecodeError:
+            print(f"[!] Error reading {filepath}. Skipping.")
+            continue
+        for key, scenario in data.items():
+            if not isinstance(scenario, dict):
+                continue
+            total += 1
+            name = f"{os.path.basename(filepath)}:{key}"
+            duplicate_of, score = dedup.check_and_add("report", args.folder, name, scenario)
+            if duplicate_of:
+                duplicates += 1
+                print(f"{score:.2f}  {name}  ~  {duplicate_of}")
+
+    print(f"[*] {duplicates} of {total} scenarios are near-duplicates.")
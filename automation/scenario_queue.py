@@ -0,0 +1,364 @@
+import json
+import os
+import glob
+import time
+import sqlite3
+import argparse
+import threading
+from scenario_dedup import pack_signature, unpack_signature
+
+# ==========================================
+#             SCENARIO QUEUE
+# ==========================================
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenario_queue.db")
+DEFAULT_SCENARIO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "video_scenarios")
+
+# Progress of one scenario through the image-to-video flow. The artifacts of every
+# completed stage are stored with it, so a retry resumes after the last one.
+STAGES = ("SCENARIO", "IMAGE_READY", "NEXT_STEP_READY", "BASE_VIDEO", "EXTENDED_VIDEO", "DONE")
+
+
+def stage_reached(stage, target):
+    """True if `stage` is `target` or a later stage."""
+    return STAGES.index(stage) >= STAGES.index(target)
+
+
+class ScenarioQueue:
+    """
+    Persistent scenario queue backed by SQLite (WAL mode).
+
+    Scenarios move through pending -> claimed -> done. A claim is atomic, so a
+    crash between generation and ack leaves the item claimed and it is handed
+    out again once its lease expires instead of being lost or double-processed.
+    Multi-step flows checkpoint() each STAGES entry so a retry can resume.
+    With a ScenarioDeduplicator, near-duplicates of known scenarios are stored with
+    status 'duplicate' and never handed out.
+    """
+    def __init__(self, db_path=DEFAULT_DB_PATH, lease_seconds=1800, max_attempts=3, dedup=None):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.dedup = dedup
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scenarios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                provider TEXT NOT NULL,
+                concept TEXT NOT NULL,
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                last_error TEXT,
+                claimed_at REAL,
+                stage TEXT NOT NULL DEFAULT 'SCENARIO',
+                artifacts TEXT NOT NULL DEFAULT '{}',
+                minhash BLOB,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (provider, concept, source, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_scenarios_next
+                ON scenarios (provider, concept, status, id);
+            CREATE TABLE IF NOT EXISTS imported_files (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+        """)
+        # Databases created before stage checkpointing
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(scenarios)")}
+        if "stage" not in columns:
+            self.conn.execute("ALTER TABLE scenarios ADD COLUMN stage TEXT NOT NULL DEFAULT 'SCENARIO'")
+        if "artifacts" not in columns:
+            self.conn.execute("ALTER TABLE scenarios ADD COLUMN artifacts TEXT NOT NULL DEFAULT '{}'")
+        if "minhash" not in columns:
+            self.conn.execute("ALTER TABLE scenarios ADD COLUMN minhash BLOB")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # ---------- Producing ----------
+
+    def enqueue(self, provider, concept, scenarios, source="manual"):
+        """Adds a {key: scenario} dict to the queue. Returns the number of new items."""
+        now = time.time()
+        scenarios = {key: scenario for key, scenario in scenarios.items() if isinstance(scenario, dict) and scenario}
+        flags, signatures = self._flag_duplicates(provider, concept, source, scenarios) if self.dedup else ({}, {})
+        rows = [
+            (provider, concept, source, key, json.dumps(scenario, ensure_ascii=False),
+             "duplicate" if key in flags else "pending", flags.get(key),
+             pack_signature(signatures[key]) if key in signatures else None, now, now)
+            for key, scenario in scenarios.items()
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany("""
+                    INSERT OR IGNORE INTO scenarios (provider, concept, source, key, payload, status, last_error, minhash, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                inserted = self.conn.total_changes - before
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return inserted
+
+    def _flag_duplicates(self, provider, concept, source, scenarios):
+        """
+        Returns ({key: reason}, {key: signature}): the new scenarios that nearly match one
+        already known, and the MinHash signature of every new scenario (stored with it).
+        """
+        with self.lock:
+            if not self.dedup.is_loaded(provider, concept):
+                self.dedup.load(provider, concept, self._known_signatures(provider, concept))
+            existing = {row["key"] for row in self.conn.execute(
+                "SELECT key FROM scenarios WHERE provider = ? AND concept = ? AND source = ?",
+                (provider, concept, source)
+            )}
+
+        flags, signatures = {}, {}
+        for key, scenario in scenarios.items():
+            if key in existing:
+                continue
+            signatures[key] = self.dedup.signature(scenario)
+            duplicate_of, score = self.dedup.check_and_add(
+                provider, concept, f"{source}:{key}", scenario, signatures[key]
+            )
+            if duplicate_of:
+                flags[key] = f"near-duplicate of {duplicate_of} ({score:.2f})"
+        if flags:
+            print(f"[*] Flagged {len(flags)} near-duplicate scenarios from {source}.")
+        return flags, signatures
+
+    def _known_signatures(self, provider, concept):
+        """Stored signatures of the concept's scenarios; missing ones are computed and saved once."""
+        known = self.conn.execute("""
+            SELECT id, source, key, payload, minhash FROM scenarios
+            WHERE provider = ? AND concept = ? AND status != 'duplicate'
+        """, (provider, concept)).fetchall()
+        signatures, backfill = {}, []
+        for row in known:
+            signature = unpack_signature(row["minhash"]) if row["minhash"] else None
+            if not signature or len(signature) != self.dedup.num_perm:
+                signature = self.dedup.signature(json.loads(row["payload"]))
+                backfill.append((pack_signature(signature), row["id"]))
+            signatures[f"{row['source']}:{row['key']}"] = signature
+        if backfill:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("UPDATE scenarios SET minhash = ? WHERE id = ?", backfill)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return signatures
+
+    def import_file(self, filepath, provider, concept):
+        """Imports one scenario JSON file. Files unchanged since the last import are skipped."""
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+
+        with self.lock:
+            row = self.conn.execute("SELECT mtime, size FROM imported_files WHERE path = ?", (path,)).fetchone()
+        if row and row["mtime"] == stat.st_mtime and row["size"] == stat.st_size:
+            return 0
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            print(f"[!] Error reading {path}. Skipping.")
+            return 0
+
+        inserted = self.enqueue(provider, concept, data or {}, source=os.path.basename(path))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO imported_files (path, mtime, size) VALUES (?, ?, ?)",
+                (path, stat.st_mtime, stat.st_size)
+            )
+        return inserted
+
+    def import_folder(self, folder_path, provider, concept):
+        """Imports every *.json file of a single concept folder."""
+        total = 0
+        for filepath in sorted(glob.glob(os.path.join(folder_path, "*.json"))):
+            total += self.import_file(filepath, provider, concept)
+        if total:
+            print(f"[*] Imported {total} new scenarios from {folder_path}.")
+        return total
+
+    def import_tree(self, root=DEFAULT_SCENARIO_ROOT):
+        """Imports the video_scenarios/<provider>/<concept>/*.json layout."""
+        total = 0
+        for provider in sorted(os.listdir(root)):
+            provider_dir = os.path.join(root, provider)
+            if not os.path.isdir(provider_dir):
+                continue
+            for concept in sorted(os.listdir(provider_dir)):
+                concept_dir = os.path.join(provider_dir, concept)
+                if os.path.isdir(concept_dir):
+                    total += self.import_folder(concept_dir, provider, concept)
+        return total
+
+    # ---------- Consuming ----------
+
+    def claim(self, provider, concept, worker=None):
+        """Atomically claims the oldest pending scenario. Returns (item_id, key, scenario)."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("""
+                    SELECT id, key, payload FROM scenarios
+                    WHERE provider = ? AND concept = ? AND status = 'pending'
+                    ORDER BY id LIMIT 1
+                """, (provider, concept)).fetchone()
+                if row:
+                    self.conn.execute("""
+                        UPDATE scenarios
+                        SET status = 'claimed', worker = ?, claimed_at = ?, attempts = attempts + 1, updated_at = ?
+                        WHERE id = ?
+                    """, (worker, now, now, row["id"]))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        if not row:
+            return None, None, None
+        return row["id"], row["key"], json.loads(row["payload"])
+
+    def ack(self, item_id):
+        """Marks a claimed scenario as done."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE scenarios SET status = 'done', stage = 'DONE', updated_at = ? WHERE id = ?",
+                (time.time(), item_id)
+            )
+
+    def checkpoint(self, item_id, stage, artifacts=None):
+        """Records that `item_id` completed `stage`, merging `artifacts` into the stored ones."""
+        with self.lock:
+            row = self.conn.execute("SELECT artifacts FROM scenarios WHERE id = ?", (item_id,)).fetchone()
+            merged = json.loads(row["artifacts"]) if row else {}
+            merged.update(artifacts or {})
+            self.conn.execute(
+                "UPDATE scenarios SET stage = ?, artifacts = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(merged, ensure_ascii=False), time.time(), item_id)
+            )
+
+    def progress(self, item_id):
+        """Returns (stage, artifacts) of a scenario."""
+        with self.lock:
+            row = self.conn.execute("SELECT stage, artifacts FROM scenarios WHERE id = ?", (item_id,)).fetchone()
+        if not row:
+            return STAGES[0], {}
+        return row["stage"], json.loads(row["artifacts"])
+
+    def release(self, item_id, error=None, count_attempt=True):
+        """
+        Returns a claimed scenario to the queue, or fails it after max_attempts.
+        count_attempt=False hands back the claim's attempt (e.g. the provider was rate limited).
+        """
+        with self.lock:
+            self.conn.execute("""
+                UPDATE scenarios
+                SET attempts = attempts - ?,
+                    status = CASE WHEN attempts - ? >= ? THEN 'failed' ELSE 'pending' END,
+                    worker = NULL, last_error = ?, updated_at = ?
+                WHERE id = ?
+            """, (0 if count_attempt else 1, 0 if count_attempt else 1, self.max_attempts,
+                  str(error) if error else None, time.time(), item_id))
+
+    def mark_duplicate(self, item_id, reason=None):
+        """Takes a claimed scenario out of the queue as a duplicate (e.g. its output looks like another's)."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE scenarios SET status = 'duplicate', worker = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                (str(reason) if reason else None, time.time(), item_id)
+            )
+
+    def active_artifacts(self):
+        """Artifact paths checkpointed by unfinished (pending or claimed) scenarios."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT artifacts FROM scenarios WHERE status IN ('pending', 'claimed') AND artifacts != '{}'"
+            ).fetchall()
+        return [path for row in rows for path in json.loads(row["artifacts"]).values() if isinstance(path, str)]
+
+    def requeue_stale(self):
+        """Hands out again any claim whose lease expired (e.g. the worker crashed)."""
+        cutoff = time.time() - self.lease_seconds
+        with self.lock:
+            cursor = self.conn.execute("""
+                UPDATE scenarios SET status = 'pending', worker = NULL, updated_at = ?
+                WHERE status = 'claimed' AND claimed_at < ?
+            """, (time.time(), cutoff))
+        if cursor.rowcount:
+            print(f"[*] Re-queued {cursor.rowcount} stale claims.")
+        return cursor.rowcount
+
+    def counts(self, provider=None, concept=None):
+        """Returns {status: count}, optionally filtered by provider/concept."""
+        query = "SELECT status, COUNT(*) AS n FROM scenarios WHERE 1 = 1"
+        params = []
+        if provider:
+            query += " AND provider = ?"
+            params.append(provider)
+        if concept:
+            query += " AND concept = ?"
+            params.append(concept)
+        query += " GROUP BY status"
+        with self.lock:
+            return {row["status"]: row["n"] for row in self.conn.execute(query, params)}
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the persistent scenario queue.")
+    parser.add_argument("--db", type=str, default=DEFAULT_DB_PATH, help="Path to the queue database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import scenario JSON files into the queue.")
+    import_parser.add_argument("--root", type=str, default=DEFAULT_SCENARIO_ROOT, help="video_scenarios root folder.")
+    import_parser.add_argument("--dedup-threshold", type=float, default=None, help="Flag near-duplicates at this similarity.")
+
+    status_parser = subparsers.add_parser("status", help="Show queue counts.")
+    status_parser.add_argument("--provider", type=str, default=None)
+    status_parser.add_argument("--concept", type=str, default=None)
+
+    subparsers.add_parser("requeue", help="Re-queue claims whose lease expired.")
+
+    args = parser.parse_args()
+    dedup = None
+    if getattr(args, "dedup_threshold", None):
+        from scenario_dedup import ScenarioDeduplicator
+        dedup = ScenarioDeduplicator(args.dedup_threshold)
+    queue = ScenarioQueue(args.db, dedup=dedup)
+
+    if args.command == "import":
+        print(f"[*] Imported {queue.import_tree(args.root)} scenarios in total.")
+    elif args.command == "status":
+        for status, n in sorted(queue.counts(args.provider, args.concept).items()):
+            print(f"{status:>8}: {n}")
+    elif args.command == "requeue":
+        queue.requeue_stale()
+
+    queue.close()
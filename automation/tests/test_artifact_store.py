@@ -0,0 +1,72 @@
+import os
+import time
+import pytest
+from artifact_store import ArtifactStore
+
+
+def _write(folder, name, size):
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as f:
+        f.write(name.encode("utf-8").ljust(size, b"x"))
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    yield store
+    store.close()
+
+
+def test_identical_content_is_stored_once(store, tmp_path):
+    first = store.put_file(_write(tmp_path, "a.png", 100), "image", link_to=str(tmp_path / "out" / "a.png"))
+    with open(tmp_path / "b.png", 'wb') as f:
+        f.write(open(first, 'rb').read())
+    second = store.put_file(str(tmp_path / "b.png"), "image")
+    assert first == second
+    assert os.path.exists(tmp_path / "out" / "a.png")
+    assert store.stats()["blobs"] == 1
+
+
+def test_gc_evicts_least_recently_used_first(store, tmp_path):
+    paths = []
+    for i in range(3):
+        paths.append(store.put_file(_write(tmp_path, f"{i}.mp4", 100), "video"))
+        time.sleep(0.01)
+    store.touch(os.path.basename(paths[0])[:-4])
+
+    assert store.gc(200) == 100
+    assert os.path.exists(paths[0])
+    assert not os.path.exists(paths[1])
+    assert os.path.exists(paths[2])
+    assert store.stats()["bytes"] == 200
+
+
+def test_gc_skips_kept_blobs(store, tmp_path):
+    paths = [store.put_file(_write(tmp_path, f"{i}.mp4", 100), "video") for i in range(3)]
+    keep = [os.path.basename(path)[:-4] for path in paths]
+    assert store.gc(0, keep=keep) == 0
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_find_ignores_evicted_blobs(store, tmp_path):
+    store.put_file(_write(tmp_path, "a.png", 100), "image", provider="grok", prompt_hash="p")
+    assert store.find("image", prompt_hash="p")
+    store.gc(0)
+    assert store.find("image", prompt_hash="p") is None
+
+
+def test_automatic_gc_spares_blobs_still_in_use(tmp_path):
+    in_use = []
+    store = ArtifactStore(str(tmp_path / "store"), max_bytes=150, keep=lambda: in_use + [str(tmp_path / "elsewhere.png")])
+    checkpoint = store.put_file(_write(tmp_path, "image.png", 100), "image")
+    in_use.append(checkpoint)
+    time.sleep(0.01)
+    # Over max_bytes now, but the checkpointed image belongs to an unfinished item
+    # and the new blob hasn't been checkpointed yet
+    video = store.put_file(_write(tmp_path, "video.mp4", 100), "video")
+    assert os.path.exists(checkpoint) and os.path.exists(video)
+    time.sleep(0.01)
+    store.put_file(_write(tmp_path, "short.mp4", 100), "short")
+    assert os.path.exists(checkpoint) and not os.path.exists(video)
+    store.close()
@@ -0,0 +1,32 @@
+from media_capture import pick_media, MIN_VIDEO_BYTES
+
+
+def _response(url, mime="video/mp4", length=None, status=200):
+    return {"request_id": url, "url": url, "mime": mime, "status": status, "length": length}
+
+
+GENERATED = "https://assets.example.com/users/1/generated/abc/generated_video.mp4"
+RESPONSES = [
+    _response(GENERATED + "?cache=1", length=4_000_000, status=206),
+    _response("https://assets.example.com/users/1/generated/old/generated_video.mp4", length=3_000_000),
+    _response("https://assets.example.com/gallery/preview.mp4", length=80_000),
+    _response("https://assets.example.com/thumb.jpg", mime="image/jpeg", length=60_000),
+]
+
+
+def test_match_picks_the_generated_video_over_later_ones():
+    assert pick_media(RESPONSES, "video", match=GENERATED)["url"] == GENERATED + "?cache=1"
+
+
+def test_match_without_response_finds_nothing():
+    assert pick_media(RESPONSES, "video", match="https://assets.example.com/other/video.mp4") is None
+
+
+def test_without_match_small_videos_are_skipped():
+    assert pick_media(RESPONSES, "video")["url"].endswith("/old/generated_video.mp4")
+    assert pick_media(RESPONSES, "video", match="blob:https://grok.com/1234")["length"] >= MIN_VIDEO_BYTES
+
+
+def test_images_keep_their_own_minimum():
+    assert pick_media(RESPONSES, "image")["url"].endswith("thumb.jpg")
+    assert pick_media(RESPONSES, "image", min_bytes=100_000) is None
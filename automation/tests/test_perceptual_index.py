@@ -0,0 +1,71 @@
+import pytest
+from perceptual_index import PerceptualIndex, DuplicateOutputError, MultiIndexHash
+
+FRAMES = [0x0123456789ABCDEF, 0xFEDCBA9876543210, 0x0F0F0F0F0F0F0F0F]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = PerceptualIndex(str(tmp_path / "index.db"), max_distance=8)
+    # Hashes come from the file name here; decoding needs ffmpeg and numpy
+    index.hash_file = lambda kind, path: list(HASHES[path])
+    yield index
+    index.close()
+
+
+HASHES = {
+    "a.png": FRAMES[:1],
+    "a_again.png": [FRAMES[0] ^ 0b111],
+    "b.png": FRAMES[1:2],
+    "a.mp4": FRAMES,
+}
+
+
+def test_other_items_near_match_is_a_duplicate(index, tmp_path):
+    assert index.check_and_add("image", 1, "image", "a.png") == (None, None)
+    duplicate_of, distance = index.check_and_add("image", 2, "image", "a_again.png")
+    assert duplicate_of.startswith("item 1 image") and distance == 3
+    assert index.check_and_add("image", 3, "image", "b.png") == (None, None)
+    assert index.counts() == {"image": 2}
+
+
+def test_retry_of_same_item_is_not_a_duplicate(index):
+    index.check_and_add("image", 1, "image", "a.png")
+    assert index.check_and_add("image", 1, "image", "a_again.png") == (None, None)
+    # The retry replaced the first attempt's hashes
+    assert index.counts() == {"image": 1}
+    index.enforce("image", 2, "image", "b.png")
+
+
+def test_search_is_limited_to_the_same_kind(index):
+    index.add("video", 1, "base_video", "a.mp4")
+    assert index.check_and_add("image", 2, "image", "a.png") == (None, None)
+
+
+def test_enforce_raises_and_leaves_the_file_alone(index, tmp_path):
+    index.check_and_add("image", 1, "image", "a.png")
+    blob = tmp_path / "a_again.png"
+    blob.write_bytes(b"png")
+    HASHES[str(blob)] = HASHES["a_again.png"]
+    with pytest.raises(DuplicateOutputError):
+        index.enforce("image", 2, "image", str(blob))
+    assert blob.exists()
+
+
+def test_index_is_reloaded_from_disk(index, tmp_path):
+    index.check_and_add("image", 1, "image", "a.png")
+    reloaded = PerceptualIndex(str(tmp_path / "index.db"), max_distance=8)
+    reloaded.hash_file = index.hash_file
+    assert reloaded.check_and_add("image", 2, "image", "a_again.png")[0].startswith("item 1")
+    reloaded.close()
+
+
+def test_multi_index_remove():
+    table = MultiIndexHash(8)
+    table.add(FRAMES[0], "a")
+    table.add(FRAMES[0], "b")
+    table.remove(FRAMES[0], "a")
+    assert table.search(FRAMES[0]) == [("b", 0)]
+    table.remove(FRAMES[0], "b")
+    assert table.search(FRAMES[0]) == []
+    assert all(not t for t in table.tables)
@@ -0,0 +1,53 @@
+import pytest
+from pipeline import PrefetchStage
+from rate_governor import RateGovernor, RateLimitError
+from scenario_queue import ScenarioQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = ScenarioQueue(str(tmp_path / "queue.db"), max_attempts=1)
+    queue.enqueue("image_to_video", "cats", {"s1": {"scene": "one"}, "s2": {"scene": "two"}})
+    yield queue
+    queue.close()
+
+
+def test_prefetch_survives_a_rate_limit(queue, tmp_path):
+    governor = RateGovernor({"rate_limits": {"gemini": {"cooldown": 0.01}}}, state_path=str(tmp_path / "rate.json"))
+    calls = []
+
+    def prepare(item_id, key, scenario):
+        calls.append(key)
+        governor.acquire("gemini")
+        if len(calls) == 1:
+            raise RateLimitError()
+        return {"image_path": f"{key}.png"}
+
+    stage = PrefetchStage(prepare, queue, "image_to_video", "cats", depth=2, governor=governor, rate_provider="gemini")
+    stage.start()
+    delivered = []
+    while True:
+        staged = stage.next_item()
+        if staged is None:
+            break
+        item_id, key, _, artifacts = staged
+        queue.ack(item_id)
+        delivered.append((key, artifacts["image_path"]))
+    stage.stop()
+
+    assert calls == ["s1", "s1", "s2"]
+    assert delivered == [("s1", "s1.png"), ("s2", "s2.png")]
+    # The rate-limited claim didn't use up the item's only attempt
+    assert queue.counts() == {"done": 2}
+    assert governor.accounts["gemini:default"].parked_until > 0
+
+
+def test_prefetch_without_governor_stops_on_rate_limit(queue):
+    def prepare(item_id, key, scenario):
+        raise RateLimitError()
+
+    stage = PrefetchStage(prepare, queue, "image_to_video", "cats")
+    stage.start()
+    assert stage.next_item() is None
+    stage.stop()
+    assert queue.counts() == {"pending": 2}
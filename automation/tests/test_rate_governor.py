@@ -0,0 +1,67 @@
+import time
+import pytest
+from rate_governor import RateGovernor
+
+
+@pytest.fixture
+def governor(tmp_path):
+    config = {"rate_limits": {"grok": {"cooldown": 100, "max_cooldown": 400}}}
+    return RateGovernor(config, state_path=str(tmp_path / "rate_state.json"))
+
+
+def test_unlearned_account_is_not_paced(governor):
+    for _ in range(10):
+        assert governor.acquire("grok") is True
+
+
+def test_limit_learns_quota_and_parks(governor):
+    for _ in range(6):
+        governor.acquire("grok")
+    assert governor.report_rate_limit("grok") == 100
+    state = governor.accounts["grok:default"]
+    # The sixth submission is the one that hit the limit
+    assert state.learned_quota == 5
+    assert state.parked_until > time.time()
+
+
+def test_repeated_report_while_parked_is_ignored(governor):
+    governor.acquire("grok")
+    governor.acquire("grok")
+    governor.report_rate_limit("grok")
+    remaining = governor.report_rate_limit("grok")
+    state = governor.accounts["grok:default"]
+    assert 0 < remaining <= 100
+    assert state.cooldown == 100
+    assert state.learned_quota == 1
+
+
+def test_hit_right_after_resuming_doubles_cooldown(governor):
+    governor.acquire("grok")
+    governor.acquire("grok")
+    governor.report_rate_limit("grok")
+    state = governor.accounts["grok:default"]
+    state.parked_until = time.time() - 1
+    # Limited again by the very first submission after the cooldown
+    governor.acquire("grok")
+    governor.report_rate_limit("grok")
+    assert state.cooldown == 200
+
+
+def test_acquire_returns_false_when_stopped_while_parked(governor):
+    class Stopped:
+        def wait(self, timeout):
+            return True
+
+    governor.report_rate_limit("grok")
+    assert governor.acquire("grok", stop_event=Stopped()) is False
+
+
+def test_state_survives_restart(governor, tmp_path):
+    for _ in range(4):
+        governor.acquire("grok")
+    governor.report_rate_limit("grok")
+    reloaded = RateGovernor({}, state_path=str(tmp_path / "rate_state.json"))
+    state = reloaded.accounts["grok:default"]
+    assert state.learned_quota == 3
+    assert state.cooldown == 100
+    assert state.parked_until > time.time()
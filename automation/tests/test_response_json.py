@@ -0,0 +1,46 @@
+from response_json import JsonStreamScanner, extract_json_from_text
+
+
+def test_object_is_returned_once_it_closes():
+    scanner = JsonStreamScanner()
+    text = 'Here you go:\n```json\n{"scene": {"shot": "wide"}, "n": 1}\n```'
+    close = text.rindex("}")
+    for end in range(close):
+        assert scanner.feed(text[:end]) is None
+    assert scanner.feed(text) == {"scene": {"shot": "wide"}, "n": 1}
+    assert scanner.state == "complete"
+
+
+def test_states():
+    scanner = JsonStreamScanner()
+    assert scanner.feed("thinking") is None and scanner.state == "waiting"
+    assert scanner.feed('thinking {"a": ') is None and scanner.state == "streaming"
+    assert scanner.feed('thinking {"a": 1}') == {"a": 1}
+
+
+def test_braces_and_escapes_inside_strings():
+    text = r'{"prompt": "a {brace} and a \"quote\" and \\", "n": 2}'
+    assert extract_json_from_text(text) == {"prompt": 'a {brace} and a "quote" and \\', "n": 2}
+
+
+def test_escape_split_across_feeds():
+    scanner = JsonStreamScanner()
+    assert scanner.feed('{"a": "x\\') is None
+    assert scanner.feed('{"a": "x\\"y"}') == {"a": 'x"y'}
+
+
+def test_unparseable_span_is_skipped_whole():
+    # The nested object belongs to the broken span and must not be returned
+    text = 'set {x: {"inner": 1}} then {"payload": true}'
+    assert extract_json_from_text(text) == {"payload": True}
+
+
+def test_rewritten_text_restarts_scan():
+    scanner = JsonStreamScanner()
+    scanner.feed('{"a": 1')
+    assert scanner.feed('{"b": 2}') == {"b": 2}
+
+
+def test_no_object():
+    assert extract_json_from_text("no json here") is None
+    assert extract_json_from_text(None) is None
@@ -0,0 +1,20 @@
+import json
+from run_ledger import compute_stats
+
+
+def _record(run_id, started, finished, outcome="success"):
+    return {"run_id": run_id, "provider": "grok", "concept": "cats", "mode": "video",
+            "started_at": started, "finished_at": finished, "outcome": outcome, "stages": {}, "sleep_s": 0.0}
+
+
+def test_items_per_hour_ignores_gaps_between_runs(tmp_path):
+    path = tmp_path / "ledger.jsonl"
+    records = [
+        _record("a", 0, 600), _record("a", 600, 1800),
+        # The next run starts a day later
+        _record("b", 86400, 87000), _record("b", 87000, 88200, "rate_limited"),
+    ]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    stats = compute_stats(str(path))[("grok", "cats", "video")]
+    assert stats.active_s == 3600
+    assert stats.successes / (stats.active_s / 3600) == 3
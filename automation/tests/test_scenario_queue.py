@@ -0,0 +1,102 @@
+import time
+import pytest
+from scenario_queue import ScenarioQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = ScenarioQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=2)
+    queue.enqueue("grok", "cats", {"s1": {"scene": "one"}, "s2": {"scene": "two"}})
+    yield queue
+    queue.close()
+
+
+def test_claim_hands_out_oldest_pending_once(queue):
+    first = queue.claim("grok", "cats", worker="a")
+    second = queue.claim("grok", "cats", worker="b")
+    assert first[1] == "s1" and first[2] == {"scene": "one"}
+    assert second[1] == "s2"
+    assert queue.claim("grok", "cats") == (None, None, None)
+    assert queue.counts() == {"claimed": 2}
+
+
+def test_enqueue_ignores_known_keys(queue):
+    assert queue.enqueue("grok", "cats", {"s1": {"scene": "changed"}, "s3": {"scene": "three"}}) == 1
+
+
+def test_release_counts_attempts_until_failed(queue):
+    item_id, _, _ = queue.claim("grok", "cats")
+    queue.release(item_id, "boom")
+    assert queue.claim("grok", "cats")[0] == item_id
+    queue.release(item_id, "boom again")
+    assert queue.counts() == {"failed": 1, "pending": 1}
+
+
+def test_release_without_counting_keeps_item_pending(queue):
+    item_id, _, _ = queue.claim("grok", "cats")
+    for _ in range(5):
+        queue.release(item_id, "rate limited", count_attempt=False)
+        assert queue.claim("grok", "cats")[0] == item_id
+    queue.ack(item_id)
+    assert queue.counts() == {"done": 1, "pending": 1}
+
+
+def test_checkpoint_merges_artifacts(queue):
+    item_id, _, _ = queue.claim("grok", "cats")
+    queue.checkpoint(item_id, "IMAGE_READY", {"image": "a.png"})
+    queue.checkpoint(item_id, "NEXT_STEP_READY", {"next_step": "a.json"})
+    assert queue.progress(item_id) == ("NEXT_STEP_READY", {"image": "a.png", "next_step": "a.json"})
+
+
+def test_requeue_stale_only_touches_expired_claims(queue):
+    stale_id, _, _ = queue.claim("grok", "cats")
+    fresh_id, _, _ = queue.claim("grok", "cats")
+    queue.conn.execute("UPDATE scenarios SET claimed_at = ? WHERE id = ?", (time.time() - 120, stale_id))
+    assert queue.requeue_stale() == 1
+    assert queue.claim("grok", "cats")[0] == stale_id
+    assert queue.counts() == {"claimed": 2}
+    queue.ack(fresh_id)
+
+
+def test_active_artifacts_cover_unfinished_items_only(queue):
+    done_id, _, _ = queue.claim("grok", "cats")
+    queue.checkpoint(done_id, "IMAGE_READY", {"image_path": "done.png"})
+    queue.ack(done_id)
+    item_id, _, _ = queue.claim("grok", "cats")
+    queue.checkpoint(item_id, "NEXT_STEP_READY", {"image_path": "a.png", "next_step_path": "a.json"})
+    queue.release(item_id, "retry")
+    assert sorted(queue.active_artifacts()) == ["a.json", "a.png"]
+
+
+def test_dedup_signatures_are_stored_and_reused(tmp_path):
+    from scenario_dedup import ScenarioDeduplicator
+    path = str(tmp_path / "dedup.db")
+    scenario = {"Subject": "A cat chef", "Action": "cooks pasta in a tiny kitchen"}
+
+    queue = ScenarioQueue(path, dedup=ScenarioDeduplicator(0.6))
+    queue.enqueue("grok", "cats", {"s1": scenario})
+    queue.close()
+
+    dedup = ScenarioDeduplicator(0.6)
+    dedup.signature = lambda s: pytest.fail("known scenarios must not be re-hashed")
+    queue = ScenarioQueue(path, dedup=dedup)
+    assert queue._known_signatures("grok", "cats")
+    queue.close()
+
+    queue = ScenarioQueue(path, dedup=ScenarioDeduplicator(0.6))
+    queue.enqueue("grok", "cats", {"s2": dict(scenario, Action="cooks pasta in a tiny kitchen!")})
+    assert queue.counts() == {"pending": 1, "duplicate": 1}
+    queue.close()
+
+
+def test_dedup_backfills_rows_without_signature(tmp_path):
+    from scenario_dedup import ScenarioDeduplicator
+    path = str(tmp_path / "legacy.db")
+    queue = ScenarioQueue(path)
+    queue.enqueue("grok", "cats", {"s1": {"Subject": "A cat chef", "Action": "cooks pasta"}})
+    queue.close()
+
+    queue = ScenarioQueue(path, dedup=ScenarioDeduplicator(0.6))
+    queue.enqueue("grok", "cats", {"s2": {"Subject": "A dog pilot", "Action": "flies over mountains"}})
+    assert queue.conn.execute("SELECT COUNT(*) FROM scenarios WHERE minhash IS NULL").fetchone()[0] == 0
+    queue.close()
@@ -0,0 +1,46 @@
+import os
+import time
+import pytest
+from video_normalize import NormalizeQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = NormalizeQueue(str(tmp_path / "jobs.db"), lease_seconds=60)
+    for name in ("a", "b"):
+        src = tmp_path / f"{name}.mp4"
+        src.write_bytes(name.encode("utf-8"))
+        queue.add(str(src), str(tmp_path / "out" / f"{name}.mp4"), "settings")
+    yield queue
+    queue.close()
+
+
+def _owned_by(queue, job_id, owner, claimed_at=None):
+    queue.conn.execute(
+        "UPDATE jobs SET owner = ?, claimed_at = ? WHERE id = ?", (owner, claimed_at or time.time(), job_id)
+    )
+
+
+def test_live_owners_keep_their_jobs(queue):
+    mine = queue.claim()
+    theirs = queue.claim()
+    _owned_by(queue, theirs["id"], f"{queue.host}:{os.getppid()}")
+    assert queue.requeue_stale() == 0
+    assert queue.counts() == {"running": 2}
+    queue.done(mine["id"], "hash")
+
+
+def test_jobs_of_dead_owner_are_requeued(queue):
+    job = queue.claim()
+    # A pid far above any pid_max in use
+    _owned_by(queue, job["id"], f"{queue.host}:999999999")
+    assert queue.requeue_stale() == 1
+    assert queue.claim()["id"] == job["id"]
+
+
+def test_other_hosts_jobs_wait_for_the_lease(queue):
+    job = queue.claim()
+    _owned_by(queue, job["id"], "other-host:1")
+    assert queue.requeue_stale() == 0
+    _owned_by(queue, job["id"], "other-host:1", time.time() - 120)
+    assert queue.requeue_stale() == 1
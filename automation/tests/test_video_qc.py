@@ -0,0 +1,21 @@
+import os
+import time
+from video_qc import DEFAULT_SETTINGS, sample_count, prune_rejected
+
+
+def test_samples_are_close_enough_to_measure_freezes():
+    assert sample_count(6.0, DEFAULT_SETTINGS) == DEFAULT_SETTINGS["frames"]
+    for duration in (20.0, 45.0, 60.0):
+        count = sample_count(duration, DEFAULT_SETTINGS)
+        assert duration / count <= DEFAULT_SETTINGS["max_freeze_seconds"] / 2
+
+
+def test_prune_rejected_keeps_newest(tmp_path):
+    for i in range(4):
+        (tmp_path / f"clip{i}.qc_rejected.mp4").write_bytes(b"x")
+        os.utime(tmp_path / f"clip{i}.qc_rejected.mp4", (time.time() + i, time.time() + i))
+    (tmp_path / "clip9.mp4").write_bytes(b"x")
+    prune_rejected(str(tmp_path), 2)
+    assert sorted(os.listdir(tmp_path)) == ["clip2.qc_rejected.mp4", "clip3.qc_rejected.mp4", "clip9.mp4"]
+    prune_rejected(str(tmp_path), 0)
+    assert os.listdir(tmp_path) == ["clip9.mp4"]
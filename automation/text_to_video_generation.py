@@ -1,97 +1,48 @@
 import json
-import time
 import os
-import glob
-import sys
-import subprocess
 import argparse
-import re
-import random
+import uuid
+import asyncio
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
+from scenario_queue import ScenarioQueue
+from scenario_dedup import ScenarioDeduplicator
+from browser import launch_chrome_debugger, connect_driver, DEFAULT_PROFILE
+from pipeline import ScenarioProducer, ProducerGroup, wait_for_scenario, FOLLOWUP_PROMPT
+from worker_pool import WorkerPool, build_worker_specs
+from config import load_config
+from page_watcher import (
+    wait_for_page, count_elements, LATEST_VIDEO_SRC_JS,
+    GROK_VIDEO_READY_JS, GEMINI_RESPONSE_STARTED_JS, is_rate_limited
+)
+from run_ledger import RunLedger, mark, pause
+from page_input import set_input_text
+from response_json import wait_for_json
+from media_capture import NetworkMediaCapture, save_generated_media
+from rate_governor import RateGovernor, RateLimitError
+from artifact_store import ArtifactStore
+from prompt_cache import PromptCache, build_video_prompt
+from video_normalize import start_normalizer, normalized_path
+from video_qc import start_quality_gate
+from perceptual_index import start_visual_index, DuplicateOutputError
 
 # ==========================================
 #             SHARED UTILITIES
 # ==========================================
 
-def launch_chrome_debugger():
-    """
-    Launches Chrome in remote debugging mode if it's not already running.
-    """
-    # Verify this path matches your OS
-    chrome_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-    user_data_dir = os.path.expanduser("~/gemini-bot") 
-    port = "9222"
+# Selenium is imported on first use (see _load_selenium), so importing this module stays cheap.
+By = WebDriverWait = EC = Keys = ActionChains = None
 
-    is_running = os.system(f"lsof -i :{port} > /dev/null 2>&1")
-    
-    if is_running == 0:
-        print(f"[*] Chrome is already running on port {port}. Connecting...")
-        return
-
-    print(f"[*] Launching Chrome on port {port}...")
-    cmd = [
-        chrome_path,
-        f"--remote-debugging-port={port}",
-        f"--user-data-dir={user_data_dir}"
-    ]
-    
-    try:
-        subprocess.Popen(cmd)
-        time.sleep(4) 
-    except FileNotFoundError:
-        print(f"[!] Could not find Chrome at: {chrome_path}")
-        sys.exit(1)
-
-def get_next_scenario(folder_path):
-    # Sort files to ensure processing order
-    files = sorted(glob.glob(os.path.join(folder_path, "*.json")))
-    
-    for filepath in files:
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if not data:
-                print(f"[*] File {os.path.basename(filepath)} is empty. Deleting...")
-                os.remove(filepath)
-                continue
-            
-            first_key = next(iter(data))
-            return filepath, first_key, data[first_key]
-            
-        except json.JSONDecodeError:
-            print(f"[!] Error reading {filepath}. Skipping.")
-            continue
-            
-    return None, None, None
 
-def remove_scenario_from_file(filepath, key):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if key in data:
-            del data[key]
-        
-        if not data:
-            print(f"[*] All scenarios done in {os.path.basename(filepath)}. Deleting file.")
-            os.remove(filepath)
-        else:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            print(f"[*] Removed '{key}' from {os.path.basename(filepath)}.")
-            
-    except Exception as e:
-        print(f"[!] Error updating file: {e}")
+def _load_selenium():
+    """Binds the Selenium names used by the bots below. Called before any driver is touched."""
+    global By, WebDriverWait, EC, Keys, ActionChains
+    if By is not None:
+        return
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.common.action_chains import ActionChains
 
 def get_generation_prompt(prompt_path):
     """Reads a random text file from the prompts folder."""   
@@ -102,120 +53,90 @@ def get_generation_prompt(prompt_path):
         print(f"[!] Error reading prompt file: {e}")
         return None
 
-def extract_json_from_text(text):
-    """Extracts JSON object from a string using regex, handling Markdown blocks."""
-    # Pattern to find JSON block enclosed in ```json ... ``` or just { ... }
-    # 1. Try finding markdown code block first
-    match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if not match:
-        # 2. Try finding just the outer braces
-        match = re.search(r"(\{.*\})", text, re.DOTALL)
-    
-    if match:
-        json_str = match.group(1)
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            print("[!] Text found looks like JSON but failed to parse.")
-            return None
-    return None
-
 # ==========================================
 #             PLATFORM CLASSES
 # ==========================================
 
 class GeminiScenarioGenerator:
     """Handles generating new scenarios via Gemini chat."""
-    def __init__(self, driver, wait):
+    def __init__(self, driver, wait, config=None):
+        _load_selenium()
         self.driver = driver
         self.wait = wait
+        self.config = config or load_config()
+        self.tab_handle = None # Pinned tab when running next to the video workers
 
-    def generate_and_save(self, prompt_text, output_folder):
+    def generate_and_save(self, prompt_text, output_folder, new_chat=True):
         print("\n--- Starting Scenario Generation ---")
         
         # 1. Focus Tab
         self._focus_tab()
 
-        # 2. Start New Chat
-        self._new_chat()
+        # 2. Start New Chat (follow-up batches stay in the current one)
+        if new_chat:
+            self._new_chat()
 
         # 3. Send Prompt
         print("[*] Sending scenario generation prompt...")
+        previous_responses = count_elements(self.driver, ".markdown")
         try:
             input_box = self.wait.until(EC.presence_of_element_located(
                 (By.CSS_SELECTOR, "div[contenteditable='true']")
             ))
-            input_box.clear()
-            # Send keys in chunks if too long, or just send
-            self.driver.execute_script("arguments[0].innerText = arguments[1];", input_box, prompt_text)
-            input_box.send_keys(" ") # Trigger event
-            time.sleep(1)
+            set_input_text(self.driver, input_box, prompt_text)
+            pause(0.3)
             input_box.send_keys(Keys.ENTER)
+            mark("prompt_sent")
         except Exception as e:
             print(f"[!] Error sending prompt: {e}")
             return False
 
         # 4. Wait for and Extract Response
         print("[*] Waiting for Gemini to generate scenarios...")
-        time.sleep(10) # Initial buffer
-        
-        # Wait for "stopped" state or long enough time. 
-        # Strategy: Poll for the latest message content until it contains "}"
-        max_retries = 30
-        extracted_data = None
-        
-        for i in range(max_retries):
-            try:
-                # Get all response containers
-                print(f"[*] Checking for Gemini response... (Attempt {i})")
-                # METHOD A: Get all markdown text (General purpose)
-                # Use CSS Selector '.markdown' to match "markdown markdown-main-panel..."
-                responses = self.driver.find_elements(By.CSS_SELECTOR, ".markdown")
-                
-                if responses:
-                    # Get the text of the very last response
-                    last_response_text = responses[-1].text
-                    extracted_data = extract_json_from_text(last_response_text)
-                
-                # METHOD B: Fallback - Target the code block directly (Specific to your HTML snippet)
-                if not extracted_data:
-                    code_blocks = self.driver.find_elements(By.TAG_NAME, "code")
-                    if code_blocks:
-                        last_code_text = code_blocks[-1].text
-                        extracted_data = extract_json_from_text(last_code_text)
-                
-                if extracted_data:
-                    print("[*] Successfully extracted JSON data.")
-                    break
-            except Exception as e:
-                print(e)
-                pass
-            time.sleep(2)
+        if wait_for_page(
+            self.driver, GEMINI_RESPONSE_STARTED_JS, self.config["timeouts"]["gemini_response"],
+            args=[previous_responses], chunk=self.config["watch_chunk"], poll_interval=self.config["poll_interval"]
+        ):
+            mark("first_response")
+        # Returns as soon as the JSON object closes, even if Gemini is still writing after it
+        extracted_data = wait_for_json(
+            self.driver, previous_responses,
+            timeout=self.config["timeouts"]["gemini_response"], poll_interval=self.config["poll_interval"]
+        )
+        if extracted_data:
+            print("[*] Successfully extracted JSON data.")
+            mark("media_ready")
 
         if not extracted_data:
             print("[!] Failed to extract valid JSON from Gemini response.")
             return False
 
-        # 5. Save to File
+        # 5. Save to File (random suffix: parallel tabs finish within the same second)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}.json"
+        filename = f"{timestamp}_{uuid.uuid4().hex[:8]}.json"
         output_path = os.path.join(output_folder, filename)
         
         try:
             with open(output_path, 'w', encoding='utf-8') as f:
                 json.dump(extracted_data, f, indent=4, ensure_ascii=False)
             print(f"[*] Saved new scenarios to: {output_path}")
-            return True
+            mark("download_done")
+            return output_path
         except Exception as e:
             print(f"[!] Error saving file: {e}")
             return False
 
     def _focus_tab(self):
+        if self.tab_handle:
+            self.driver.switch_to.window(self.tab_handle)
+            if self.config["base_urls"]["gemini"] not in self.driver.current_url:
+                self.driver.get(self.config["base_urls"]["gemini"])
+            return
         for handle in self.driver.window_handles:
             self.driver.switch_to.window(handle)
-            if "gemini.google.com" in self.driver.current_url:
+            if self.config["base_urls"]["gemini"] in self.driver.current_url:
                 return
-        self.driver.execute_script("window.open('https://gemini.google.com', '_blank');")
+        self.driver.execute_script("window.open(arguments[0], '_blank');", self.config["base_urls"]["gemini"])
         self.driver.switch_to.window(self.driver.window_handles[-1])
 
     def _new_chat(self):
@@ -224,54 +145,46 @@ class GeminiScenarioGenerator:
                 (By.XPATH, "//*[contains(text(), 'New chat')]")
             ))
             new_chat_btn.click()
-            time.sleep(2)
+            pause(2)
         except:
             print("[!] Could not click New Chat (might already be new).")
 
 class GeminiVideoAutomation:
     """Handles Video Generation logic (Original)."""
-    def __init__(self, driver, wait, long_wait):
+    def __init__(self, driver, wait, long_wait, config=None):
+        _load_selenium()
         self.driver = driver
         self.wait = wait
         self.long_wait = long_wait
+        self.config = config or load_config()
+        self.capture = NetworkMediaCapture(driver) if self.config["capture_mode"] == "network" else None
+        self.tab_handle = None # Pinned tab when several workers share one Chrome
 
     def focus_tab(self):
+        if self.tab_handle:
+            self.driver.switch_to.window(self.tab_handle)
+            if self.config["base_urls"]["gemini"] not in self.driver.current_url:
+                self.driver.get(self.config["base_urls"]["gemini"])
+            return
         for handle in self.driver.window_handles:
             self.driver.switch_to.window(handle)
-            if "gemini.google.com" in self.driver.current_url:
+            if self.config["base_urls"]["gemini"] in self.driver.current_url:
                 return
-        self.driver.execute_script("window.open('https://gemini.google.com', '_blank');")
+        self.driver.execute_script("window.open(arguments[0], '_blank');", self.config["base_urls"]["gemini"])
         self.driver.switch_to.window(self.driver.window_handles[-1])
 
-    def run_generation(self, scenario):
+    def run_generation(self, scenario, output_path=None):
         print("[*] Clicking 'New chat'...")
         try:
             new_chat_btn = self.wait.until(EC.element_to_be_clickable(
                 (By.XPATH, "//*[contains(text(), 'New chat')]")
             ))
             new_chat_btn.click()
-            time.sleep(2) 
+            pause(2) 
         except Exception as e:
             print(f"[!] Could not find 'New chat': {e}")
 
-        parts = []
-
-        if scenario.get("Subject"):
-            parts.append(f"Subject: {scenario['Subject']}")
-        if scenario.get("Action"):
-            parts.append(f"Action: {scenario['Action']}")
-        if scenario.get("Scene"):
-            parts.append(f"Scene: {scenario['Scene']}")
-        if scenario.get("Style"):
-            parts.append(f"Style: {scenario['Style']}")
-        if scenario.get("Sounds"):
-            parts.append(f"Sounds: {scenario['Sounds']}")
-        if scenario.get("TechnicalDetails"):
-            parts.append(f"TechnicalDetails: {scenario['TechnicalDetails']}")
-        if scenario.get("Technical(Negative Prompt)"):
-            parts.append(f"Technical(Negative Prompt): {scenario['Technical(Negative Prompt)']}")
-
-        prompt = " ".join(parts)
+        prompt = build_video_prompt(scenario)
         
         print(f"[*] Sending Video Prompt...")
 
@@ -281,102 +194,96 @@ class GeminiVideoAutomation:
                 (By.XPATH, "//button[.//span[contains(text(), 'Tools')]]")
             ))
             tools_btn.click()
-            time.sleep(1)
+            pause(1)
 
             # 2. Click Create videos
             video_menu = self.wait.until(EC.element_to_be_clickable(
                 (By.XPATH, "//div[contains(text(), 'Create videos')]")
             ))
             video_menu.click()
-            time.sleep(1)
+            pause(1)
 
             # 3. Type Prompt
             input_box = self.wait.until(EC.presence_of_element_located(
                 (By.CSS_SELECTOR, "div[contenteditable='true']")
             ))
-            input_box.clear()
-            input_box.send_keys(prompt)
-            time.sleep(1)
+            set_input_text(self.driver, input_box, prompt)
+            pause(0.3)
             
             # 4. Submit
+            if self.capture:
+                self.capture.mark()
             input_box.send_keys(Keys.ENTER)
+            mark("prompt_sent")
             
             # 5. Wait for Result & Download
-            self.download_video()
-            time.sleep(5)
+            self.download_video(output_path)
+            pause(5)
 
         except Exception as e:
             print(f"[!] Gemini Error: {e}")
             raise e
 
-    def download_video(self):
+    def download_video(self, output_path=None):
+        """Raises if the video isn't saved, so the caller releases the item for a retry."""
         print("[*] Waiting for video generation...")
         try:
             video_element = self.long_wait.until(EC.presence_of_element_located(
                 (By.TAG_NAME, "video")
             ))
-            print("[*] Video generated! Finding download button...")
-            time.sleep(2)
-
-            actions = ActionChains(self.driver)
-            actions.move_to_element(video_element).perform()
-            time.sleep(1)
-
-            download_btn = self.wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[@aria-label='Download video']")
-            ))
-            download_btn.click()
-            print("[*] Download started successfully!")
-            time.sleep(5)
+            print("[*] Video generated! Saving...")
+            mark("media_ready")
+            saved_path = save_generated_media(
+                self.capture, "video", output_path,
+                lambda: self._click_download(video_element),
+                timeout=self.config["timeouts"]["capture"],
+                match=self.driver.execute_script(LATEST_VIDEO_SRC_JS)
+            )
+            if output_path and not saved_path:
+                raise Exception("Failed to save Gemini video.")
+            mark("download_done")
         except Exception as e:
             print(f"[!] Auto-download failed: {e}")
+            raise
+
+    def _click_download(self, video_element):
+        actions = ActionChains(self.driver)
+        actions.move_to_element(video_element).perform()
+        pause(1)
+
+        download_btn = self.wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[@aria-label='Download video']")
+        ))
+        download_btn.click()
+        print("[*] Download started successfully!")
 
 class GrokAutomation:
-    def __init__(self, driver, wait, long_wait):
+    def __init__(self, driver, wait, long_wait, config=None):
+        _load_selenium()
         self.driver = driver
         self.wait = wait
         self.long_wait = long_wait
+        self.config = config or load_config()
+        self.capture = NetworkMediaCapture(driver) if self.config["capture_mode"] == "network" else None
+        self.tab_handle = None # Pinned tab when several workers share one Chrome
 
     def focus_tab(self):
+        if self.tab_handle:
+            self.driver.switch_to.window(self.tab_handle)
+            return
         for handle in self.driver.window_handles:
             self.driver.switch_to.window(handle)
-            if "grok.com" in self.driver.current_url:
+            if self.config["base_urls"]["grok"] in self.driver.current_url:
                 print("Found existing Grok tab.")
                 return
         print("Opening new Grok tab...")
-        self.driver.get("https://grok.com/imagine")
+        self.driver.get(self.config["base_urls"]["grok"] + "/imagine")
 
-    def run_generation(self, scenario):
-        self.driver.get("https://grok.com/imagine")
-        time.sleep(3)
+    def run_generation(self, scenario, output_path=None):
+        self.driver.get(self.config["base_urls"]["grok"] + "/imagine")
+        pause(3)
 
-        """
-        prompt = (
-            f"Subject: {scenario.get('Subject', '')} "
-            f"Action: {scenario.get('Action', '')} "
-            f"Scene: {scenario.get('Scene', '')} "
-            f"Style: {scenario.get('Style', '')} "
-        )
-        """
-        
-        parts = []
-
-        if scenario.get("Subject"):
-            parts.append(f"Subject: {scenario['Subject']}")
-        if scenario.get("Action"):
-            parts.append(f"Action: {scenario['Action']}")
-        if scenario.get("Scene"):
-            parts.append(f"Scene: {scenario['Scene']}")
-        if scenario.get("Style"):
-            parts.append(f"Style: {scenario['Style']}")
-        if scenario.get("Sounds"):
-            parts.append(f"Sounds: {scenario['Sounds']}")
-        if scenario.get("TechnicalDetails"):
-            parts.append(f"TechnicalDetails: {scenario['TechnicalDetails']}")
-        if scenario.get("Technical(Negative Prompt)"):
-            parts.append(f"Technical(Negative Prompt): {scenario['Technical(Negative Prompt)']}")
-
-        prompt = " ".join(parts)        
+        prompt = build_video_prompt(scenario)
 
         print(f"[*] Sending prompt to Grok: {prompt[:50]}...")
 
@@ -385,39 +292,53 @@ class GrokAutomation:
                 (By.CSS_SELECTOR, "textarea[aria-label='Ask Grok anything']")
             ))
 
-            input_box.send_keys(prompt)
-            time.sleep(1)
+            previous_video = self.driver.execute_script(LATEST_VIDEO_SRC_JS)
+            set_input_text(self.driver, input_box, prompt)
+            pause(0.3)
+            if self.capture:
+                self.capture.mark()
             input_box.send_keys(Keys.ENTER)
+            mark("prompt_sent")
             
             print("[*] Prompt submitted. Waiting for generation...")
 
-            time.sleep(5)
-            if self.is_rate_limited():
-                raise Exception("Rate Limit Reached")
-
-            # Sleep until video appears
-            # For now, just wait fixed time.
-            # TODO We can improve this later with better detection by waiting until generating message disappears
-            time.sleep(50 + random.randint(1, 5))
-
-            # Wait for specific download button
-            download_btn = self.long_wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[@aria-label='Download']")
-            ))
-            
-            print("[*] Video generated. Clicking download...")
-            download_btn.click()
-            time.sleep(5)
+            # Returns as soon as the new video is downloadable (or a rate limit shows up)
+            status = wait_for_page(
+                self.driver, GROK_VIDEO_READY_JS, self.config["timeouts"]["grok_video"],
+                args=[previous_video], chunk=self.config["watch_chunk"], poll_interval=self.config["poll_interval"]
+            )
+            if status == "rate_limited" or self.is_rate_limited():
+                raise RateLimitError()
+            if not status:
+                raise Exception("Timed out waiting for Grok video generation.")
+
+            print("[*] Video generated. Saving...")
+            mark("media_ready")
+            saved_path = save_generated_media(
+                self.capture, "video", output_path, self._click_download,
+                timeout=self.config["timeouts"]["capture"],
+                match=self.driver.execute_script(LATEST_VIDEO_SRC_JS)
+            )
+            if output_path and not saved_path:
+                raise Exception("Failed to save Grok video.")
+            mark("download_done")
 
             # Cleanup
             self.cleanup_post()
+            mark("cleanup_done")
 
+        except RateLimitError:
+            raise
         except Exception as e:
-            if "Rate Limit" in str(e):
-                raise e
             print(f"[!] Grok Error: {e}")
             raise e
 
+    def _click_download(self):
+        download_btn = self.wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[@aria-label='Download']")
+        ))
+        download_btn.click()
+
     def cleanup_post(self):
         print("[*] Starting cleanup (Unsave/Delete)...")
         try:
@@ -426,7 +347,7 @@ class GrokAutomation:
                 (By.XPATH, "//button[contains(@aria-label, 'More') or .//svg[contains(@class, 'lucide-more-horizontal')]]")
             ))
             more_menu.click()
-            time.sleep(1)
+            pause(1)
 
             # Click Unsave if present
             # Grok menu items don't consist of buttons. They are divs.
@@ -438,9 +359,9 @@ class GrokAutomation:
 
                 self.driver.execute_script("arguments[0].click();", element)
                 print("[*] Clicked 'Unsave'.")
-                time.sleep(1)
+                pause(1)
                 more_menu.click() # Re-open menu
-                time.sleep(1)
+                pause(1)
             except:
                 pass
 
@@ -459,52 +380,161 @@ class GrokAutomation:
 
             delete_button.click()            
 
-            time.sleep(2)
+            pause(2)
 
         except Exception as e:
             print(f"[!] Cleanup failed: {e}")
 
     def is_rate_limited(self):
-        try:
-            body_text = self.driver.find_element(By.TAG_NAME, "body").text
-            if "rate limit reached" in body_text.lower():
-                print("[!] Rate limit detected!")
-                return True
-        except:
-            pass
+        if is_rate_limited(self.driver):
+            print("[!] Rate limit detected!")
+            return True
         return False
 
+class CDPGrokAutomation:
+    """
+    GrokAutomation on the async CDP driver. One instance per tab; several run
+    concurrently from one event loop without a chromedriver session each.
+    """
+    def __init__(self, page, config=None):
+        self.page = page
+        self.config = config or load_config()
+        from cdp_driver import CDPMediaCapture
+        self.capture = CDPMediaCapture(page) if self.config["capture_mode"] == "network" else None
+
+    async def setup(self):
+        if self.capture:
+            await self.capture.start()
+
+    async def _pause(self, seconds, attempt=None):
+        if attempt:
+            attempt.record["sleep_s"] += seconds
+        await asyncio.sleep(seconds)
+
+    async def run_generation(self, scenario, output_path=None, attempt=None):
+        # The ledger's mark() is per thread; concurrent tabs share one, so stages go on `attempt`
+        stage = attempt.mark if attempt else (lambda name: None)
+        await self.page.navigate(self.config["base_urls"]["grok"] + "/imagine")
+
+        prompt = build_video_prompt(scenario)
+        print(f"[*] Sending prompt to Grok: {prompt[:50]}...")
+
+        input_selector = "textarea[aria-label='Ask Grok anything']"
+        if not await self.page.wait_for_selector(input_selector, self.config["timeouts"]["element"]):
+            raise Exception("Grok prompt box not found.")
+
+        previous_video = await self.page.run(LATEST_VIDEO_SRC_JS)
+        await self.page.set_text(input_selector, prompt)
+        await self._pause(0.3, attempt)
+        if self.capture:
+            self.capture.mark()
+        await self.page.press_enter()
+        stage("prompt_sent")
+
+        status = await self.page.wait_for(
+            GROK_VIDEO_READY_JS, self.config["timeouts"]["grok_video"],
+            args=[previous_video], chunk=self.config["watch_chunk"]
+        )
+        if status == "rate_limited":
+            print("[!] Rate limit detected!")
+            raise RateLimitError()
+        if not status:
+            raise Exception("Timed out waiting for Grok video generation.")
+
+        stage("media_ready")
+        from cdp_driver import save_generated_media_async
+        saved_path = await save_generated_media_async(
+            self.page, self.capture, "video", output_path,
+            download_xpath="//button[@aria-label='Download']",
+            timeout=self.config["timeouts"]["capture"],
+            match=await self.page.run(LATEST_VIDEO_SRC_JS)
+        )
+        if output_path and not saved_path:
+            raise Exception("Failed to save Grok video.")
+        stage("download_done")
+
+        await self.cleanup_post(attempt)
+        stage("cleanup_done")
+
+    async def cleanup_post(self, attempt=None):
+        print("[*] Starting cleanup (Unsave/Delete)...")
+        more_xpath = "//button[contains(@aria-label, 'More') or .//svg[contains(@class, 'lucide-more-horizontal')]]"
+        try:
+            if not await self.page.click(xpath=more_xpath):
+                raise Exception("'More' menu not found.")
+            await self._pause(1, attempt)
+
+            # Grok menu items are divs, not buttons
+            if await self.page.click(xpath="//div[@role='menuitem']//span[text()='Unsave']/.."):
+                print("[*] Clicked 'Unsave'.")
+                await self._pause(1, attempt)
+                await self.page.click(xpath=more_xpath) # Re-open menu
+                await self._pause(1, attempt)
+
+            if not await self.page.click(xpath="//div[@role='menuitem']//span[text()='Delete post']/.."):
+                raise Exception("'Delete post' menu item not found.")
+            confirm = await self.page.wait_for(
+                "return document.evaluate(args[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue ? 'found' : null;",
+                self.config["timeouts"]["element"], args=["//button[normalize-space()='Delete post']"]
+            )
+            if not confirm:
+                raise Exception("Delete confirmation not shown.")
+            await self.page.click(xpath="//button[normalize-space()='Delete post']")
+            await self._pause(2, attempt)
+
+        except Exception as e:
+            print(f"[!] Cleanup failed: {e}")
+
 # ==========================================
 #             CONTROLLER
 # ==========================================
 
 class AutomationController:
     def __init__(self, mode="gemini"):
+        _load_selenium()
         launch_chrome_debugger()        
         print(f"[*] Connecting to Chrome (Mode: {mode})...")
         
-        self.options = Options()
-        self.options.add_experimental_option("debuggerAddress", "127.0.0.1:9222")
-        
-        self.driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
-            options=self.options
-        )
-        self.wait = WebDriverWait(self.driver, 20)
-        self.long_wait = WebDriverWait(self.driver, 300)
+        self.driver = connect_driver()
+        self.config = load_config()
+        self.wait = WebDriverWait(self.driver, self.config["timeouts"]["element"])
+        self.long_wait = WebDriverWait(self.driver, self.config["timeouts"]["generation"])
         
         self.mode = mode
-        self.scenario_bot = GeminiScenarioGenerator(self.driver, self.wait)        
+        dedup = ScenarioDeduplicator(self.config["dedup"]["threshold"]) if self.config["dedup"]["enabled"] else None
+        self.queue = ScenarioQueue(dedup=dedup)
+        self.ledger = RunLedger()
+        self.governor = RateGovernor(self.config)
+        # Checkpointed images / next-step JSON of unfinished items are never evicted
+        self.store = ArtifactStore(
+            max_bytes=int(self.config["artifact_store_max_gb"] * 1e9), keep=self.queue.active_artifacts
+        )
+        self.cache = PromptCache(
+            self.store,
+            ttl_seconds=self.config["prompt_cache"]["ttl_hours"] * 3600,
+            max_entries=self.config["prompt_cache"]["max_entries"]
+        )
+        self.normalizer = start_normalizer(self.config)
+        self.quality_gate = start_quality_gate(self.config)
+        self.visual_index = start_visual_index(self.config)
+        self.scenario_bot = GeminiScenarioGenerator(self.driver, self.wait, self.config)        
         
         if mode == "gemini":
-            self.video_bot = GeminiVideoAutomation(self.driver, self.wait, self.long_wait)
+            self.video_bot = GeminiVideoAutomation(self.driver, self.wait, self.long_wait, self.config)
         elif mode == "grok":
-            self.video_bot = GrokAutomation(self.driver, self.wait, self.long_wait)
+            self.video_bot = GrokAutomation(self.driver, self.wait, self.long_wait, self.config)
         else:
             raise ValueError("Only gemini and grok mode supports video generation currently.")
 
-    def run_scenario_generation(self, prompt_path, output_folder, count):
+    def run_scenario_generation(self, prompt_path, output_folder, count, tabs=1, followups=0):
         """Phase 1: Generate Scenarios"""
+        if tabs > 1 or followups > 0:
+            # High-throughput mode: parallel tabs, several batches per chat, no backpressure
+            producers = self.start_scenario_producer(prompt_path, output_folder, count, tabs, followups, backpressure=False)
+            if producers:
+                producers.join()
+            return
+
         print(f"\n=== PHASE 1: GENERATING {count} BATCHES OF SCENARIOS ===")
         
         for i in range(count):
@@ -517,48 +547,228 @@ class AutomationController:
                 break
 
             # 2. Run Generation
+            attempt = self.ledger.start("gemini", os.path.basename(os.path.normpath(output_folder)), f"batch{i+1}", mode="scenario")
             success = self.scenario_bot.generate_and_save(prompt_text, output_folder)
             
             if success:
                 print(f"[*] Batch {i+1} completed successfully.")
+                attempt.finish("success")
             else:
                 print(f"[!] Batch {i+1} failed.")
+                attempt.finish("failed")
             
-            time.sleep(3)
+            pause(3)
+
+    def start_scenario_producer(self, prompt_path, output_folder, count, tabs=1, followups=0, backpressure=True):
+        """Phase 1 (pipelined): Generate scenarios in the background while Phase 2 consumes them"""
+        print(f"\n=== PHASE 1 (PIPELINED): {count} CHATS x {1 + followups} BATCHES OVER {tabs} TABS ===")
 
-    def run_video_generation(self, folder_path, max_videos=999):
+        prompt_text = get_generation_prompt(prompt_path)
+        if not prompt_text:
+            print("[!] No prompts found. Skipping generation.")
+            return None
+
+        concept = os.path.basename(os.path.normpath(output_folder))
+        producers = []
+        for i in range(tabs):
+            chats = count // tabs + (1 if i < count % tabs else 0)
+            if not chats:
+                continue
+            # Selenium sessions aren't thread-safe, so every producer gets its own session and tab
+            driver = connect_driver()
+            driver.switch_to.new_window('tab')
+            bot = GeminiScenarioGenerator(driver, WebDriverWait(driver, self.config["timeouts"]["element"]), self.config)
+            bot.tab_handle = driver.current_window_handle
+            producers.append(ScenarioProducer(
+                bot, self.queue, self.mode, concept, prompt_text, output_folder, chats,
+                max_depth=self.config["pipeline_max_depth"] if backpressure else None,
+                ledger=self.ledger, followups=followups,
+                followup_prompt=self.config.get("scenario_followup_prompt") or FOLLOWUP_PROMPT,
+                name=f"Producer-{i}"
+            ))
+
+        group = ProducerGroup(producers)
+        group.start()
+        return group
+
+    def run_video_generation(self, folder_path, max_videos=999, producer=None):
         """Phase 2: Generate Videos from Scenarios"""
         print(f"\n=== PHASE 2: GENERATING VIDEOS FROM {folder_path} ===")
+
+        concept = os.path.basename(os.path.normpath(folder_path))
+        self.queue.import_folder(folder_path, self.mode, concept)
+        self.queue.requeue_stale()
         
         processed_count = 0
-        while True: # Run until no files left or max count reached
+        while True: # Run until the queue is drained or max count reached
             if processed_count >= max_videos:
                 print("[*] Max video count reached.")
                 break
 
-            filepath, key, scenario = get_next_scenario(folder_path)
+            item_id, key, scenario = wait_for_scenario(self.queue, self.mode, concept, producer)
             
             if not scenario:
-                print("[!] No more scenarios found in folder.")
+                print("[!] No more scenarios found in queue.")
                 break
                 
             print(f"\n--- Processing Video Scenaro: {key} ---")
-            print(f"[*] Source File: {os.path.basename(filepath)}")
             
+            output_path = os.path.join(self.config["videos_folder"], self.mode, concept, f"{key}_{item_id}.mp4")
+
+            # Identical prompt already rendered: reuse it instead of paying for another render
+            prompt = build_video_prompt(scenario)
+            if self.cache.restore(self.mode, "video", prompt, output_path):
+                print(f"[*] Cache hit for {key}. Reused the stored video.")
+                self.queue.ack(item_id)
+                self.normalize(output_path)
+                continue
+
             self.video_bot.focus_tab()
-            time.sleep(1)
+            pause(1)
 
+            # Waits out a cooldown / paces submissions instead of stopping the run
+            self.governor.acquire(self.mode, DEFAULT_PROFILE)
+            attempt = self.ledger.start(self.mode, concept, key)
             try:
-                self.video_bot.run_generation(scenario)
-                remove_scenario_from_file(filepath, key)
+                self.video_bot.run_generation(scenario, output_path)
+                self.validate_video(output_path, item_id)
+                self.cache.save(self.mode, "video", prompt, output_path, key)
+                self.queue.ack(item_id)
+                attempt.finish("success")
+                self.governor.report_success(self.mode, DEFAULT_PROFILE)
+                self.normalize(output_path)
                 processed_count += 1
+            except RateLimitError as e:
+                self.queue.release(item_id, e, count_attempt=False)
+                attempt.finish("rate_limited", e)
+                self.governor.report_rate_limit(self.mode, DEFAULT_PROFILE)
+                continue
+            except DuplicateOutputError as e:
+                print(f"[!] Visual duplicate: {e}")
+                self.queue.mark_duplicate(item_id, e)
+                attempt.finish("duplicate", e)
+                continue
             except Exception as e:
                 print(f"[!] Video generation failed: {e}")
-                if "Rate Limit" in str(e):
-                    break
+                self.queue.release(item_id, e)
+                attempt.finish("failed", e)
                 continue
             
-            time.sleep(3)
+            pause(3)
+
+    def run_cdp_video_generation(self, folder_path, tabs=2, max_videos=999, producer=None):
+        """Phase 2 (CDP): Grok tabs driven concurrently over the DevTools websocket."""
+        print(f"\n=== PHASE 2 (CDP): {tabs} GROK TABS ON {folder_path} ===")
+
+        concept = os.path.basename(os.path.normpath(folder_path))
+        self.queue.import_folder(folder_path, self.mode, concept)
+        self.queue.requeue_stale()
+        processed_count = asyncio.run(self._run_cdp_tabs(concept, tabs, max_videos, producer))
+        print(f"[*] CDP tabs finished. {processed_count} videos generated.")
+        return processed_count
+
+    async def _run_cdp_tabs(self, concept, tabs, max_videos, producer):
+        from cdp_driver import CDPBrowser
+        browser = CDPBrowser()
+        semaphore = asyncio.Semaphore(self.config["provider_concurrency"].get(self.mode, tabs))
+        state = {"reserved": 0}
+
+        async def tab_worker(name):
+            page = await browser.new_page()
+            bot = CDPGrokAutomation(page, self.config)
+            await bot.setup()
+            try:
+                while state["reserved"] < max_videos:
+                    state["reserved"] += 1
+                    item_id, key, scenario = await asyncio.to_thread(
+                        wait_for_scenario, self.queue, self.mode, concept, producer, name
+                    )
+                    if not scenario:
+                        state["reserved"] -= 1
+                        print(f"[*] [{name}] No more scenarios in queue.")
+                        break
+
+                    print(f"[*] [{name}] Processing {key}")
+                    output_path = os.path.join(self.config["videos_folder"], self.mode, concept, f"{key}_{item_id}.mp4")
+                    prompt = build_video_prompt(scenario)
+                    if self.cache.restore(self.mode, "video", prompt, output_path):
+                        print(f"[*] [{name}] Cache hit for {key}. Reused the stored video.")
+                        self.queue.ack(item_id)
+                        self.normalize(output_path)
+                        state["reserved"] -= 1
+                        continue
+
+                    async with semaphore:
+                        await asyncio.to_thread(self.governor.acquire, self.mode, DEFAULT_PROFILE)
+                        attempt = self.ledger.start(self.mode, concept, key)
+                        try:
+                            await bot.run_generation(scenario, output_path, attempt)
+                            await asyncio.to_thread(self.validate_video, output_path, item_id)
+                            self.cache.save(self.mode, "video", prompt, output_path, key)
+                            self.queue.ack(item_id)
+                            attempt.finish("success")
+                            self.governor.report_success(self.mode, DEFAULT_PROFILE)
+                            self.normalize(output_path)
+                        except RateLimitError as e:
+                            self.queue.release(item_id, e, count_attempt=False)
+                            attempt.finish("rate_limited", e)
+                            self.governor.report_rate_limit(self.mode, DEFAULT_PROFILE)
+                            state["reserved"] -= 1
+                        except DuplicateOutputError as e:
+                            print(f"[!] [{name}] Visual duplicate: {e}")
+                            self.queue.mark_duplicate(item_id, e)
+                            attempt.finish("duplicate", e)
+                            state["reserved"] -= 1
+                        except Exception as e:
+                            print(f"[!] [{name}] Video generation failed: {e}")
+                            self.queue.release(item_id, e)
+                            attempt.finish("failed", e)
+                            state["reserved"] -= 1
+            finally:
+                await browser.close_page(page)
+
+        try:
+            await asyncio.gather(*(tab_worker(f"cdp-{i}") for i in range(tabs)))
+        finally:
+            await browser.close()
+        return state["reserved"]
+
+    def validate_video(self, output_path, item_id):
+        """
+        Raises if the video fails the QC gate (the item is retried) or looks like another
+        item's output (DuplicateOutputError; the item is marked duplicate). Passing videos are indexed.
+        """
+        if self.quality_gate:
+            self.quality_gate.enforce(output_path)
+        if self.visual_index:
+            self.visual_index.enforce("video", item_id, "video", output_path)
+
+    def normalize(self, output_path):
+        """Queues a finished video for delivery transcoding (no-op when the stage is off)."""
+        if self.normalizer:
+            self.normalizer.submit(output_path, normalized_path(output_path, self.config))
+
+    def create_video_bot(self, driver, provider):
+        """Bot factory for WorkerPool: one bot per worker-owned driver."""
+        wait = WebDriverWait(driver, self.config["timeouts"]["element"])
+        long_wait = WebDriverWait(driver, self.config["timeouts"]["generation"])
+        if provider == "gemini":
+            return GeminiVideoAutomation(driver, wait, long_wait, self.config)
+        return GrokAutomation(driver, wait, long_wait, self.config)
+
+    def run_parallel_video_generation(self, folder_path, worker_specs, max_videos=999, producer=None):
+        """Phase 2 (parallel): N workers pull from the shared scenario queue."""
+        concept = os.path.basename(os.path.normpath(folder_path))
+        for provider in {spec["provider"] for spec in worker_specs}:
+            self.queue.import_folder(folder_path, provider, concept)
+        self.queue.requeue_stale()
+
+        pool = WorkerPool(
+            worker_specs, self.create_video_bot, self.queue, self.config,
+            self.ledger, self.governor, self.cache,
+            validate=self.validate_video, on_saved=self.normalize
+        )
+        return pool.run(concept, max_items=max_videos, producer=producer)
 
 # ==========================================
 #             MAIN ENTRY
@@ -569,6 +779,12 @@ if __name__ == "__main__":
     
     parser.add_argument("--mode", type=str, default="gemini", choices=["gemini", "grok"])
     parser.add_argument("--count", type=int, default=1, help="Number of scenario batches to generate.")
+    parser.add_argument("--pipeline", action="store_true", help="Generate scenarios and videos at the same time.")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel video workers (one Chrome profile/port each).")
+    parser.add_argument("--worker-tabs", action="store_true", help="Run parallel workers as tabs of one Chrome instead of separate profiles.")
+    parser.add_argument("--scenario-tabs", type=int, default=None, help="Gemini tabs generating scenarios in parallel.")
+    parser.add_argument("--followups", type=int, default=None, help="Extra scenario batches asked for in each chat.")
+    parser.add_argument("--cdp-tabs", type=int, default=None, help="Grok mode: drive this many tabs over the async CDP driver instead of Selenium.")
     parser.add_argument("--concept", type=str, default="cute_baby", choices=["baby_with_animal","obese_human","cute_baby","fruit_cutting", "animal_mukbang", "animal_chef", "tiny_worker_building_food"], required=True, help="Video generation concept (e.g., cute_baby).")    
 
     args = parser.parse_args()
@@ -586,17 +802,57 @@ if __name__ == "__main__":
         exit(1)
 
     controller = AutomationController(mode=args.mode)
-
-    # Step 1: Generate Scenarios
-    controller.run_scenario_generation(
-        prompt_path=scenario_generation_prompt_path,
-        output_folder=automation_folder,
-        count=args.count
-    )
+    scenario_tabs = args.scenario_tabs if args.scenario_tabs is not None else controller.config["scenario_tabs"]
+    followups = args.followups if args.followups is not None else controller.config["scenario_followups"]
+
+    # Step 1: Generate Scenarios (in the background when pipelined)
+    producer = None
+    if args.pipeline:
+        producer = controller.start_scenario_producer(
+            prompt_path=scenario_generation_prompt_path,
+            output_folder=automation_folder,
+            count=args.count,
+            tabs=scenario_tabs,
+            followups=followups
+        )
+    else:
+        controller.run_scenario_generation(
+            prompt_path=scenario_generation_prompt_path,
+            output_folder=automation_folder,
+            count=args.count,
+            tabs=scenario_tabs,
+            followups=followups
+        )
 
     # Step 2: Generate Videos
     # We pass a large number for video count to ensure we process all generated scenarios
-    controller.run_video_generation(
-        folder_path=automation_folder,
-        max_videos=args.count * 5
+    worker_specs = controller.config["workers"] or (
+        build_worker_specs(args.workers, args.mode, use_tabs=args.worker_tabs) if args.workers > 1 else None
     )
+    if args.cdp_tabs and args.mode == "grok":
+        controller.run_cdp_video_generation(
+            folder_path=automation_folder,
+            tabs=args.cdp_tabs,
+            max_videos=args.count * (1 + followups) * 5,
+            producer=producer
+        )
+    elif worker_specs:
+        controller.run_parallel_video_generation(
+            folder_path=automation_folder,
+            worker_specs=worker_specs,
+            max_videos=args.count * (1 + followups) * 5,
+            producer=producer
+        )
+    else:
+        controller.run_video_generation(
+            folder_path=automation_folder,
+            max_videos=args.count * (1 + followups) * 5,
+            producer=producer
+        )
+
+    if producer:
+        producer.stop()
+        producer.join()
+    if controller.normalizer:
+        print("[*] Waiting for pending normalize jobs...")
+        controller.normalizer.stop()
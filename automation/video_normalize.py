@@ -0,0 +1,387 @@
+import os
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from artifact_store import file_hash
+from video_stitch import probe, require_ffmpeg
+
+# ==========================================
+#             VIDEO NORMALIZE
+# ==========================================
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "normalize_jobs.db")
+
+# Delivery format for Shorts. Part of every job's settings key, so changing it re-normalizes.
+DEFAULT_SETTINGS = {
+    "width": 1080,
+    "height": 1920,
+    "fps": 30,
+    "video_bitrate": "8M",
+    "audio_bitrate": "192k",
+    "loudness": -14,      # Integrated loudness target (LUFS)
+    "true_peak": -1.5,    # dBTP
+    "lra": 11,            # Loudness range
+}
+
+
+def settings_key(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_video(src_path, output_path, settings):
+    """
+    Transcodes one video to the delivery format: scaled/padded to width x height, constant
+    frame rate, loudness-normalized audio (silence if there was none), target bitrate,
+    moov atom up front. Returns the output's content hash.
+    """
+    width, height = settings["width"], settings["height"]
+    info = probe(src_path)
+    inputs = ["-i", src_path]
+    if not info["audio"]:
+        inputs += ["-f", "lavfi", "-i", "anullsrc=channel_layout=stereo:sample_rate=48000"]
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    partial_path = f"{output_path}.part.mp4"
+    try:
+        subprocess.run([
+            "ffmpeg", "-y", "-v", "error", *inputs,
+            "-map", "0:v:0", "-map", "0:a:0" if info["audio"] else "1:a:0",
+            "-vf", (
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={settings['fps']},format=yuv420p"
+            ),
+            "-af", f"loudnorm=I={settings['loudness']}:TP={settings['true_peak']}:LRA={settings['lra']},aresample=48000",
+            "-c:v", "libx264", "-preset", "medium",
+            "-b:v", settings["video_bitrate"], "-maxrate", settings["video_bitrate"], "-bufsize", settings["video_bitrate"],
+            "-c:a", "aac", "-b:a", settings["audio_bitrate"], "-ar", "48000",
+            "-shortest", "-movflags", "+faststart", partial_path
+        ], check=True)
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return file_hash(output_path)
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        return True  # os.kill() would terminate it; rely on the lease there
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class NormalizeQueue:
+    """
+    Persistent normalization jobs (SQLite, WAL). Jobs move pending -> running -> done/failed.
+
+    Sources are keyed by content hash and settings: a video already normalized with the
+    same settings (or one that is itself a normalized output) is never transcoded again.
+    A claim records its owner (host:pid) and time; requeue_stale() only takes back jobs
+    whose lease expired or whose owner process on this host is gone, so several processes
+    can share the queue.
+    """
+    def __init__(self, db_path=DEFAULT_JOBS_PATH, max_attempts=3, lease_seconds=3600):
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}"
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                src_path TEXT NOT NULL,
+                src_hash TEXT NOT NULL,
+                settings_key TEXT NOT NULL,
+                output_path TEXT NOT NULL,
+                output_hash TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (src_hash, settings_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_next ON jobs (status, id);
+            CREATE INDEX IF NOT EXISTS idx_jobs_output ON jobs (output_hash, settings_key);
+        """)
+        # Databases created before claims had an owner
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if "claimed_at" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN claimed_at REAL")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def add(self, src_path, output_path, key):
+        """
+        Queues `src_path`. Returns the job id, or None when the content was already
+        normalized with these settings (the earlier output is linked to output_path).
+        """
+        src_hash = file_hash(src_path)
+        now = time.time()
+        with self.lock:
+            done = self.conn.execute("""
+                SELECT output_path, src_hash FROM jobs
+                WHERE settings_key = ? AND status = 'done' AND (src_hash = ? OR output_hash = ?)
+            """, (key, src_hash, src_hash)).fetchone()
+            if done and done["src_hash"] != src_hash:
+                return None  # The source is a normalized output itself
+            if done and os.path.exists(done["output_path"]):
+                if os.path.abspath(done["output_path"]) != os.path.abspath(output_path):
+                    _link(done["output_path"], output_path)
+                return None
+
+            # New content, or an earlier output that has since been deleted
+            self.conn.execute("""
+                INSERT INTO jobs (src_path, src_hash, settings_key, output_path, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(src_hash, settings_key) DO UPDATE SET
+                    src_path = excluded.src_path, output_path = excluded.output_path,
+                    status = CASE WHEN jobs.status = 'running' THEN 'running' ELSE 'pending' END,
+                    attempts = CASE WHEN jobs.status = 'running' THEN jobs.attempts ELSE 0 END,
+                    updated_at = excluded.updated_at
+            """, (os.path.abspath(src_path), src_hash, key, os.path.abspath(output_path), now, now))
+            return self.conn.execute(
+                "SELECT id FROM jobs WHERE src_hash = ? AND settings_key = ?", (src_hash, key)
+            ).fetchone()["id"]
+
+    def claim(self):
+        """Atomically takes the oldest pending job for this process. Returns the row, or None."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+                if row:
+                    self.conn.execute("""
+                        UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, claimed_at = ?, updated_at = ?
+                        WHERE id = ?
+                    """, (self.owner, now, now, row["id"]))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def done(self, job_id, output_hash):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', output_hash = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (output_hash, time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        """Back to pending, or failed after max_attempts."""
+        with self.lock:
+            self.conn.execute("""
+                UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    last_error = ?, updated_at = ?
+                WHERE id = ?
+            """, (self.max_attempts, str(error)[:500], time.time(), job_id))
+
+    def requeue_stale(self):
+        """
+        Running jobs whose lease expired, or whose owner on this host is no longer running,
+        are pending again. Jobs of live processes (this one included) are left alone.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = [
+                    row["id"] for row in self.conn.execute(
+                        "SELECT id, owner, claimed_at FROM jobs WHERE status = 'running'"
+                    ).fetchall()
+                    if self._abandoned(row["owner"], row["claimed_at"], now)
+                ]
+                self.conn.executemany(
+                    "UPDATE jobs SET status = 'pending', owner = NULL, updated_at = ? WHERE id = ?",
+                    [(now, job_id) for job_id in stale]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if stale:
+            print(f"[*] Re-queued {len(stale)} interrupted normalize jobs.")
+        return len(stale)
+
+    def _abandoned(self, owner, claimed_at, now):
+        if not owner or not claimed_at or claimed_at < now - self.lease_seconds:
+            return True
+        host, _, pid = owner.rpartition(":")
+        if owner == self.owner or host != self.host or not pid.isdigit():
+            return False
+        return not _process_alive(int(pid))
+
+    def counts(self):
+        with self.lock:
+            return {row["status"]: row["n"] for row in self.conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            )}
+
+
+def _link(src_path, target_path):
+    os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(src_path, target_path)
+    except OSError:
+        shutil.copyfile(src_path, target_path)
+
+
+class Normalizer(threading.Thread):
+    """
+    Feeds NormalizeQueue jobs to an ffmpeg process pool (one process per core by default).
+    submit() queues a video; stop() finishes everything queued, then shuts the pool down.
+    Jobs survive restarts: whatever is still pending is picked up by the next Normalizer.
+    """
+    def __init__(self, queue, settings=None, workers=None):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.key = settings_key(self.settings)
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = threading.Semaphore(self.workers)
+        self.inflight = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def submit(self, src_path, output_path):
+        if not src_path or not os.path.exists(src_path):
+            return None
+        job_id = self.queue.add(src_path, output_path, self.key)
+        if job_id is None:
+            print(f"[*] Already normalized: {os.path.basename(src_path)}")
+        self.wake.set()
+        return job_id
+
+    def run(self):
+        self.queue.requeue_stale()
+        last_requeue = time.time()
+        while True:
+            self.slots.acquire()
+            job = self.queue.claim()
+            if not job:
+                self.slots.release()
+                with self.lock:
+                    idle = self.inflight == 0
+                # Failed jobs go back to pending, so only stop once nothing is in flight
+                if self.stopping.is_set() and idle:
+                    break
+                # Another process may have died holding jobs since the last look
+                if time.time() - last_requeue > 60:
+                    self.queue.requeue_stale()
+                    last_requeue = time.time()
+                self.wake.wait(1)
+                self.wake.clear()
+                continue
+            with self.lock:
+                self.inflight += 1
+            future = self.pool.submit(normalize_video, job["src_path"], job["output_path"], self.settings)
+            future.add_done_callback(lambda f, job=job: self._finished(job, f))
+
+        self.pool.shutdown()
+
+    def _finished(self, job, future):
+        try:
+            self.queue.done(job["id"], future.result())
+            print(f"[*] Normalized: {job['output_path']}")
+        except Exception as e:
+            print(f"[!] Normalizing {os.path.basename(job['src_path'])} failed: {e}")
+            self.queue.fail(job["id"], e)
+        finally:
+            with self.lock:
+                self.inflight -= 1
+            self.slots.release()
+            self.wake.set()
+
+    def stop(self, wait=True):
+        """Finishes the queued jobs (when wait=True) and stops."""
+        self.stopping.set()
+        self.wake.set()
+        if wait:
+            self.join()
+
+
+def normalized_path(src_path, config):
+    """Mirrors src_path's place under videos_folder inside config["normalize"]["output_folder"]."""
+    videos_folder = os.path.abspath(config["videos_folder"])
+    src_path = os.path.abspath(src_path)
+    relative = os.path.relpath(src_path, videos_folder) if src_path.startswith(videos_folder + os.sep) else os.path.basename(src_path)
+    output_folder = config["normalize"]["output_folder"] or os.path.join(videos_folder, "normalized")
+    return os.path.join(output_folder, relative)
+
+
+def start_normalizer(config):
+    """Starts the normalize stage from config["normalize"], or returns None (disabled / no ffmpeg)."""
+    settings = dict(config["normalize"])
+    if not settings.pop("enabled"):
+        return None
+    try:
+        require_ffmpeg()
+    except Exception as e:
+        print(f"[!] {e} Videos are left as downloaded.")
+        return None
+    workers = settings.pop("workers")
+    settings.pop("output_folder")
+    normalizer = Normalizer(NormalizeQueue(), settings, workers)
+    normalizer.start()
+    return normalizer
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Normalize videos for Shorts delivery (1080x1920, loudness, faststart).")
+    parser.add_argument("--db", type=str, default=DEFAULT_JOBS_PATH, help="Path to the job database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Queue videos and normalize everything pending.")
+    add_parser.add_argument("videos", type=str, nargs="+")
+    subparsers.add_parser("run", help="Normalize everything pending.")
+    subparsers.add_parser("status", help="Show job counts.")
+
+    args = parser.parse_args()
+    queue = NormalizeQueue(args.db)
+
+    if args.command == "status":
+        for status, n in sorted(queue.counts().items()):
+            print(f"{status:>8}: {n}")
+    else:
+        config = load_config()
+        settings = {k: v for k, v in config["normalize"].items() if k not in ("enabled", "workers", "output_folder")}
+        normalizer = Normalizer(queue, settings, config["normalize"]["workers"])
+        require_ffmpeg()
+        normalizer.start()
+        for video in getattr(args, "videos", []):
+            normalizer.submit(video, normalized_path(video, config))
+        normalizer.stop()
+
+    queue.close()
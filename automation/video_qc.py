@@ -0,0 +1,198 @@
+import os
+import glob
+import json
+import math
+import argparse
+import subprocess
+from video_stitch import probe, require_ffmpeg
+
+# ==========================================
+#             VIDEO QUALITY GATE
+# ==========================================
+
+# Checks a downloaded clip before its item is acknowledged. A sparse, evenly spaced set of
+# frames (at most max_freeze_seconds / 2 apart) is decoded (downscaled, grayscale) into one NumPy array and every check runs on the
+# whole stack at once: black frames, frozen stretches, blur (Laplacian variance) and duration.
+# A failed clip raises, so the caller releases the item for a retry instead of acking it.
+
+DEFAULT_SETTINGS = {
+    "frames": 16,               # Frames sampled across the clip (more on long clips, see sample_count)
+    "width": 180,               # Decode size; the checks don't need full resolution
+    "height": 320,
+    "min_duration": 2.0,        # Seconds
+    "max_duration": 60.0,
+    "black_luma": 32,           # A pixel at or below this luma (0-255) counts as black
+    "black_pixel_ratio": 0.98,  # A frame with this share of black pixels is a black frame
+    "max_black_ratio": 0.25,    # Share of black frames that fails the clip
+    "freeze_diff": 0.5,         # Mean abs difference below which two samples are the same picture
+    "max_freeze_seconds": 2.0,  # Longest frozen stretch allowed
+    "min_sharpness": 15.0,      # Median Laplacian variance of the non-black frames
+    "keep_rejected": 5,         # Failed clips kept per folder for tuning (0 = delete them)
+}
+
+
+def load_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise Exception("numpy not found. Install it (pip install numpy) to run the video quality gate.")
+    return numpy
+
+
+def sample_frames(path, duration, frames=16, width=180, height=320):
+    """Decodes `frames` evenly spaced grayscale frames as a (n, height, width) uint8 array."""
+    np = load_numpy()
+    rate = frames / duration if duration > 0 else 1
+    raw = subprocess.run([
+        "ffmpeg", "-v", "error", "-i", path,
+        "-vf", f"fps={rate:.6f},scale={width}:{height},format=gray",
+        "-frames:v", str(frames), "-f", "rawvideo", "-"
+    ], capture_output=True, check=True).stdout
+    count = len(raw) // (width * height)
+    return np.frombuffer(raw[:count * width * height], dtype=np.uint8).reshape(count, height, width)
+
+
+def sample_count(duration, settings):
+    """
+    Frames to sample: at least settings["frames"], and no more than max_freeze_seconds / 2
+    apart, so a freeze just over the limit always spans enough samples to be measured.
+    """
+    step = settings["max_freeze_seconds"] / 2
+    return max(settings["frames"], math.ceil(duration / step) + 1)
+
+
+def _longest_run(mask):
+    """Length of the longest run of True in a 1-D boolean array."""
+    np = load_numpy()
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return int((edges[1::2] - edges[::2]).max()) if len(edges) else 0
+
+
+def frame_metrics(frames, interval, settings):
+    """Black-frame ratio, longest frozen stretch (seconds) and sharpness of a frame stack."""
+    np = load_numpy()
+    frames = frames.astype(np.float32)
+
+    dark = (frames <= settings["black_luma"]).mean(axis=(1, 2))
+    black = dark >= settings["black_pixel_ratio"]
+
+    # Differences between consecutive samples; a run of near-zero ones is a frozen stretch
+    diffs = np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2))
+    frozen = diffs < settings["freeze_diff"]
+
+    # 4-neighbour Laplacian over the whole stack
+    laplacian = (
+        frames[:, :-2, 1:-1] + frames[:, 2:, 1:-1] + frames[:, 1:-1, :-2] + frames[:, 1:-1, 2:]
+        - 4 * frames[:, 1:-1, 1:-1]
+    )
+    sharpness = laplacian.var(axis=(1, 2))
+    lit = sharpness[~black]
+
+    return {
+        "black_ratio": float(black.mean()),
+        "freeze_seconds": _longest_run(frozen) * interval,
+        "sharpness": float(np.median(lit)) if len(lit) else 0.0,
+    }
+
+
+def check_video(path, settings=None):
+    """Returns the QC report of one clip; report["failures"] lists what failed (empty = passed)."""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    report = {"path": path, "failures": []}
+
+    try:
+        duration = probe(path)["duration"]
+    except Exception as e:
+        report["failures"].append(f"unreadable ({e})")
+        return report
+    report["duration"] = round(duration, 2)
+    if not settings["min_duration"] <= duration <= settings["max_duration"]:
+        report["failures"].append(
+            f"duration {duration:.1f}s outside {settings['min_duration']}-{settings['max_duration']}s"
+        )
+        return report
+
+    count = sample_count(duration, settings)
+    frames = sample_frames(path, duration, count, settings["width"], settings["height"])
+    report["frames"] = len(frames)
+    if len(frames) < 2:
+        report["failures"].append("no decodable frames")
+        return report
+
+    # Samples are taken at a fixed rate of count / duration
+    metrics = frame_metrics(frames, duration / count, settings)
+    report.update({name: round(value, 3) for name, value in metrics.items()})
+    if metrics["black_ratio"] > settings["max_black_ratio"]:
+        report["failures"].append(f"black frames {metrics['black_ratio']:.0%}")
+    if metrics["freeze_seconds"] > settings["max_freeze_seconds"]:
+        report["failures"].append(f"frozen for {metrics['freeze_seconds']:.1f}s")
+    if metrics["black_ratio"] < 1 and metrics["sharpness"] < settings["min_sharpness"]:
+        report["failures"].append(f"blurry (sharpness {metrics['sharpness']:.1f})")
+    return report
+
+
+class QualityGate:
+    """Runs check_video() on saved clips; enforce() raises on a failed one and sets it aside."""
+    def __init__(self, settings=None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+
+    def enforce(self, path):
+        report = check_video(path, self.settings)
+        name = os.path.basename(path)
+        if not report["failures"]:
+            print(f"[*] QC passed: {name}")
+            return report
+
+        # A few are kept for tuning the thresholds; the retry writes a fresh file at `path`
+        if os.path.exists(path):
+            if self.settings["keep_rejected"] > 0:
+                os.replace(path, f"{os.path.splitext(path)[0]}.qc_rejected.mp4")
+            else:
+                os.remove(path)
+        prune_rejected(os.path.dirname(path), self.settings["keep_rejected"])
+        raise Exception(f"QC failed for {name}: {'; '.join(report['failures'])}")
+
+
+def prune_rejected(folder, keep):
+    """Deletes all but the `keep` newest *.qc_rejected.mp4 clips of a folder."""
+    rejected = sorted(glob.glob(os.path.join(folder or ".", "*.qc_rejected.mp4")), key=os.path.getmtime, reverse=True)
+    for path in rejected[max(keep, 0):]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def start_quality_gate(config):
+    """The gate from config["qc"], or None (disabled / no ffmpeg / no numpy)."""
+    settings = dict(config["qc"])
+    if not settings.pop("enabled"):
+        return None
+    try:
+        require_ffmpeg()
+        load_numpy()
+    except Exception as e:
+        print(f"[!] {e} Videos are accepted without QC.")
+        return None
+    return QualityGate(settings)
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Run the video quality gate on clips and print the reports.")
+    parser.add_argument("clips", type=str, nargs="+")
+    args = parser.parse_args()
+
+    settings = dict(load_config()["qc"])
+    settings.pop("enabled")
+    require_ffmpeg()
+    failed = 0
+    for clip in args.clips:
+        report = check_video(clip, settings)
+        failed += bool(report["failures"])
+        print(json.dumps(report))
+    print(f"[*] {len(args.clips) - failed} passed, {failed} failed.")
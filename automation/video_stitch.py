@@ -0,0 +1,223 @@
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================
+#             VIDEO STITCH
+# ==========================================
+
+# Joins the clips of one scenario (base + extensions) into a single 9:16 Short.
+# Clips that already match (codec, size, frame rate, audio layout, 9:16) are joined with
+# the concat demuxer and stream copy; otherwise they are re-encoded once to a common format.
+
+SHORT_WIDTH = 1080
+SHORT_HEIGHT = 1920
+
+# Artifact names of an image-to-video item's clips, in playback order.
+# Chained segments follow as chain1_base_video, chain1_ext_video, chain2_base_video, ...
+CLIP_ARTIFACTS = ("base_video", "ext_video", "ext2_video")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def require_ffmpeg():
+    for tool in ("ffmpeg", "ffprobe"):
+        if not shutil.which(tool):
+            raise Exception(f"{tool} not found. Install ffmpeg to stitch clips.")
+
+
+def probe(path):
+    """Returns {"video": {...}, "audio": {...} or None, "duration": seconds} for a clip."""
+    output = subprocess.run([
+        "ffprobe", "-v", "error", "-of", "json",
+        "-show_entries", "stream=codec_type,codec_name,width,height,r_frame_rate,pix_fmt,sample_rate,channels:format=duration",
+        path
+    ], capture_output=True, text=True, check=True).stdout
+    data = json.loads(output)
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if not video:
+        raise Exception(f"No video stream in {path}")
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    return {"video": video, "audio": audio, "duration": float(data.get("format", {}).get("duration") or 0)}
+
+
+def _signature(info):
+    video, audio = info["video"], info["audio"]
+    return (
+        video.get("codec_name"), video.get("width"), video.get("height"), video.get("r_frame_rate"), video.get("pix_fmt"),
+        (audio.get("codec_name"), audio.get("sample_rate"), audio.get("channels")) if audio else None,
+    )
+
+
+def can_stream_copy(infos, width=SHORT_WIDTH, height=SHORT_HEIGHT):
+    """True when every clip has the same stream layout and is already width:height."""
+    video = infos[0]["video"]
+    if not video.get("width") or video["width"] * height != video["height"] * width:
+        return False
+    return len({_signature(info) for info in infos}) == 1
+
+
+def _concat_copy(clips, output_path):
+    with tempfile.NamedTemporaryFile('w', suffix=".txt", delete=False, encoding='utf-8') as f:
+        for clip in clips:
+            escaped = os.path.abspath(clip).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+        list_path = f.name
+    try:
+        subprocess.run([
+            "ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart", output_path
+        ], check=True)
+    finally:
+        os.remove(list_path)
+
+
+def _concat_reencode(clips, infos, output_path, width, height, fps=30, crf=20):
+    """Scales/pads every clip to width x height at `fps`, fills missing audio with silence, then concatenates."""
+    inputs = [arg for clip in clips for arg in ("-i", clip)]
+    filters, labels = [], []
+    silent_index = len(clips)
+    for i, info in enumerate(infos):
+        filters.append(
+            f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p[v{i}]"
+        )
+        if info["audio"]:
+            filters.append(f"[{i}:a]aresample=48000,aformat=channel_layouts=stereo[a{i}]")
+        else:
+            inputs += ["-f", "lavfi", "-t", f"{info['duration']:.3f}", "-i", "anullsrc=channel_layout=stereo:sample_rate=48000"]
+            filters.append(f"[{silent_index}:a]anull[a{i}]")
+            silent_index += 1
+        labels.append(f"[v{i}][a{i}]")
+    filters.append(f"{''.join(labels)}concat=n={len(clips)}:v=1:a=1[v][a]")
+
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error", *inputs,
+        "-filter_complex", ";".join(filters), "-map", "[v]", "-map", "[a]",
+        "-c:v", "libx264", "-preset", "medium", "-crf", str(crf),
+        "-c:a", "aac", "-b:a", "192k", "-movflags", "+faststart", output_path
+    ], check=True)
+
+
+def stitch_clips(clips, output_path, width=SHORT_WIDTH, height=SHORT_HEIGHT, crf=20):
+    """
+    Joins `clips` into output_path. Returns (output_path, "copy" | "reencode").
+    Written to a temp name first, so a half-written Short never sits at output_path.
+    """
+    require_ffmpeg()
+    clips = [clip for clip in clips if clip and os.path.exists(clip)]
+    if not clips:
+        raise Exception("No clips to stitch.")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    partial_path = f"{output_path}.part.mp4"
+    infos = [probe(clip) for clip in clips]
+    method = "copy" if can_stream_copy(infos, width, height) else "reencode"
+    try:
+        if method == "copy":
+            _concat_copy(clips, partial_path)
+        else:
+            _concat_reencode(clips, infos, partial_path, width, height, crf=crf)
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return output_path, method
+
+
+def chain_artifact(segment, name):
+    """Artifact name of a chained segment's clip, e.g. chain_artifact(1, "base_video") -> "chain1_base_video"."""
+    return f"chain{segment}_{name}"
+
+
+def collect_clips(artifacts):
+    """The item's clips that exist on disk, in playback order."""
+    names = list(CLIP_ARTIFACTS)
+    segment = 1
+    while chain_artifact(segment, "base_video") in artifacts:
+        names += [chain_artifact(segment, "base_video"), chain_artifact(segment, "ext_video")]
+        segment += 1
+    return [artifacts[name] for name in names if artifacts.get(name) and os.path.exists(artifacts[name])]
+
+
+def last_frame_png(video_path):
+    """
+    The clip's last frame as PNG bytes. -sseof seeks from the end, so only the final
+    fraction of a second is decoded; frames come back over a pipe, nothing is re-encoded to disk.
+    """
+    require_ffmpeg()
+    # A window too short for the clip's last frame duration yields nothing; widen it then
+    for window in (0.2, 2.0):
+        data = subprocess.run([
+            "ffmpeg", "-v", "error", "-sseof", f"-{window}", "-i", video_path,
+            "-f", "image2pipe", "-c:v", "png", "-"
+        ], capture_output=True, check=True).stdout
+        start = data.rfind(PNG_SIGNATURE)
+        if start >= 0:
+            return data[start:]
+    raise Exception(f"No frame decoded from the end of {video_path}")
+
+
+def save_last_frame(video_path, image_path):
+    """Writes the clip's last frame to image_path (PNG) and returns the path."""
+    frame = last_frame_png(video_path)
+    os.makedirs(os.path.dirname(os.path.abspath(image_path)), exist_ok=True)
+    with open(image_path, 'wb') as f:
+        f.write(frame)
+    return image_path
+
+
+class StitchStage:
+    """
+    Stitches finished items on a process pool so ffmpeg never blocks the browser loop.
+    `on_done(key, output_path, method)` runs for every Short that was written.
+    """
+    def __init__(self, workers=2, width=SHORT_WIDTH, height=SHORT_HEIGHT, crf=20, on_done=None):
+        self.width = width
+        self.height = height
+        self.crf = crf
+        self.on_done = on_done
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+
+    def submit(self, key, clips, output_path):
+        future = self.pool.submit(stitch_clips, clips, output_path, self.width, self.height, self.crf)
+        future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key, future):
+        try:
+            output_path, method = future.result()
+        except Exception as e:
+            print(f"[!] Stitching {key} failed: {e}")
+            return
+        print(f"[*] Stitched {key} ({method}): {output_path}")
+        if self.on_done:
+            try:
+                self.on_done(key, output_path, method)
+            except Exception as e:
+                print(f"[!] Post-stitch step for {key} failed: {e}")
+
+    def close(self, wait=True):
+        """Waits for queued stitches (unless wait=False) and shuts the pool down."""
+        self.pool.shutdown(wait=wait)
+
+# ==========================================
+#             MAIN ENTRY
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stitch clips into one 9:16 Short.")
+    parser.add_argument("output", type=str, help="Output .mp4 path.")
+    parser.add_argument("clips", type=str, nargs="+", help="Clips in playback order.")
+    parser.add_argument("--width", type=int, default=SHORT_WIDTH)
+    parser.add_argument("--height", type=int, default=SHORT_HEIGHT)
+    parser.add_argument("--crf", type=int, default=20, help="x264 quality when re-encoding.")
+    args = parser.parse_args()
+
+    path, method = stitch_clips(args.clips, args.output, args.width, args.height, args.crf)
+    print(f"[*] Wrote {path} ({method}).")
@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+from pipeline import wait_for_scenario
+from rate_governor import RateLimitError
+from perceptual_index import DuplicateOutputError
+from prompt_cache import build_video_prompt
+from browser import launch_chrome_debugger, connect_driver, install_chromedriver, DEFAULT_PORT, DEFAULT_PROFILE
+
+# ==========================================
+#             WORKER POOL
+# ==========================================
+
+
+def build_worker_specs(count, provider, use_tabs=False, base_port=DEFAULT_PORT, base_profile=DEFAULT_PROFILE):
+    """
+    Builds `count` worker specs for one provider.
+    Profiles mode: one Chrome per port/profile (one account each).
+    Tabs mode: every worker gets its own tab in the Chrome on base_port.
+    """
+    specs = []
+    for i in range(count):
+        if use_tabs:
+            specs.append({"provider": provider, "port": base_port, "profile": base_profile, "tab": True})
+        else:
+            profile = base_profile if i == 0 else f"{base_profile}-{i}"
+            specs.append({"provider": provider, "port": base_port + i, "profile": profile, "tab": False})
+    return specs
+
+
+class WorkerPool:
+    """
+    Runs one bot per worker spec against the shared ScenarioQueue.
+
+    bot_factory(driver, provider) must return an object with focus_tab() and
+    run_generation(scenario, output_path). Each worker owns its own Selenium session;
+    `provider_concurrency` caps how many workers of a provider generate at once.
+    With a RateGovernor, a rate-limited worker parks for the cooldown and resumes.
+    With a PromptCache, already rendered prompts are reused and new renders are cached.
+    `validate(output_path, item_id)` raises for a video that must be retried (e.g. the QC gate), or
+    DuplicateOutputError for one whose item is then marked duplicate.
+    `on_saved(output_path)` runs for every finished video (e.g. to queue normalization).
+    """
+    def __init__(self, worker_specs, bot_factory, queue, config, ledger=None, governor=None, cache=None, validate=None, on_saved=None):
+        self.worker_specs = worker_specs
+        self.ledger = ledger
+        self.governor = governor
+        self.cache = cache
+        self.validate = validate
+        self.on_saved = on_saved
+        self.bot_factory = bot_factory
+        self.queue = queue
+        self.config = config
+        self.semaphores = {
+            provider: threading.BoundedSemaphore(cap)
+            for provider, cap in config.get("provider_concurrency", {}).items()
+        }
+        self.lock = threading.Lock()
+        self.processed_count = 0
+        self.max_items = 0
+        self.producer = None
+
+    def run(self, concept, max_items=999, producer=None):
+        print(f"\n=== WORKER POOL: {len(self.worker_specs)} WORKERS ON '{concept}' ===")
+        self.processed_count = 0
+        self.max_items = max_items
+        self.producer = producer
+
+        for port, profile in {(s["port"], s["profile"]) for s in self.worker_specs}:
+            launch_chrome_debugger(port, profile)
+        # Resolve chromedriver once instead of once per thread
+        driver_path = install_chromedriver(self.worker_specs[0]["port"])
+
+        threads = []
+        for i, spec in enumerate(self.worker_specs):
+            name = f"{spec['provider']}-{i}"
+            thread = threading.Thread(target=self._worker, args=(name, spec, concept, driver_path), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+        print(f"[*] Worker pool finished. {self.processed_count} videos generated.")
+        return self.processed_count
+
+    def _reserve_slot(self):
+        with self.lock:
+            if self.processed_count >= self.max_items:
+                return False
+            self.processed_count += 1
+            return True
+
+    def _release_slot(self):
+        with self.lock:
+            self.processed_count -= 1
+
+    def _worker(self, name, spec, concept, driver_path):
+        provider = spec["provider"]
+        try:
+            driver = connect_driver(spec["port"], driver_path)
+        except Exception as e:
+            print(f"[!] [{name}] Could not connect to Chrome on port {spec['port']}: {e}")
+            return
+
+        bot = self.bot_factory(driver, provider)
+        if spec.get("tab"):
+            driver.switch_to.new_window('tab')
+            bot.tab_handle = driver.current_window_handle
+
+        semaphore = self.semaphores.get(provider)
+        # Workers sharing a Chrome profile share its account (and its quota)
+        account = spec.get("account") or spec["profile"]
+        while True:
+            if not self._reserve_slot():
+                break
+
+            item_id, key, scenario = wait_for_scenario(self.queue, provider, concept, self.producer, worker=name)
+            if not scenario:
+                self._release_slot()
+                print(f"[*] [{name}] No more scenarios in queue.")
+                break
+
+            print(f"[*] [{name}] Processing {key}")
+            output_path = os.path.join(self.config["videos_folder"], provider, concept, f"{key}_{item_id}.mp4")
+            prompt = build_video_prompt(scenario)
+            if self.cache and self.cache.restore(provider, "video", prompt, output_path):
+                print(f"[*] [{name}] Cache hit for {key}. Reused the stored video.")
+                self.queue.ack(item_id)
+                if self.on_saved:
+                    self.on_saved(output_path)
+                self._release_slot()
+                continue
+
+            if self.governor:
+                self.governor.acquire(provider, account)
+            attempt = self.ledger.start(provider, concept, key) if self.ledger else None
+            try:
+                if semaphore:
+                    semaphore.acquire()
+                try:
+                    bot.focus_tab()
+                    bot.run_generation(scenario, output_path)
+                finally:
+                    if semaphore:
+                        semaphore.release()
+                if self.validate:
+                    self.validate(output_path, item_id)
+                if self.cache:
+                    self.cache.save(provider, "video", prompt, output_path, key)
+                self.queue.ack(item_id)
+                if attempt:
+                    attempt.finish("success")
+                if self.on_saved:
+                    self.on_saved(output_path)
+                if self.governor:
+                    self.governor.report_success(provider, account)
+            except RateLimitError as e:
+                self.queue.release(item_id, e, count_attempt=False)
+                if attempt:
+                    attempt.finish("rate_limited", e)
+                self._release_slot()
+                if not self.governor:
+                    print(f"[!] [{name}] Rate limit hit. Stopping worker.")
+                    break
+                # The next acquire() parks this worker until the cooldown is over
+                self.governor.report_rate_limit(provider, account)
+            except DuplicateOutputError as e:
+                print(f"[!] [{name}] Visual duplicate: {e}")
+                self.queue.mark_duplicate(item_id, e)
+                if attempt:
+                    attempt.finish("duplicate", e)
+                self._release_slot()
+            except Exception as e:
+                print(f"[!] [{name}] Video generation failed: {e}")
+                self.queue.release(item_id, e)
+                if attempt:
+                    attempt.finish("failed", e)
+                self._release_slot()
+
+            time.sleep(3)
+
+        if spec.get("tab"):
+            try:
+                driver.close()
+            except Exception:
+                pass